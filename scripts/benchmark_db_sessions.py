@@ -0,0 +1,83 @@
+"""
+Compare route-style database access with the sync session (blocking the event
+loop, DB_ASYNC_ENABLED=False) and with the asyncpg session (DB_ASYNC_ENABLED=True).
+
+Runs BENCHMARK_CONCURRENCY concurrent "requests" on one event loop, each
+loading the full user aggregate like the routes do, and reports throughput,
+latency and how late a 10 ms ticker on the same loop fires (event loop lag).
+
+Usage:
+    DB_ASYNC_ENABLED=True BENCHMARK_USER_ID=<uuid> python -m scripts.benchmark_db_sessions
+"""
+import asyncio
+import os
+import statistics
+import time
+
+from src.repository.config.database import db
+from src.repository.users_repository import AsyncUsersRepository
+
+USER_ID = os.environ['BENCHMARK_USER_ID']
+CONCURRENCY = int(os.getenv('BENCHMARK_CONCURRENCY', '20'))
+REQUESTS = int(os.getenv('BENCHMARK_REQUESTS', '500'))
+TICK_SECONDS = 0.01
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+
+async def _sync_request():
+    with db.sessionmaker() as session:
+        await AsyncUsersRepository(session).get_user_by_id(USER_ID)
+
+
+async def _async_request():
+    async with db.async_sessionmaker() as session:
+        await AsyncUsersRepository(session).get_user_by_id(USER_ID)
+
+
+async def _ticker(lags: list[float], stop: asyncio.Event):
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK_SECONDS
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(max(0.0, time.perf_counter() - expected) * 1000)
+
+
+async def _run(name: str, request) -> None:
+    latencies, lags = [], []
+    remaining = iter(range(REQUESTS))
+    stop = asyncio.Event()
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            await request()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    print(
+        f'[{name}] {REQUESTS / elapsed:.1f} req/s, '
+        f'p50 {statistics.median(latencies):.2f} ms, p95 {_percentile(latencies, 0.95):.2f} ms, '
+        f'loop lag p95 {_percentile(lags or [0.0], 0.95):.2f} ms'
+    )
+
+
+async def main():
+    await _run('sync session', _sync_request)
+    if db.async_sessionmaker is None:
+        print('DB_ASYNC_ENABLED is not set, skipping the asyncpg session')
+        return
+    await _run('async session', _async_request)
+    await db.async_engine.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
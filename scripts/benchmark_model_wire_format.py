@@ -0,0 +1,98 @@
+"""
+Compare the `json` and `f32v1` model wire formats against a model service
+(see scripts/fake_model_server.py): request size, round trip latency and the
+cost of turning dot products into compatibility scores.
+
+Usage:
+    RECOMMENDATIONS_API_URL=http://localhost:8081 python -m scripts.benchmark_model_wire_format
+"""
+import json
+import math
+import os
+import statistics
+import time
+
+import numpy as np
+import requests
+
+from src.services.model_wire_format import (
+    COMPACT_FORMAT,
+    FEATURE_ORDER,
+    JSON_FORMAT,
+    build_ranking_payload,
+    build_scoring_payload,
+    dot_products_to_scores,
+    parse_dot_products,
+)
+
+ITERATIONS = int(os.getenv('BENCHMARK_ITERATIONS', '200'))
+LIMIT = int(os.getenv('BENCHMARK_LIMIT', '500'))
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+
+def _benchmark_endpoint(session: requests.Session, url: str, build_payload, params: dict | None = None) -> dict:
+    rng = np.random.default_rng(0)
+    latencies = []
+    request_bytes = response_bytes = 0
+    for _ in range(ITERATIONS):
+        features = {name: float(value) for name, value in zip(FEATURE_ORDER, rng.uniform(0, 5, len(FEATURE_ORDER)))}
+        started = time.perf_counter()
+        body = json.dumps(build_payload(features))
+        response = session.post(url, body, params=params, headers={'Content-Type': 'application/json'})
+        wine_ids, dot_products = parse_dot_products(response.json())
+        dict(zip(wine_ids, dot_products_to_scores(dot_products).tolist()))
+        latencies.append((time.perf_counter() - started) * 1000)
+        request_bytes += len(body)
+        response_bytes += len(response.content)
+    return {
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(_percentile(latencies, 0.95), 3),
+        'request_bytes': request_bytes // ITERATIONS,
+        'response_bytes': response_bytes // ITERATIONS,
+    }
+
+
+def _benchmark_transform():
+    dot_products = {str(wine_id): float(dot) for wine_id, dot in enumerate(np.random.default_rng(1).normal(size=LIMIT))}
+
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        {wine_id: round(1 / (1 + math.exp(-dot)) * 100, 2) for wine_id, dot in dot_products.items()}
+    loop_ms = (time.perf_counter() - started) * 1000 / ITERATIONS
+
+    ids, values = list(dot_products.keys()), np.fromiter(dot_products.values(), dtype=np.float64)
+    started = time.perf_counter()
+    for _ in range(ITERATIONS):
+        dict(zip(ids, dot_products_to_scores(values).tolist()))
+    vectorized_ms = (time.perf_counter() - started) * 1000 / ITERATIONS
+
+    print(f'sigmoid over {LIMIT} dot products: python loop {loop_ms:.4f} ms, numpy {vectorized_ms:.4f} ms')
+
+
+def main():
+    model_api_url = os.getenv('RECOMMENDATIONS_API_URL', 'http://localhost:8081')
+    session = requests.Session()
+    score_ids = list(range(1, LIMIT + 1))
+    for wire_format in (JSON_FORMAT, COMPACT_FORMAT):
+        ranking = _benchmark_endpoint(
+            session,
+            f'{model_api_url}/wines',
+            lambda features: build_ranking_payload(wire_format, 'benchmark-user', features),
+            params={'limit': LIMIT},
+        )
+        scoring = _benchmark_endpoint(
+            session,
+            f'{model_api_url}/wines/score',
+            lambda features: build_scoring_payload(wire_format, 'benchmark-user', features, score_ids),
+        )
+        print(f'[{wire_format}] /wines limit={LIMIT}: {ranking}')
+        print(f'[{wire_format}] /wines/score {LIMIT} ids: {scoring}')
+    _benchmark_transform()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Compare the latency of the wines repository backends: Supabase REST
+(`SupabaseWinesRepository`) and the direct Postgres connection
+(`SqlWinesRepository`).
+
+Runs the lookups the routes and the recommendation path do most: one wine by
+ID, a batch of wines by ID (hydrating a page of recommendations) and a
+paginated filtered search.
+
+Usage:
+    BENCHMARK_WINE_IDS=1,2,3,... python -m scripts.benchmark_wines_repository
+"""
+import os
+import statistics
+import time
+
+from src.models.schemas.wine import WineFilters
+from src.repository.wines_repository import SqlWinesRepository, SupabaseWinesRepository
+
+WINE_IDS = [int(wine_id) for wine_id in os.environ['BENCHMARK_WINE_IDS'].split(',')]
+ITERATIONS = int(os.getenv('BENCHMARK_ITERATIONS', '50'))
+SEARCH_FILTERS = WineFilters(country=os.getenv('BENCHMARK_COUNTRY', 'france'))
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+
+def _measure(name: str, call) -> None:
+    call()  # warm up connections
+    latencies = []
+    for _ in range(ITERATIONS):
+        started = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - started) * 1000)
+    print(f'  {name:<14} p50 {statistics.median(latencies):7.2f} ms   p95 {_percentile(latencies, 0.95):7.2f} ms')
+
+
+def main():
+    for backend in (SupabaseWinesRepository, SqlWinesRepository):
+        print(f'[{backend.__name__}]')
+        _measure('get_by_id', lambda: backend.get_by_id(WINE_IDS[0]))
+        _measure('get_by_ids', lambda: backend.get_by_ids(WINE_IDS))
+        _measure('get_by_filters', lambda: backend.get_by_filters(SEARCH_FILTERS, limit=20, offset=0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Check with EXPLAIN that the hot rating, favorite and preference lookups use
+the indexes added in migration d3f1b8c5e2a4.
+
+Seeds synthetic users, wines, ratings, favorites and preferences inside a
+transaction, runs ANALYZE, prints the plan of each lookup and whether it
+scans the expected index, and rolls everything back, so it leaves the
+database as it was. Exits with 1 if a lookup does not use its index.
+
+Usage:
+    python -m scripts.explain_user_lookups [--users 2000] [--ratings-per-user 25]
+"""
+import argparse
+import json
+
+from sqlalchemy import select, text
+
+from src.repository.config.database import db
+from src.repository.table_models import (
+    FavoriteWines,
+    PreferenceOption,
+    UserPreference,
+    Wine,
+    WineRating,
+)
+
+SEED_USER_EMAIL = 'explain-check@tuvino.invalid'
+SEED_WINES = 2000
+
+
+def _seed(connection, users: int, ratings_per_user: int):
+    first_wine_id = connection.execute(text('SELECT coalesce(max(wine_id), 0) + 1 FROM wines')).scalar()
+    connection.execute(text("""
+        INSERT INTO wines (wine_id, wine_name)
+        SELECT :first + n, 'Explain check ' || n FROM generate_series(0, :wines - 1) n
+    """), {'first': first_wine_id, 'wines': SEED_WINES})
+    connection.execute(text("""
+        INSERT INTO users (uid, name, email, onboarding_completed)
+        SELECT gen_random_uuid(), 'explain-check', :email, true FROM generate_series(1, :users)
+    """), {'email': SEED_USER_EMAIL, 'users': users})
+    connection.execute(text("""
+        INSERT INTO wine_ratings (wine_id, user_id, rating, date)
+        SELECT :first + (abs(hashtext(u.uid::text || n)) % :wines), u.uid, 1 + n % 5, now() - n * interval '1 day'
+        FROM users u CROSS JOIN generate_series(1, :per_user) n
+        WHERE u.email = :email
+        ON CONFLICT DO NOTHING
+    """), {'first': first_wine_id, 'wines': SEED_WINES, 'per_user': ratings_per_user, 'email': SEED_USER_EMAIL})
+    connection.execute(text("""
+        INSERT INTO favorite_wines (user_id, wine_id, added_date)
+        SELECT u.uid, :first + (abs(hashtext(u.uid::text || 'f' || n)) % :wines), now() - n * interval '1 hour'
+        FROM users u CROSS JOIN generate_series(1, 5) n
+        WHERE u.email = :email
+        ON CONFLICT DO NOTHING
+    """), {'first': first_wine_id, 'wines': SEED_WINES, 'email': SEED_USER_EMAIL})
+    connection.execute(text("""
+        INSERT INTO user_preferences (user_id, option_id, weight)
+        SELECT u.uid, o.id, 1 FROM users u CROSS JOIN (SELECT id FROM preference_options ORDER BY id LIMIT 5) o
+        WHERE u.email = :email
+    """), {'email': SEED_USER_EMAIL})
+    for table in ('wines', 'users', 'wine_ratings', 'favorite_wines', 'user_preferences'):
+        connection.execute(text(f'ANALYZE {table}'))
+
+    user_id = connection.execute(text('SELECT uid FROM users WHERE email = :email LIMIT 1'), {'email': SEED_USER_EMAIL}).scalar()
+    wine_id = connection.execute(text('SELECT wine_id FROM wine_ratings WHERE user_id = :user_id LIMIT 1'), {'user_id': user_id}).scalar()
+    return user_id, wine_id
+
+
+def _lookups(user_id, wine_id) -> dict:
+    """Statements of the repository methods, with the index each one should use."""
+    return {
+        'WineRatingsRepository.get_by_user_id': (
+            select(Wine, WineRating).join(WineRating, Wine.wine_id == WineRating.wine_id)
+            .where(WineRating.user_id == user_id).order_by(WineRating.date.desc()),
+            'ix_wine_ratings_user_id_date',
+        ),
+        'WineRatingsRepository.get_by_user_id_and_wine_id': (
+            select(Wine, WineRating).join(WineRating, Wine.wine_id == WineRating.wine_id)
+            .where(WineRating.user_id == user_id, WineRating.wine_id == wine_id),
+            'uq_wine_ratings_user_id_wine_id',
+        ),
+        'WineRatingsRepository.get_by_wine_id': (
+            select(Wine, WineRating).join(WineRating, Wine.wine_id == WineRating.wine_id)
+            .where(WineRating.wine_id == wine_id).order_by(WineRating.date.desc()),
+            'ix_wine_ratings_wine_id_date',
+        ),
+        'UsersRepository.get_favorite_wines': (
+            select(Wine).join(FavoriteWines, Wine.wine_id == FavoriteWines.wine_id)
+            .where(FavoriteWines.user_id == user_id).order_by(FavoriteWines.added_date.desc()),
+            'ix_favorite_wines_user_id_added_date',
+        ),
+        'PreferencesRepository.get_preferences': (
+            select(UserPreference, PreferenceOption).join(PreferenceOption, UserPreference.option_id == PreferenceOption.id)
+            .where(UserPreference.user_id == user_id),
+            'ix_user_preferences_user_id_option_id',
+        ),
+    }
+
+
+def _indexes_used(plan: dict) -> set[str]:
+    indexes = {plan['Index Name']} if 'Index Name' in plan else set()
+    for child in plan.get('Plans', []):
+        indexes |= _indexes_used(child)
+    return indexes
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='EXPLAIN the hot user lookups on a seeded dataset')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--ratings-per-user', type=int, default=25)
+    args = parser.parse_args(argv)
+
+    failed = 0
+    with db.engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            user_id, wine_id = _seed(connection, args.users, args.ratings_per_user)
+            for name, (statement, index) in _lookups(user_id, wine_id).items():
+                compiled = statement.compile(connection, compile_kwargs={'literal_binds': True})
+                plan = connection.execute(text(f'EXPLAIN (FORMAT JSON) {compiled}')).scalar()
+                plan = json.loads(plan) if isinstance(plan, str) else plan
+                used = _indexes_used(plan[0]['Plan'])
+                ok = index in used
+                failed += not ok
+                print(f"[{'OK' if ok else 'FAIL'}] {name}: expected {index}, plan uses {sorted(used) or 'no index'}")
+                for line in connection.execute(text(f'EXPLAIN {compiled}')).scalars():
+                    print(f'    {line}')
+        finally:
+            transaction.rollback()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,88 @@
+"""
+Fake Two Tower model service for local benchmarks.
+
+Serves /wines, /wines/score and their /batch variants with random wine
+embeddings, answering in the wire format of each request (`json` or `f32v1`).
+
+Usage:
+    python -m scripts.fake_model_server
+    RECOMMENDATIONS_API_URL=http://localhost:8081 python -m scripts.benchmark_model_wire_format
+"""
+import os
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Query
+
+from src.services.model_wire_format import COMPACT_FORMAT, FEATURE_ORDER, decode_features, features_to_vector
+
+NUM_WINES = int(os.getenv('FAKE_MODEL_NUM_WINES', '2000'))
+EMBEDDING_DIM = 32
+PORT = int(os.getenv('FAKE_MODEL_PORT', '8081'))
+
+rng = np.random.default_rng(42)
+wine_ids = np.arange(1, NUM_WINES + 1)
+wine_embeddings = rng.normal(size=(NUM_WINES, EMBEDDING_DIM)) / np.sqrt(EMBEDDING_DIM)
+user_tower = rng.normal(size=(len(FEATURE_ORDER), EMBEDDING_DIM)) / np.sqrt(len(FEATURE_ORDER))
+
+app = FastAPI(title='Fake Two Tower model')
+
+
+def _user_embedding(body: dict) -> np.ndarray:
+    if body.get('format') == COMPACT_FORMAT:
+        features = decode_features(body['features'])
+    else:
+        features = features_to_vector(body.get('user_data') or body)
+    return np.tanh(features.astype(np.float64) @ user_tower / 10)
+
+
+def _rank(body: dict, limit: int) -> dict:
+    dots = wine_embeddings @ _user_embedding(body)
+    limit = min(limit, NUM_WINES)
+    top = np.argpartition(-dots, limit - 1)[:limit]
+    top = top[np.argsort(-dots[top])]
+    if body.get('format') == COMPACT_FORMAT:
+        return {'format': COMPACT_FORMAT, 'wine_ids': wine_ids[top].tolist(), 'dot_products': dots[top].tolist()}
+    return {
+        'wines': [str(wine_id) for wine_id in wine_ids[top]],
+        'dot_products': {str(wine_id): float(dot) for wine_id, dot in zip(wine_ids[top], dots[top])},
+    }
+
+
+def _score(body: dict) -> dict:
+    requested = np.asarray([int(wine_id) for wine_id in body.get('wine_ids', [])], dtype=np.int64)
+    requested = requested[(requested >= 1) & (requested <= NUM_WINES)]
+    dots = wine_embeddings[requested - 1] @ _user_embedding(body)
+    if body.get('format') == COMPACT_FORMAT:
+        return {'format': COMPACT_FORMAT, 'wine_ids': requested.tolist(), 'dot_products': dots.tolist()}
+    return {'dot_products': {str(wine_id): float(dot) for wine_id, dot in zip(requested, dots)}}
+
+
+@app.post('/wines')
+async def rank_wines(body: dict, limit: int = Query(10, ge=1)):
+    return _rank(body, limit)
+
+
+@app.post('/wines/score')
+async def score_wines(body: dict):
+    return _score(body)
+
+
+@app.post('/wines/batch')
+async def rank_wines_batch(body: dict):
+    return {'responses': [
+        {'status_code': 200, 'body': _rank(request['body'], int(request.get('params', {}).get('limit', 10)))}
+        for request in body.get('requests', [])
+    ]}
+
+
+@app.post('/wines/score/batch')
+async def score_wines_batch(body: dict):
+    return {'responses': [
+        {'status_code': 200, 'body': _score(request['body'])}
+        for request in body.get('requests', [])
+    ]}
+
+
+if __name__ == '__main__':
+    uvicorn.run(app, host='127.0.0.1', port=PORT, log_level='warning')
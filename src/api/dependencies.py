@@ -10,7 +10,10 @@ import typing
 
 import fastapi
 from sqlalchemy.orm import Session as SQLAlchemySession
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.config.manager import settings
 from src.repository.base import BaseRepository
+from src.repository.async_base import AsyncBaseRepository
 
 def get_db_session() -> typing.Generator[SQLAlchemySession, None, None]:
     """Synchronous session generator for dependency injection"""
@@ -39,6 +42,18 @@ def session_scope() -> typing.Generator[SQLAlchemySession, None, None]:
     finally:
         session.close()
 
+async def get_async_db_session() -> typing.AsyncGenerator[AsyncSession, None]:
+    """Asynchronous session generator for dependency injection (DB_ASYNC_ENABLED)"""
+    async with db.async_sessionmaker() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            print(f"Database error: {e}")
+            raise
+
+
 def get_repository(
     repo_type: typing.Type[BaseRepository],
 ) -> typing.Callable[[SQLAlchemySession], BaseRepository]:
@@ -47,4 +62,25 @@ def get_repository(
     ) -> BaseRepository:
         return repo_type(session=session)
 
-    return _get_repo
\ No newline at end of file
+    return _get_repo
+
+
+def get_async_repository(
+    repo_type: typing.Type[AsyncBaseRepository],
+) -> typing.Callable[..., AsyncBaseRepository]:
+    """
+    Like `get_repository`, for the awaitable repositories. Their session is an
+    `AsyncSession` when DB_ASYNC_ENABLED and the blocking sync session otherwise.
+    """
+    if settings.DB_ASYNC_ENABLED:
+        def _get_repo(
+            session: AsyncSession = fastapi.Depends(get_async_db_session),
+        ) -> AsyncBaseRepository:
+            return repo_type(session=session)
+    else:
+        def _get_repo(
+            session: SQLAlchemySession = fastapi.Depends(get_db_session),
+        ) -> AsyncBaseRepository:
+            return repo_type(session=session)
+
+    return _get_repo
@@ -4,6 +4,7 @@ from src.api.routes.users import router as users_router
 from src.api.routes.preferences import router as preferences_router
 from src.api.routes.wines import router as wines_router
 from src.api.routes.auth import router as auth_router, oauth2_scheme
+from src.utilities.metrics import metrics
 
 public_router = fastapi.APIRouter()
 router = fastapi.APIRouter(dependencies=[fastapi.Depends(oauth2_scheme)])
@@ -15,6 +16,10 @@ async def get_app_info():
         'version': '0.0.1',
     }
 
+@router.get('/metrics')
+async def get_metrics():
+    return metrics.snapshot()
+
 router.include_router(router=users_router)
 router.include_router(router=preferences_router)
 router.include_router(router=wines_router)
@@ -2,16 +2,16 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import HTTPBearer
 from src.utilities.supabase_client import supabase
 from src.models.schemas.user import UserCreate, UserLogin, LoginResponse, RefreshResponse, RefreshRequest
-from src.repository.users_repository import UsersRepository
-from src.api.dependencies import get_repository
-from src.repository.table_models import User as UserModel
+from src.repository.users_repository import AsyncUsersRepository
+from src.api.dependencies import get_async_repository
+from src.api.tasks.recommendation_warmup_task import RecommendationWarmupTask
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 @router.post("/register")
 async def register(
     user_data: UserCreate,
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository))
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository))
 ):
     supabase_user_id = None
     
@@ -36,23 +36,12 @@ async def register(
     
     # Now insert into PostgreSQL users table
     try:
-        # Check if user already exists in PostgreSQL
-        existing_user = users_repo.session.query(UserModel).filter(
-            UserModel.uid == supabase_user_id
-        ).first()
-        
-        if not existing_user:
-            new_user = UserModel(
-                uid=supabase_user_id,
-                email=user_data.email,
-                name=user_data.email.split('@')[0],
-                onboarding_completed=False
-            )
-            users_repo.session.add(new_user)
-            users_repo.session.commit()
-            
+        await users_repo.create_if_missing(
+            supabase_user_id,
+            email=user_data.email,
+            name=user_data.email.split('@')[0]
+        )
     except Exception as e:
-        users_repo.session.rollback()
         raise HTTPException(status_code=400, detail=f"Error al guardar usuario: {str(e)}")
 
     return {
@@ -64,7 +53,7 @@ async def register(
 @router.post("/login", response_model=LoginResponse)
 async def login(
     user_data: UserLogin,
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository))
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository))
 ):
     try:
         response = supabase.auth.sign_in_with_password({
@@ -77,12 +66,14 @@ async def login(
         user_id = response.user.id
         
         # Get user data from PostgreSQL instead of Supabase
-        user_row = users_repo.session.query(UserModel).filter(UserModel.uid == user_id).first()
+        user_row = await users_repo.get_user_row(user_id)
         if not user_row:
             raise HTTPException(status_code=404, detail="Usuario no encontrado en la base de datos.")
         
         onboarding_completed = user_row.onboarding_completed
         user_name = user_row.name
+        if onboarding_completed:
+            RecommendationWarmupTask.schedule(user_id)
             
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -4,13 +4,14 @@ from fastapi import UploadFile, File, Form, HTTPException, Depends, status
 import os
 from datetime import datetime
 
-from src.api.dependencies import get_repository
-from src.repository.users_repository import UsersRepository
+from src.api.dependencies import get_async_repository
+from src.repository.users_repository import AsyncUsersRepository, USER_FEATURE_PARTS
 from src.repository.wine_recommendations_repository import WineRecommendationsRepository
 from src.services.ocr_service import OCRService
 from src.services.menu_recommendation_service import MenuRecommendationService
 from src.models.schemas.menu import MenuRecommendationResponse, MenuWineRecommendation, MenuParseRequest
 import base64
+from starlette.concurrency import run_in_threadpool
 
 router = fastapi.APIRouter(prefix="/menu", tags=["menu"])
 
@@ -22,7 +23,7 @@ router = fastapi.APIRouter(prefix="/menu", tags=["menu"])
 )
 async def parse_menu_and_recommend(
     request: MenuParseRequest,
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository)),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
 ):
     """
     Upload a restaurant menu image and get personalized wine recommendations
@@ -36,7 +37,7 @@ async def parse_menu_and_recommend(
     """
     try:
         # Validate user exists
-        user = users_repo.get_user_by_id(request.user_id)
+        user = await users_repo.get_user_by_id(request.user_id, load=USER_FEATURE_PARTS)
         
         # Decode base64 image and save temporarily
         timestamp = datetime.now().timestamp()
@@ -62,7 +63,7 @@ async def parse_menu_and_recommend(
         # Step 2: Get user's top wine recommendations
         logging.info(f"Fetching top recommendations for user {request.user_id}")
         recommendations_repo = WineRecommendationsRepository()
-        top_wines = recommendations_repo.get_recommendations(user, limit=5)
+        top_wines = await run_in_threadpool(recommendations_repo.get_recommendations, user, 5)
         
         # Convert to dict format (handle both schema objects and dicts)
         top_wines_dict = []
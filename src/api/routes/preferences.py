@@ -2,11 +2,12 @@ import fastapi
 from fastapi import status, Depends, Path, HTTPException, Query
 from typing import List
 
-from src.api.dependencies import get_repository
-from src.repository.preferences_repository import PreferencesRepository
-from src.repository.users_repository import UsersRepository
+from src.api.dependencies import get_async_repository
+from src.repository.preferences_repository import AsyncPreferencesRepository
+from src.repository.users_repository import AsyncUsersRepository
 from src.models.schemas.preference import OnboardingPreferences, CategoryPreferences, UserPreferencesResponse, PreferenceAttributes
-from src.repository.table_models import User as UserModel
+from src.services.cache_invalidation import invalidate_user_caches
+from src.api.tasks.recommendation_warmup_task import RecommendationWarmupTask
 
 router = fastapi.APIRouter(prefix="/preferences", tags=["preferences"])
 
@@ -17,10 +18,10 @@ router = fastapi.APIRouter(prefix="/preferences", tags=["preferences"])
     status_code=status.HTTP_200_OK,
 )
 async def get_preference_options(
-    preferences_repo: PreferencesRepository = Depends(get_repository(repo_type=PreferencesRepository)),
+    preferences_repo: AsyncPreferencesRepository = Depends(get_async_repository(repo_type=AsyncPreferencesRepository)),
 ):
     """Obtener todas las opciones de preferencias disponibles"""
-    options = preferences_repo.get_options()
+    options = await preferences_repo.get_options()
     return [
         {
             "id": option.id,
@@ -43,32 +44,32 @@ async def get_preference_options(
 async def save_onboarding_preferences(
     preferences: OnboardingPreferences,
     user_id: str = Path(..., title="ID del usuario"),
-    preferences_repo: PreferencesRepository = Depends(get_repository(repo_type=PreferencesRepository)),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository)),
+    preferences_repo: AsyncPreferencesRepository = Depends(get_async_repository(repo_type=AsyncPreferencesRepository)),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
 ):
     """Guardar todas las preferencias del usuario durante el proceso de onboarding"""
     try:
         # Verificar que el usuario existe
-        user = users_repo.get_user_by_id(user_id)
+        if not await users_repo.exists(user_id):
+            raise KeyError('El usuario no existe')
         
         # Save preferences
-        result = preferences_repo.save_onboarding_preferences(
+        result = await preferences_repo.save_onboarding_preferences(
             user_id=user_id,
             preference_options=preferences.option_ids,
             weights=preferences.weights
         )
+        invalidate_user_caches(user_id)
         
         # Mark onboarding as completed
-        user_row = users_repo.session.query(UserModel).filter(UserModel.uid == user_id).first()
-        if user_row:
-            user_row.onboarding_completed = True
-            users_repo.session.commit()
+        if await users_repo.mark_onboarding_completed(user_id):
+            RecommendationWarmupTask.schedule(user_id)
         
         return {"success": result, "onboarding_completed": True}
     except KeyError as e:
         raise HTTPException(status_code=404, detail=f"Usuario no encontrado: {str(e)}")
     except Exception as e:
-        users_repo.session.rollback()
+        await users_repo.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.put(
@@ -80,20 +81,22 @@ async def update_category_preferences(
     preferences: CategoryPreferences,
     user_id: str = Path(..., title="ID del usuario"),
     category_id: int = Path(..., title="ID de la categoría"),
-    preferences_repo: PreferencesRepository = Depends(get_repository(repo_type=PreferencesRepository)),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository)),
+    preferences_repo: AsyncPreferencesRepository = Depends(get_async_repository(repo_type=AsyncPreferencesRepository)),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
 ):
     """Actualizar preferencias para una categoría específica"""
     try:
         # Verificar que el usuario existe
-        users_repo.get_user_by_id(user_id)
+        if not await users_repo.exists(user_id):
+            raise KeyError('El usuario no existe')
         
-        result = preferences_repo.update_category_preferences(
+        result = await preferences_repo.update_category_preferences(
             user_id=user_id,
             category_id=category_id,
             preference_options=preferences.option_ids,
             weights=preferences.weights
         )
+        invalidate_user_caches(user_id)
         return {"success": result}
     except KeyError as e:
         raise HTTPException(status_code=404, detail=f"Usuario o categoría no encontrados: {str(e)}")
@@ -108,16 +111,17 @@ async def update_category_preferences(
 )
 async def get_user_preference_attributes(
     user_id: str = Path(..., title="ID del usuario"),
-    preferences_repo: PreferencesRepository = Depends(get_repository(repo_type=PreferencesRepository)),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository)),
+    preferences_repo: AsyncPreferencesRepository = Depends(get_async_repository(repo_type=AsyncPreferencesRepository)),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
 ):
     """Obtener las preferencias de un usuario en formato agrupado para el modelo ML"""
     try:
         # Verificar que el usuario existe
-        users_repo.get_user_by_id(user_id)
+        if not await users_repo.exists(user_id):
+            raise KeyError('El usuario no existe')
         
         # Obtener preferencias en formato agrupado
-        preference_attributes = preferences_repo.get_user_preference_attributes(user_id)
+        preference_attributes = await preferences_repo.get_user_preference_attributes(user_id)
         
         return UserPreferencesResponse(
             user_id=user_id,
@@ -135,16 +139,17 @@ async def get_user_preference_attributes(
 )
 async def get_user_preferences(
     user_id: str = Path(..., title="ID del usuario"),
-    preferences_repo: PreferencesRepository = Depends(get_repository(repo_type=PreferencesRepository)),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository)),
+    preferences_repo: AsyncPreferencesRepository = Depends(get_async_repository(repo_type=AsyncPreferencesRepository)),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
 ):
     """Obtener las preferencias de un usuario específico"""
     try:
         # Verificar que el usuario existe
-        users_repo.get_user_by_id(user_id)
+        if not await users_repo.exists(user_id):
+            raise KeyError('El usuario no existe')
         
         # Obtener preferencias en formato agrupado (como el modelo espera)
-        preference_attributes = preferences_repo.get_user_preference_attributes(user_id)
+        preference_attributes = await preferences_repo.get_user_preference_attributes(user_id)
         
         return UserPreferencesResponse(
             user_id=user_id,
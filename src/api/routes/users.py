@@ -1,31 +1,105 @@
+import asyncio
 import fastapi
+import json
 import logging
-from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import status, Depends, Path, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer
+from starlette.concurrency import run_in_threadpool
 
-from src.api.dependencies import get_repository
+from src.api.dependencies import get_async_repository
 from src.api.routes.auth import verify_token, oauth2_scheme
-from src.repository.users_repository import UsersRepository
-from src.repository.preferences_repository import PreferencesRepository
+from src.repository.users_repository import AsyncUsersRepository, USER_FEATURE_PARTS
+from src.repository.preferences_repository import AsyncPreferencesRepository
 from src.repository.wines_repository import WinesRepository
 from src.repository.wine_recommendations_repository import WineRecommendationsRepository
-from src.repository.ratings_repository import WineRatingsRepository
-from src.utilities.supabase_client import supabase
+from src.repository.user_recommendations_repository import AsyncUserRecommendationsRepository
+from src.config.manager import settings
+from src.repository.ratings_repository import AsyncWineRatingsRepository
+from src.services.cache_invalidation import invalidate_user_caches
+from src.services.recommendation_cache_service import recommendation_cache
+from src.utilities.metrics import metrics
 
 from src.models.schemas.user import UserPreferences, UserInfo, UserWineRating, UserFavoriteWines
 from src.models.schemas.wine import WineFavorites, WineTasted
 from src.models.schemas.recommendations import WineRecommendations
 
 from src.api.tasks.summarize_task import SummarizeTask
+from src.api.tasks.recommendation_warmup_task import RecommendationWarmupTask
 
 router = fastapi.APIRouter(prefix="/users", tags=["users"])
 
-# Cache for recommendations: {user_id: (recommendations, timestamp)}
-_recommendations_cache = {}
-CACHE_EXPIRY_MINUTES = 30  # Cache recommendations for 30 minutes
+STREAM_CHUNK_SIZE = 25  # Wines hydrated per query while streaming
+STREAM_BUFFER_CHUNKS = 2  # Hydrated chunks waiting to be written, at most
+
+
+async def _get_ranked_recommendations(
+    user_id: str,
+    limit: int,
+    filters: dict,
+    use_cache: bool,
+    users_repo: AsyncUsersRepository,
+    precomputed_repo: AsyncUserRecommendationsRepository,
+    recommendations_repo: WineRecommendationsRepository,
+):
+    """Ranked list covering `limit` wines, from the recommendation cache or computed (and cached) now."""
+    # Ranked list cached for this user and filters (or warmed up in the background);
+    # deriving a filtered list may (re)load the wine catalog, so it runs off the event loop
+    ranked = await run_in_threadpool(recommendation_cache.get, user_id, filters, limit) if use_cache else None
+    if ranked:
+        logging.info(f"Returning cached recommendations for user {user_id}")
+        return ranked
+
+    generation = recommendation_cache.generation(user_id)
+    user = await users_repo.get_user_by_id(user_id, load=USER_FEATURE_PARTS)
+    # Ranked list from the nightly job; the model is only called if it is stale or too short
+    precomputed = await precomputed_repo.get_by_user_id(user_id, settings.PRECOMPUTED_RECOMMENDATIONS_MAX_AGE_HOURS) if use_cache else None
+    depth = max(limit, recommendation_cache.PAGING_DEPTH)
+    # Off the event loop, so concurrent requests reach the model (and its batch dispatcher) together
+    ranked = await run_in_threadpool(recommendations_repo.rank_recommendations, user, depth, filters, precomputed)
+    recommendation_cache.put(user_id, filters, ranked, generation)
+    logging.info(f"Cached recommendations for user {user_id}")
+    return ranked
+
+
+async def _stream_recommendations(ranked, limit: int):
+    """
+    Yield one NDJSON line per recommended wine, hydrating the ranked list in chunks.
+
+    A producer hydrates the next chunks while the current one is written; the
+    queue between them holds at most STREAM_BUFFER_CHUNKS chunks, so memory
+    does not grow with `limit`. If hydration fails the stream ends with an
+    `{"error": ...}` line, so clients can tell a truncated list from a complete one.
+    """
+    buffer = asyncio.Queue(maxsize=STREAM_BUFFER_CHUNKS)
+
+    async def produce():
+        offset = sent = 0
+        try:
+            while sent < limit and offset < len(ranked.wine_ids):
+                wines, offset = await run_in_threadpool(
+                    WineRecommendationsRepository.hydrate_recommendations,
+                    ranked, min(STREAM_CHUNK_SIZE, limit - sent), offset
+                )
+                sent += len(wines)
+                await buffer.put(wines)
+        except Exception as e:
+            logging.error(f"Error streaming recommendations: {str(e)}")
+            await buffer.put(e)
+        await buffer.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (wines := await buffer.get()) is not None:
+            if isinstance(wines, Exception):
+                yield json.dumps({'error': 'Error al obtener las recomendaciones, la lista está incompleta'}) + "\n"
+                break
+            for wine in wines:
+                yield wine.model_dump_json(by_alias=True) + "\n"
+    finally:
+        producer.cancel()
 
 @router.get(
     '/recommendations',
@@ -43,51 +117,66 @@ async def get_wine_recommendations(
     country: str = Query(None, description="Country of wine to filter recommendations"),
     abv: float = Query(None, description="Alcohol by volume to filter recommendations"),
     use_cache: bool = Query(True, description="Whether to use cached recommendations if available"),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository)),
-    preferences_repo: PreferencesRepository = Depends(get_repository(repo_type=PreferencesRepository)),
+    cursor: str = Query(None, description="next_cursor of the previous page, to keep paging through the same ranking"),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
+    preferences_repo: AsyncPreferencesRepository = Depends(get_async_repository(repo_type=AsyncPreferencesRepository)),
+    precomputed_repo: AsyncUserRecommendationsRepository = Depends(get_async_repository(repo_type=AsyncUserRecommendationsRepository)),
 ):
     try:
-        # Create cache key based on user_id and filters
-        cache_key = f"{user_id}_{limit}_{wine_type}_{body}_{dryness}_{country}_{abv}"
-        
-        # Check if we have cached recommendations
-        if use_cache and cache_key in _recommendations_cache:
-            cached_data, timestamp = _recommendations_cache[cache_key]
-            
-            # Check if cache is still valid
-            if datetime.now() - timestamp < timedelta(minutes=CACHE_EXPIRY_MINUTES):
-                logging.info(f"Returning cached recommendations for user {user_id}")
-                return cached_data
-            else:
-                # Cache expired, remove it
-                logging.info(f"Cache expired for user {user_id}, fetching new recommendations")
-                del _recommendations_cache[cache_key]
-        
-        # Get fresh recommendations
         recommendations_repo = WineRecommendationsRepository()
-        user = users_repo.get_user_by_id(user_id)
-        recommended_wines = recommendations_repo.get_recommendations(
-            user,
-            limit,
-            wine_type=wine_type,
-            body=body,
-            dryness=dryness,
-            country=country,
-            abv=abv
-        )
-        
+        filters = recommendations_repo.recommendation_filters(wine_type, body, dryness, country, abv)
+
+        offset = 0
+        if cursor:
+            # Later pages are slices of the ranking held since the first page
+            paged = recommendation_cache.get_by_cursor(user_id, filters, cursor)
+            if not paged:
+                raise HTTPException(status_code=410, detail="El cursor expiró, vuelva a pedir la primera página")
+            ranked, offset = paged
+        else:
+            ranked = await _get_ranked_recommendations(
+                user_id, limit, filters, use_cache, users_repo, precomputed_repo, recommendations_repo
+            )
+
+        recommended_wines, next_offset = await run_in_threadpool(recommendations_repo.hydrate_recommendations, ranked, limit, offset)
         result = WineRecommendations(
             user_id=user_id,
-            recommendations=recommended_wines
+            recommendations=recommended_wines,
+            next_cursor=recommendation_cache.encode_cursor(ranked, next_offset) if next_offset < len(ranked.wine_ids) else None
         )
-        
-        # Cache the result
-        _recommendations_cache[cache_key] = (result, datetime.now())
-        logging.info(f"Cached recommendations for user {user_id}")
-        
         return result
     except KeyError as e:
         raise HTTPException(status_code=500, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get(
+    '/recommendations/stream',
+    summary='Stream wine recommendations for a specific user as NDJSON',
+    name='recommendations:stream-user-recommendations',
+    status_code=status.HTTP_200_OK,
+)
+async def stream_wine_recommendations(
+    user_id: str = Query(..., description="ID of the user to get recommendations for"),
+    limit: int = Query(10, description="Maximum number of recommendations to return", ge=1, le=999),
+    wine_type: str = Query(None, description="Type of wine to filter recommendations (e.g. tinto, blanco, rosado)"),
+    body: str = Query(None, description="Body of wine to filter recommendations (e.g. ligero, medio, robusto)"),
+    dryness: str = Query(None, description="Dryness of wine to filter recommendations (e.g. seco, semi-seco, dulce)"),
+    country: str = Query(None, description="Country of wine to filter recommendations"),
+    abv: float = Query(None, description="Alcohol by volume to filter recommendations"),
+    use_cache: bool = Query(True, description="Whether to use cached recommendations if available"),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
+    precomputed_repo: AsyncUserRecommendationsRepository = Depends(get_async_repository(repo_type=AsyncUserRecommendationsRepository)),
+):
+    try:
+        recommendations_repo = WineRecommendationsRepository()
+        filters = recommendations_repo.recommendation_filters(wine_type, body, dryness, country, abv)
+        ranked = await _get_ranked_recommendations(
+            user_id, limit, filters, use_cache, users_repo, precomputed_repo, recommendations_repo
+        )
+    except KeyError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(_stream_recommendations(ranked, limit), media_type="application/x-ndjson")
 
 @router.get(
     '/{user_id}',
@@ -98,10 +187,10 @@ async def get_wine_recommendations(
 )
 async def get_user_info(
     user_id: str = Path(..., title="The ID of the account to get the info"),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository)),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
 ):
     try:
-        user = users_repo.get_user_by_id(user_id)
+        user = await users_repo.get_user_header(user_id)
         return UserInfo(uid=user.uid_to_str(), username=user.username, email=user.email, onboarding_completed=user.onboarding_completed)
     except KeyError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -116,15 +205,18 @@ async def get_user_info(
 async def update_user_preferences(
     user_preferences: UserPreferences,
     user_id: str = Path(..., title="The ID of the account to update"),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository)),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
 ):
     try:
-        user = users_repo.get_user_by_id(user_id)
+        # Preferences are replaced, favorites are read by save and ratings are part of the response
+        user = await users_repo.get_user_by_id(user_id, load=('favorites', 'ratings'))
     except KeyError as e:
         raise HTTPException(status_code=404, detail=str(e))
     user.username = user_preferences.name
     user.add_preferences(user_preferences.list_values())
-    return users_repo.save(user)
+    saved_user = await users_repo.save(user)
+    invalidate_user_caches(user_id)
+    return saved_user
 
 @router.get(
     '/{user_id}/wines/status',
@@ -135,10 +227,10 @@ async def update_user_preferences(
 )
 async def get_user_favorites(
     user_id: str = Path(..., title="The ID of the user getting the favorites"),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository)),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
 ):
     try:
-        user = users_repo.get_user_by_id(user_id)
+        user = await users_repo.get_user_by_id(user_id, load=('favorites', 'ratings'))
         return UserFavoriteWines(favorite_wines=[
             WineFavorites(
                 id=wine.id,
@@ -179,10 +271,10 @@ async def get_user_favorites(
 async def get_user_rating(
     user_id: str = Path(..., title="The ID of the user getting the favorites"),
     wine_id: int = Path(..., title="The ID of the wine"),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository)),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
 ):
     try:
-        user = users_repo.get_user_by_id(user_id)
+        user = await users_repo.get_user_by_id(user_id, load=('favorites', 'ratings'))
         rating = user.get_ratings(wine_id)
         if not rating:
             tasted = False
@@ -214,17 +306,22 @@ async def get_user_rating(
 async def post_user_rating(
     user_rating: UserWineRating,
     user_id: str = Path(..., title="The ID of the user posting the rating"),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository)),
-    ratings_repo: WineRatingsRepository = Depends(get_repository(repo_type=WineRatingsRepository)),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
+    ratings_repo: AsyncWineRatingsRepository = Depends(get_async_repository(repo_type=AsyncWineRatingsRepository)),
     summarizer: SummarizeTask = Depends(SummarizeTask),
 ):
     try:
-        user = users_repo.get_user_by_id(user_id)
-        wine = WinesRepository().get_by_id(user_rating.wine)
+        user = await users_repo.get_user_header(user_id)
+        wine = await run_in_threadpool(WinesRepository().get_by_id, user_rating.wine)
         rating = user.rate_wine(wine, user_rating.rating, user_rating.review)
-        if ratings_repo.save(rating):
+        write = await ratings_repo.save(rating)
+        if write:
+            logging.info(f"Rating of wine {wine.wine_id} by user {user_id} {write.value}")
+            metrics.increment(f"ratings_{write.value}_total")
+            invalidate_user_caches(user_id)
+            RecommendationWarmupTask.schedule(user_id)
             if user_rating.review:
-                all_ratings = ratings_repo.get_by_wine_id(wine.wine_id)
+                all_ratings = await ratings_repo.get_by_wine_id(wine.wine_id)
                 summarizer.schedule_summary(wine.wine_id, all_ratings)
                 return
         else:
@@ -244,14 +341,14 @@ async def post_user_rating(
 async def post_user_favorite(
     user_id: str = Path(..., title="The ID of the user posting the favorite wine"),
     wine_id: int = Path(..., title="The ID of the wine marked as favorite"),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository))
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository))
 ):
     try:
         wines_repo = WinesRepository()
-        user = users_repo.get_user_by_id(user_id)
-        wine = wines_repo.get_by_id(wine_id)
+        user = await users_repo.get_user_by_id(user_id, load=('favorites',))
+        wine = await run_in_threadpool(wines_repo.get_by_id, wine_id)
         user.add_favorite(wine)
-        users_repo.save(user)
+        await users_repo.save(user)
     except KeyError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
@@ -267,31 +364,31 @@ async def post_user_favorite(
 async def delete_user_favorite(
     user_id: str = Path(..., title="The ID of the user deleting the favorite wine"),
     wine_id: int = Path(..., title="The ID of the wine marked as favorite"),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository))
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository))
 ):
     try:
-        user = users_repo.get_user_by_id(user_id)
-        users_repo.delete_favorite_wine(user, wine_id)
+        user = await users_repo.get_user_by_id(user_id, load=('favorites',))
+        await users_repo.delete_favorite_wine(user, wine_id)
     except KeyError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/complete-onboarding")
-async def complete_onboarding(token: HTTPBearer = Depends(oauth2_scheme)):
+async def complete_onboarding(
+    token: HTTPBearer = Depends(oauth2_scheme),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository)),
+):
     try:
         # Verificar el token y obtener el usuario
         user = verify_token(token.credentials)
         user_id = user.id
         
         # Actualizar el campo onboarding_completed a True
-        response = supabase.table("users").update(
-            {"onboarding_completed": True}
-        ).eq("uid", user_id).execute()
-        
-        if not response.data:
+        if not await users_repo.mark_onboarding_completed(user_id):
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
-            
+
+        RecommendationWarmupTask.schedule(user_id)
         return {"message": "Onboarding completado exitosamente"}
         
     except HTTPException as e:
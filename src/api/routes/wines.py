@@ -2,15 +2,34 @@ import fastapi
 import logging
 import math
 from fastapi import status, HTTPException, Path, Query, Depends
-from src.models.schemas.wine import WineSchema, WineFilters, PaginatedWineResponse
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from src.models.schemas.wine import WineSchema, WineFilters, PaginatedWineResponse, WineFacetsResponse, FacetCount
 from src.repository.wines_repository import WinesRepository
 from src.repository.wine_recommendations_repository import WineRecommendationsRepository
-from src.repository.users_repository import UsersRepository
-from src.api.dependencies import get_repository
+from src.repository.users_repository import AsyncUsersRepository, USER_FEATURE_PARTS
+from src.api.dependencies import get_async_repository
+from src.api.tasks.score_enrichment_task import ScoreEnrichmentTask
+from src.services.ranked_search_service import ranked_search
+from src.services.search_count_service import search_counts
+from src.services.wine_search_index import wine_search_index
+from src.services.wine_facets_service import wine_facets
+from src.config.manager import settings
+from src.services.cache_invalidation import invalidate_wine_caches
+from src.utilities.cursor import decode_cursor, encode_cursor
 
 router = fastapi.APIRouter(prefix="/wines", tags=["wines"])
 repo = WinesRepository()
 
+
+def _decode_search_cursor(cursor: str) -> tuple[str, int]:
+    payload = decode_cursor(cursor)
+    try:
+        return str(payload['n']), int(payload['i'])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Cursor inválido: {e}")
+
+
 @router.get(
     "/search",
     summary="Get wines by filters with pagination and optional compatibility scoring",
@@ -18,6 +37,7 @@ repo = WinesRepository()
     status_code=status.HTTP_200_OK,
 )
 async def get_wine_by_name(
+    q: str = Query(None, description="Full-text search across name, winery, grapes, region and pairings, ranked by relevance"),
     wine_name: str = Query(None, description="Wine name"),
     wine_type: str = Query(None, description="Type of wine"),
     winery: str = Query(None, description="Name of winery"),
@@ -26,9 +46,13 @@ async def get_wine_by_name(
     min_abv: float = Query(None, description="Minimum ABV"),
     max_abv: float = Query(None, description="Maximum ABV"),
     page: int = Query(1, ge=1, description="Page number (starting from 1)"),
+    cursor: str = Query(None, description="next_cursor of the previous page; pages by keyset instead of page number"),
     page_size: int = Query(20, ge=1, le=100, description="Number of items per page"),
     user_id: str = Query(None, description="User ID for compatibility scoring (optional)"),
-    users_repo: UsersRepository = Depends(get_repository(repo_type=UsersRepository))
+    deferred_scores: bool = Query(False, description="Return the page right away and deliver scores through /wines/search/scores"),
+    sort: str = Query("name", pattern="^(name|score)$", description="Sort by wine name or by compatibility score (requires user_id)"),
+    match: str = Query("contains", pattern="^(contains|similar)$", description="Match names containing the search, or also similar (misspelled) names ranked by similarity"),
+    users_repo: AsyncUsersRepository = Depends(get_async_repository(repo_type=AsyncUsersRepository))
 ):
     try:
         filters = WineFilters(
@@ -38,29 +62,75 @@ async def get_wine_by_name(
             country=country,
             region=region,
             min_abv=min_abv,
-            max_abv=max_abv
+            max_abv=max_abv,
+            q=q
         )
 
         # Calculate offset from page number
         offset = (page - 1) * page_size
 
-        # Get paginated wines and total count
-        wines, total = repo.get_by_filters(filters, limit=page_size, offset=offset)
+        # Keyset pagination follows the (wine_name, wine_id) order, so it only applies to plain name-ordered searches
+        keyset_enabled = sort == "name" and not q and match == "contains"
+        after = None
+        if cursor:
+            if not keyset_enabled:
+                raise ValueError("Cursor pagination requires sort=name without q or match=similar")
+            after = _decode_search_cursor(cursor)
+            offset = 0
+
+        scoring_token = None
+        is_estimate = False
 
-        # If user_id is provided, enrich wines with compatibility scores
-        if user_id and wines:
+        if sort == "score":
+            if not user_id:
+                raise ValueError("Sorting by score requires a user_id")
+            # Page through a ranked window that is scored once per user and filter set
+            ranked_wines = ranked_search.get_cached_window(user_id, filters)
+            if ranked_wines is None:
+                user = await users_repo.get_user_by_id(user_id, load=USER_FEATURE_PARTS)
+                ranked_wines = await run_in_threadpool(ranked_search.get_ranked_window, user_id, filters, lambda: user)
+            wines = ranked_wines[offset:offset + page_size]
+            # Only the top CANDIDATE_WINDOW wines can be paged by score, but total counts every match
+            has_more = offset + page_size < len(ranked_wines)
+            try:
+                total, is_estimate = await run_in_threadpool(search_counts.count, filters, match)
+                total = max(total, len(ranked_wines))
+            except Exception as e:
+                logging.error(f"Error counting search results: {str(e)}")
+                total, is_estimate = len(ranked_wines), True
+        elif settings.WINE_SEARCH_INDEX_ENABLED and (indexed := await run_in_threadpool(wine_search_index.search, filters, page_size, offset, match, after)) is not None:
+            # Served from the in-memory index, which also knows the exact total
+            wine_ids, total, has_more = indexed
+            wines = await run_in_threadpool(repo.get_by_ids, wine_ids)
+        else:
+            # Get paginated wines; the page itself only tells whether there is a next one
+            wines, page_total = await run_in_threadpool(repo.get_by_filters, filters, page_size, offset, match, after)
+            has_more = page_total > offset + len(wines)
+            try:
+                total, is_estimate = await run_in_threadpool(search_counts.count, filters, match)
+                # An estimate can fall short of the rows already seen
+                total = max(total, offset + len(wines) + (1 if has_more else 0))
+            except Exception as e:
+                logging.error(f"Error counting search results: {str(e)}")
+                total = page_total
+
+        # If user_id is provided, enrich wines with compatibility scores (score-sorted pages already have them)
+        needs_scores = user_id and wines and sort != "score"
+        if needs_scores and deferred_scores:
+            scoring_token = ScoreEnrichmentTask.schedule(user_id, [wine.wine_id for wine in wines])
+        elif needs_scores:
             try:
                 logging.info(f"Enriching {len(wines)} wines with compatibility scores for user {user_id}")
 
                 # Get user (using injected repository)
-                user = users_repo.get_user_by_id(user_id)
+                user = await users_repo.get_user_by_id(user_id, load=USER_FEATURE_PARTS)
 
                 # Get wine IDs from current page
                 wine_ids = [wine.wine_id for wine in wines]
 
-                # Get scores from Cloud Run
+                # Get scores from Cloud Run, off the event loop so concurrent searches share model batches
                 recommendations_repo = WineRecommendationsRepository()
-                scores = recommendations_repo.get_wine_scores(user, wine_ids)
+                scores = await run_in_threadpool(recommendations_repo.get_wine_scores, user, wine_ids)
 
                 # Attach scores to wines
                 for wine in wines:
@@ -81,9 +151,15 @@ async def get_wine_by_name(
 
         # Calculate pagination metadata
         total_pages = math.ceil(total / page_size) if total > 0 else 0
-        has_next = page < total_pages
+        has_next = has_more
         has_previous = page > 1
 
+        next_cursor = None
+        if keyset_enabled and wines and has_more:
+            next_cursor = encode_cursor({'n': wines[-1].wine_name, 'i': wines[-1].wine_id})
+        if cursor:
+            has_next = next_cursor is not None
+
         return PaginatedWineResponse(
             items=wines,
             total=total,
@@ -91,11 +167,16 @@ async def get_wine_by_name(
             page_size=page_size,
             total_pages=total_pages,
             has_next=has_next,
-            has_previous=has_previous
+            has_previous=has_previous,
+            scoring_token=scoring_token,
+            next_cursor=next_cursor,
+            is_estimate=is_estimate
         )
 
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logging.error(f"Error retrieving wines: {str(e)}")
         raise HTTPException(
@@ -103,6 +184,62 @@ async def get_wine_by_name(
             detail="Internal server error while retrieving wines"
         )
 
+@router.get(
+    "/search/scores",
+    summary="Stream compatibility scores for a search page as NDJSON",
+    status_code=status.HTTP_200_OK,
+)
+async def get_search_scores(
+    token: str = Query(..., description="Scoring token returned by /wines/search with deferred_scores=true"),
+):
+    try:
+        scores = ScoreEnrichmentTask.stream_scores(token)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(scores, media_type="application/x-ndjson")
+
+@router.get(
+    "/facets",
+    summary="Count wines per type, country, region, body and ABV bucket for a /wines/search filter set",
+    response_model=WineFacetsResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def get_wine_facets(
+    wine_name: str = Query(None, description="Wine name"),
+    wine_type: str = Query(None, description="Type of wine"),
+    winery: str = Query(None, description="Name of winery"),
+    country: str = Query(None, description="Country of origin"),
+    region: str = Query(None, description="Region of origin"),
+    min_abv: float = Query(None, description="Minimum ABV"),
+    max_abv: float = Query(None, description="Maximum ABV"),
+    q: str = Query(None, description="Full-text search; not supported here, rejected with 400"),
+):
+    try:
+        # Same filter set, matched the same way, as /wines/search
+        filters = WineFilters(
+            wine_name=wine_name,
+            wine_type=wine_type,
+            winery=winery,
+            country=country,
+            region=region,
+            min_abv=min_abv,
+            max_abv=max_abv,
+            q=q
+        )
+        total, counts = await run_in_threadpool(wine_facets.get, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error computing wine facets: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error while computing wine facets")
+    return WineFacetsResponse(
+        total=total,
+        facets={
+            facet: [FacetCount(value=value, count=count) for value, count in values.items()]
+            for facet, values in counts.items()
+        },
+    )
+
 @router.get(
     "/{wine_id}",
     summary="Get wine by wine_id",
@@ -110,7 +247,7 @@ async def get_wine_by_name(
     status_code=status.HTTP_200_OK,
 )
 async def get_wine_by_id(wine_id: int = Path(..., description="Wine ID")):
-    wine = repo.get_by_id(wine_id)
+    wine = await run_in_threadpool(repo.get_by_id, wine_id)
     if not wine:
         raise HTTPException(status_code=404, detail="Wine not found")
     return wine
@@ -122,9 +259,10 @@ async def get_wine_by_id(wine_id: int = Path(..., description="Wine ID")):
     status_code=status.HTTP_201_CREATED,
 )
 async def create_wine(wine: WineSchema):
-    new_wine = repo.create(wine)
+    new_wine = await run_in_threadpool(repo.create, wine)
     if not new_wine:
         raise HTTPException(status_code=400, detail="Wine not created")
+    await run_in_threadpool(invalidate_wine_caches, new_wine.wine_id, new_wine)
     return new_wine
 
 @router.put(
@@ -134,9 +272,10 @@ async def create_wine(wine: WineSchema):
     status_code=status.HTTP_200_OK,
 )
 async def update_wine(wine_id: int, wine_data: dict):
-    updated_wine = repo.update_by_id(wine_id, wine_data)
+    updated_wine = await run_in_threadpool(repo.update_by_id, wine_id, wine_data)
     if not updated_wine:
         raise HTTPException(status_code=404, detail="Wine not updated")
+    await run_in_threadpool(invalidate_wine_caches, wine_id, updated_wine)
     return updated_wine
 
 @router.delete(
@@ -145,7 +284,8 @@ async def update_wine(wine_id: int, wine_data: dict):
     status_code=status.HTTP_204_NO_CONTENT,
 )
 async def delete_wine(wine_id: int):
-    success = repo.delete_by_id(wine_id)
+    success = await run_in_threadpool(repo.delete_by_id, wine_id)
     if not success:
         raise HTTPException(status_code=404, detail="Wine not deleted")
+    await run_in_threadpool(invalidate_wine_caches, wine_id)
     return None
\ No newline at end of file
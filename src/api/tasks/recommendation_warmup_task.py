@@ -0,0 +1,81 @@
+import asyncio
+import logging
+
+from starlette.concurrency import run_in_threadpool
+
+from src.api.dependencies import session_scope
+from src.config.manager import settings
+from src.repository.user_recommendations_repository import UserRecommendationsRepository
+from src.repository.users_repository import UsersRepository, USER_FEATURE_PARTS
+from src.repository.wine_recommendations_repository import WineRecommendationsRepository
+from src.services.recommendation_cache_service import recommendation_cache
+from src.utilities.metrics import metrics
+
+
+class RecommendationWarmupTask:
+    """
+    Computes the unfiltered ranked recommendation list of a user in the
+    background, after the events that usually precede asking for
+    recommendations (login, onboarding, rating a wine).
+
+    Warm-ups are deduplicated per user: a request for a user already being
+    warmed up only marks it to run once more afterwards, so the list reflects
+    the latest change. At most MAX_CONCURRENT_WARMUPS run at the same time.
+    """
+    MAX_CONCURRENT_WARMUPS = 4
+
+    _in_flight = set()
+    _rerun = set()
+    _tasks = set()
+    _semaphore = None
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(cls.MAX_CONCURRENT_WARMUPS)
+        return cls._semaphore
+
+    @classmethod
+    def _warm(cls, user_id: str):
+        generation = recommendation_cache.generation(user_id)
+        with session_scope() as session:
+            user = UsersRepository(session).get_user_by_id(user_id, load=USER_FEATURE_PARTS)
+            precomputed = UserRecommendationsRepository(session).get_by_user_id(
+                user_id, settings.PRECOMPUTED_RECOMMENDATIONS_MAX_AGE_HOURS
+            )
+        if not user.onboarding_completed:
+            logging.info(f'Usuario {user_id} sin onboarding completo, no se precalculan recomendaciones')
+            return
+        filters = WineRecommendationsRepository.recommendation_filters()
+        ranked = WineRecommendationsRepository().rank_recommendations(user, recommendation_cache.PAGING_DEPTH, filters, precomputed)
+        recommendation_cache.put(user_id, filters, ranked, generation)
+        logging.info(f'Recomendaciones del usuario {user_id} precalculadas: {len(ranked.wine_ids)} vinos')
+
+    @classmethod
+    async def _run(cls, user_id: str):
+        try:
+            while True:
+                cls._rerun.discard(user_id)
+                async with cls._get_semaphore():
+                    try:
+                        await run_in_threadpool(cls._warm, user_id)
+                        metrics.increment('recommendations_warmups_total')
+                    except Exception as e:
+                        metrics.increment('recommendations_warmup_errors_total')
+                        logging.error(f'Error precalculando recomendaciones del usuario {user_id}: {str(e)}')
+                if user_id not in cls._rerun:
+                    break
+        finally:
+            cls._in_flight.discard(user_id)
+
+    @classmethod
+    def schedule(cls, user_id: str):
+        """Start warming up the recommendations of a user unless it is already under way."""
+        if user_id in cls._in_flight:
+            cls._rerun.add(user_id)
+            metrics.increment('recommendations_warmups_deduplicated_total')
+            return
+        cls._in_flight.add(user_id)
+        task = asyncio.create_task(cls._run(user_id))
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
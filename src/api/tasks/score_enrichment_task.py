@@ -0,0 +1,134 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+from datetime import datetime, timedelta
+
+from starlette.concurrency import run_in_threadpool
+
+from src.api.dependencies import session_scope
+from src.config.manager import settings
+from src.repository.users_repository import UsersRepository, USER_FEATURE_PARTS
+from src.repository.wine_recommendations_repository import WineRecommendationsRepository
+
+
+class ScoreEnrichmentTask:
+    """
+    Computes compatibility scores for a search page after the page itself has
+    been returned.
+
+    The scoring token is self-contained (it carries the user, the wine IDs
+    and its expiry), so a worker that did not schedule the job can still
+    compute the scores. It is signed with an HMAC of SCORING_TOKEN_SECRET,
+    so clients cannot forge one for another user or more wines. Jobs started
+    by this worker are awaited instead of recomputed.
+    """
+    TOKEN_EXPIRY_MINUTES = 5
+    # Same bound as the page_size of /wines/search
+    MAX_WINES = 100
+
+    # {job_id: (asyncio.Task, timestamp)}
+    _jobs = {}
+    _secret = None
+
+    @classmethod
+    def _get_secret(cls) -> bytes:
+        if cls._secret is None:
+            if settings.SCORING_TOKEN_SECRET:
+                cls._secret = settings.SCORING_TOKEN_SECRET.encode('utf-8')
+            else:
+                logging.warning('SCORING_TOKEN_SECRET no configurado: los tokens de scoring solo valen en este worker')
+                cls._secret = secrets.token_bytes(32)
+        return cls._secret
+
+    @classmethod
+    def _sign(cls, message: str) -> str:
+        digest = hmac.new(cls._get_secret(), message.encode('utf-8'), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).decode('ascii').rstrip('=')
+
+    @classmethod
+    def _encode_token(cls, job_id: str, user_id: str, wine_ids: list[int]) -> str:
+        expires = int(time.time()) + cls.TOKEN_EXPIRY_MINUTES * 60
+        payload = json.dumps({'u': user_id, 'w': wine_ids, 'e': expires}, separators=(',', ':')).encode('utf-8')
+        message = f"{job_id}.{base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')}"
+        return f"{message}.{cls._sign(message)}"
+
+    @classmethod
+    def _decode_token(cls, token: str) -> tuple[str, str, list[int]]:
+        try:
+            message, signature = token.rsplit('.', 1)
+            if not hmac.compare_digest(signature, cls._sign(message)):
+                raise ValueError('firma incorrecta')
+            job_id, encoded = message.split('.', 1)
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            user_id, wine_ids, expires = str(payload['u']), [int(wine_id) for wine_id in payload['w']], int(payload['e'])
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f'Token de scoring inválido: {e}')
+        if expires < time.time():
+            raise ValueError('Token de scoring expirado')
+        if len(wine_ids) > cls.MAX_WINES:
+            raise ValueError(f'Token de scoring inválido: más de {cls.MAX_WINES} vinos')
+        return job_id, user_id, wine_ids
+
+    @staticmethod
+    def _score(user_id: str, wine_ids: list[int]) -> dict[str, float]:
+        with session_scope() as session:
+            user = UsersRepository(session).get_user_by_id(user_id, load=USER_FEATURE_PARTS)
+        return WineRecommendationsRepository().get_wine_scores(user, wine_ids)
+
+    @classmethod
+    def _discard_expired_jobs(cls):
+        expiry = datetime.now() - timedelta(minutes=cls.TOKEN_EXPIRY_MINUTES)
+        for job_id, (_, timestamp) in list(cls._jobs.items()):
+            if timestamp < expiry:
+                del cls._jobs[job_id]
+
+    @classmethod
+    def schedule(cls, user_id: str, wine_ids: list[int]) -> str:
+        """Start scoring the given wines in the background and return the scoring token."""
+        if len(wine_ids) > cls.MAX_WINES:
+            raise ValueError(f'No se pueden puntuar más de {cls.MAX_WINES} vinos a la vez')
+        cls._discard_expired_jobs()
+        job_id = secrets.token_urlsafe(8)
+        task = asyncio.create_task(run_in_threadpool(cls._score, user_id, wine_ids))
+        cls._jobs[job_id] = (task, datetime.now())
+        logging.info(f'Scheduled deferred scoring {job_id} of {len(wine_ids)} wines for user {user_id}')
+        return cls._encode_token(job_id, user_id, wine_ids)
+
+    @classmethod
+    async def _get_scores(cls, job_id: str, user_id: str, wine_ids: list[int]) -> dict[str, float]:
+        job = cls._jobs.pop(job_id, None)
+        if job:
+            task, _ = job
+            return await task
+        logging.info(f'Deferred scoring {job_id} not found in this worker, computing scores')
+        return await run_in_threadpool(cls._score, user_id, wine_ids)
+
+    @classmethod
+    async def _stream(cls, job_id: str, user_id: str, wine_ids: list[int]):
+        try:
+            scores = await cls._get_scores(job_id, user_id, wine_ids)
+        except KeyError as e:
+            logging.warning(f'User {user_id} not found for deferred scoring: {str(e)}')
+            scores = {}
+        except Exception as e:
+            logging.error(f'Error computing deferred scores: {str(e)}')
+            scores = {}
+
+        for wine_id, score in scores.items():
+            yield json.dumps({'wine_id': int(wine_id), 'score': score}) + '\n'
+
+    @classmethod
+    def stream_scores(cls, token: str):
+        """
+        Return an async iterator yielding one NDJSON line per scored wine.
+
+        Raises:
+            ValueError: If the token is malformed, forged or expired
+        """
+        job_id, user_id, wine_ids = cls._decode_token(token)
+        return cls._stream(job_id, user_id, wine_ids)
@@ -1,11 +1,15 @@
 import fastapi
 import typing
 
+from src.config.manager import settings
 from src.repository.config.events import dispose_db_connection, initialize_db_connection
+from src.services.wine_search_index import wine_search_index
 
 def execute_backend_server_event_handler(backend_app: fastapi.FastAPI) -> typing.Any:
     def launch_backend_server_events() -> None:
-        return initialize_db_connection(backend_app=backend_app)
+        initialize_db_connection(backend_app=backend_app)
+        if settings.WINE_SEARCH_INDEX_ENABLED:
+            wine_search_index.build_in_background()
 
     return launch_backend_server_events
 
@@ -26,6 +26,25 @@ class BackendBaseSettings(pydantic_settings.BaseSettings):
     DB_POSTGRES_HOST: str = decouple.config("POSTGRES_HOST", cast=str)  # type: ignore
     DB_POSTGRES_PORT: str = decouple.config("POSTGRES_PORT", cast=str)  # type: ignore
     DB_POSTGRES_NAME: str = decouple.config("POSTGRES_DB", cast=str)  # type: ignore
+    DB_ASYNC_ENABLED: bool = decouple.config("DB_ASYNC_ENABLED", default=False, cast=bool)  # type: ignore
+    DB_POOL_SIZE: int = decouple.config("DB_POOL_SIZE", default=5, cast=int)  # type: ignore
+    DB_POOL_MAX_OVERFLOW: int = decouple.config("DB_POOL_MAX_OVERFLOW", default=10, cast=int)  # type: ignore
+    DB_POOL_TIMEOUT_SECONDS: float = decouple.config("DB_POOL_TIMEOUT_SECONDS", default=30.0, cast=float)  # type: ignore
+    DB_POOL_RECYCLE_SECONDS: int = decouple.config("DB_POOL_RECYCLE_SECONDS", default=1800, cast=int)  # type: ignore
+    DB_POOL_PRE_PING: bool = decouple.config("DB_POOL_PRE_PING", default=True, cast=bool)  # type: ignore
+    DB_USER_AGGREGATE_SINGLE_QUERY: bool = decouple.config("DB_USER_AGGREGATE_SINGLE_QUERY", default=False, cast=bool)  # type: ignore
+    WINES_REPOSITORY_BACKEND: str = decouple.config("WINES_REPOSITORY_BACKEND", default="supabase", cast=str)  # type: ignore
+    WINE_SEARCH_INDEX_ENABLED: bool = decouple.config("WINE_SEARCH_INDEX_ENABLED", default=False, cast=bool)  # type: ignore
+
+    SCORING_TOKEN_SECRET: str = decouple.config("SCORING_TOKEN_SECRET", default="", cast=str)  # type: ignore
+
+    MODEL_WIRE_FORMAT: str = decouple.config("MODEL_WIRE_FORMAT", default="json", cast=str)  # type: ignore
+    MODEL_BATCHING_ENABLED: bool = decouple.config("MODEL_BATCHING_ENABLED", default=False, cast=bool)  # type: ignore
+    MODEL_BATCH_MAX_SIZE: int = decouple.config("MODEL_BATCH_MAX_SIZE", default=16, cast=int)  # type: ignore
+    MODEL_BATCH_WINDOW_MS: float = decouple.config("MODEL_BATCH_WINDOW_MS", default=5.0, cast=float)  # type: ignore
+
+    PRECOMPUTED_RECOMMENDATIONS_LIMIT: int = decouple.config("PRECOMPUTED_RECOMMENDATIONS_LIMIT", default=200, cast=int)  # type: ignore
+    PRECOMPUTED_RECOMMENDATIONS_MAX_AGE_HOURS: float = decouple.config("PRECOMPUTED_RECOMMENDATIONS_MAX_AGE_HOURS", default=26.0, cast=float)  # type: ignore
 
     API_PREFIX: str = "/api"
     DOCS_URL: str = "/docs"
@@ -55,6 +74,17 @@ class BackendBaseSettings(pydantic_settings.BaseSettings):
             f"{self.DB_POSTGRES_NAME}"
         )
 
+    @property
+    def DB_POSTGRES_ASYNC_URI(self) -> str:
+        return (
+            f"postgresql+asyncpg://"
+            f"{self.DB_POSTGRES_USERNAME}:"
+            f"{self.DB_POSTGRES_PASSWORD}@"
+            f"{self.DB_POSTGRES_HOST}:"
+            f"{self.DB_POSTGRES_PORT}/"
+            f"{self.DB_POSTGRES_NAME}"
+        )
+
     class Config(pydantic.ConfigDict):
         case_sensitive: bool = True
         env_file: str = f"{str(ROOT_DIR)}/.env"
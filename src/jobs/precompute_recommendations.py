@@ -0,0 +1,123 @@
+"""
+Nightly precomputation of the ranked recommendation list of every active user.
+
+Users are processed in chunks. For each chunk the ratings and the onboarding
+preferences are loaded with one query each, the 55 features are computed in a process pool and the Two Tower model
+is called concurrently from a thread pool (grouped into batches when
+MODEL_BATCHING_ENABLED is set). The ranked lists are upserted into the
+`user_recommendations` table, from where `/users/recommendations` serves them.
+
+Usage:
+    python -m src.jobs.precompute_recommendations [--chunk-size 200] [--workers N] [--model-concurrency 8]
+"""
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from src.config.manager import settings
+from src.models.user import User
+from src.repository.config.database import db
+from src.repository.preferences_repository import PreferencesRepository
+from src.repository.ratings_repository import WineRatingsRepository
+from src.repository.user_recommendations_repository import UserRecommendationsRepository
+from src.repository.users_repository import UsersRepository
+from src.repository.wine_recommendations_repository import WineRecommendationsRepository
+from src.services.score_cache_service import score_cache
+
+_worker_recommendations_repo = None
+
+
+def _compute_features(user: User) -> tuple[str, dict]:
+    """Process pool worker: features of one user, computed with the same call as the live path."""
+    global _worker_recommendations_repo
+    if _worker_recommendations_repo is None:
+        _worker_recommendations_repo = WineRecommendationsRepository()
+    return user.uid_to_str(), _worker_recommendations_repo._calculate_user_features(user)
+
+
+def _rank(recommendations_repo: WineRecommendationsRepository, user_id: str, features: dict, limit: int) -> dict:
+    wine_ids, scores = recommendations_repo._fetch_ranking(user_id, features, limit)
+    return {
+        'user_id': user_id,
+        'wine_ids': [int(wine_id) for wine_id in wine_ids],
+        'scores': [scores.get(wine_id, 0.0) for wine_id in wine_ids],
+        'features_fingerprint': score_cache.fingerprint(features),
+    }
+
+
+def _process_chunk(
+    user_ids: list[str],
+    recommendations_repo: WineRecommendationsRepository,
+    process_pool: ProcessPoolExecutor,
+    thread_pool: ThreadPoolExecutor,
+    limit: int,
+) -> tuple[int, int]:
+    with db.sessionmaker() as session:
+        ratings_by_user = WineRatingsRepository(session).get_by_user_ids(user_ids)
+        preferences_by_user = PreferencesRepository(session).get_by_user_ids(user_ids)
+
+    # Users with the parts the live path reads to compute their features (USER_FEATURE_PARTS)
+    users = []
+    for user_id in user_ids:
+        user = User(uid=user_id, username='', email='')
+        user.set_ratings(ratings_by_user.get(user_id, []))
+        user.preferences = preferences_by_user.get(user_id, [])
+        users.append(user)
+
+    features_by_user = dict(process_pool.map(_compute_features, users, chunksize=16))
+
+    rows, failed = [], 0
+    futures = {
+        thread_pool.submit(_rank, recommendations_repo, user_id, features, limit): user_id
+        for user_id, features in features_by_user.items()
+    }
+    for future in as_completed(futures):
+        try:
+            rows.append(future.result())
+        except Exception as e:
+            failed += 1
+            logging.error(f'Error precalculando recomendaciones del usuario {futures[future]}: {e}')
+
+    with db.sessionmaker() as session:
+        UserRecommendationsRepository(session).save_many(rows)
+    return len(rows), failed
+
+
+def run(chunk_size: int, workers: int, model_concurrency: int, limit: int) -> tuple[int, int]:
+    started = time.perf_counter()
+    with db.sessionmaker() as session:
+        user_ids = UsersRepository(session).get_active_user_ids()
+    logging.info(f'Precalculando recomendaciones de {len(user_ids)} usuarios activos (limit={limit})')
+
+    recommendations_repo = WineRecommendationsRepository()
+    saved = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as process_pool, ThreadPoolExecutor(max_workers=model_concurrency) as thread_pool:
+        for start in range(0, len(user_ids), chunk_size):
+            chunk_saved, chunk_failed = _process_chunk(
+                user_ids[start:start + chunk_size], recommendations_repo, process_pool, thread_pool, limit
+            )
+            saved += chunk_saved
+            failed += chunk_failed
+            logging.info(f'Progreso: {min(start + chunk_size, len(user_ids))}/{len(user_ids)} usuarios')
+
+    logging.info(f'Precálculo terminado en {time.perf_counter() - started:.1f}s: {saved} guardados, {failed} con error')
+    return saved, failed
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description='Precompute the recommendation list of every active user')
+    parser.add_argument('--chunk-size', type=int, default=200, help='Users loaded and saved together')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes computing features')
+    parser.add_argument('--model-concurrency', type=int, default=8, help='Concurrent calls to the model')
+    parser.add_argument('--limit', type=int, default=settings.PRECOMPUTED_RECOMMENDATIONS_LIMIT, help='Wines ranked per user')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=settings.LOGGING_LEVEL)
+    _, failed = run(args.chunk_size, args.workers, args.model_concurrency, args.limit)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
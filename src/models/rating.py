@@ -1,6 +1,14 @@
+import enum
 import uuid
 from src.models.wine import Wine
 
+
+class RatingWrite(str, enum.Enum):
+    """Outcome of saving a rating."""
+    CREATED = "created"
+    UPDATED = "updated"
+
+
 class Rating:
     user_id: uuid.UUID
     wine_id: int
@@ -2,4 +2,5 @@ from src.models.schemas.base import BaseSchemaModel
 
 class WineRecommendations(BaseSchemaModel):
     user_id: str
-    recommendations: list
\ No newline at end of file
+    recommendations: list
+    next_cursor: str | None = None
\ No newline at end of file
@@ -27,6 +27,8 @@ class WineFilters(BaseModel):
     region: Optional[str] = None
     min_abv: Optional[float] = None
     max_abv: Optional[float] = None
+    # Full-text search over name, winery, grapes, region and pairings
+    q: Optional[str] = None
 
     @field_validator('min_abv', 'max_abv', mode='before')
     @classmethod
@@ -101,4 +103,19 @@ class PaginatedWineResponse(BaseSchemaModel):
     page_size: int
     total_pages: int
     has_next: bool
-    has_previous: bool
\ No newline at end of file
+    has_previous: bool
+    scoring_token: str | None = None
+    # Opaque cursor of the next page (name-ordered searches only)
+    next_cursor: str | None = None
+    # The total is the planner's estimate (broad searches), not an exact count
+    is_estimate: bool = False
+
+class FacetCount(BaseSchemaModel):
+    value: str
+    count: int
+
+class WineFacetsResponse(BaseSchemaModel):
+    # Wines passing every filter
+    total: int
+    # Facet -> values with their counts; each facet ignores its own filter
+    facets: dict[str, list[FacetCount]]
@@ -19,6 +19,31 @@ class User:
         self.preferences = []
         self.onboarding_completed = False
 
+    def __getattr__(self, name):
+        # Only reached for attributes that are not set: parts loaded on first access
+        loaders = self.__dict__.get('_loaders')
+        if not loaders or name not in loaders:
+            raise AttributeError(f"'User' object has no attribute '{name}'")
+        value = loaders[name]()
+        setattr(self, name, value)
+        return value
+
+    def __setattr__(self, name, value):
+        loaders = self.__dict__.get('_loaders')
+        if loaders and name in loaders:
+            del loaders[name]
+            if not loaders:
+                del self.__dict__['_loaders']
+        super().__setattr__(name, value)
+
+    def set_loader(self, part: str, loader):
+        """Load `part` (preferences, favorites or ratings) calling `loader()` the first time it is read."""
+        self.__dict__.pop(part, None)
+        self.__dict__.setdefault('_loaders', {})[part] = loader
+
+    def is_loaded(self, part: str) -> bool:
+        return part in self.__dict__
+
     def uid_to_str(self):
         return str(self.uid)
 
@@ -0,0 +1,37 @@
+import typing
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.repository.base import BaseRepository
+
+
+class AsyncBaseRepository:
+    """
+    Awaitable facade over a synchronous repository.
+
+    With an `AsyncSession` (DB_ASYNC_ENABLED) each call runs the sync
+    repository method through `AsyncSession.run_sync`, so its queries go
+    through asyncpg and the event loop is free while they wait on the
+    database. With a plain `Session` the method is called directly, which is
+    the previous blocking behaviour.
+
+    Subclasses set `repository_type` and expose the methods routes use.
+    """
+    repository_type: typing.Type[BaseRepository] = BaseRepository
+
+    def __init__(self, session: AsyncSession | Session):
+        self.session = session
+
+    async def _run(self, method: typing.Callable, *args, **kwargs):
+        if isinstance(self.session, AsyncSession):
+            return await self.session.run_sync(
+                lambda sync_session: method(self.repository_type(sync_session), *args, **kwargs)
+            )
+        return method(self.repository_type(self.session), *args, **kwargs)
+
+    async def rollback(self):
+        if isinstance(self.session, AsyncSession):
+            await self.session.rollback()
+        else:
+            self.session.rollback()
@@ -1,8 +1,24 @@
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
+from src.repository.table_models.user import User as UserModel
+
 class BaseRepository:
     def __init__(self, session: Session):
         self.session = session
 
     def get(self, model, id: int):
-        return self.session.get(model, id)
\ No newline at end of file
+        return self.session.get(model, id)
+
+    @staticmethod
+    def user_aggregate_version_bump(user_id):
+        """UPDATE statement bumping the aggregate version of a user."""
+        return (
+            update(UserModel)
+            .where(UserModel.uid == user_id)
+            .values(aggregate_version=UserModel.aggregate_version + 1)
+        )
+
+    def bump_user_aggregate_version(self, user_id):
+        """Mark the cached aggregates of a user as stale; call it before committing a change to its preferences, favorites or ratings."""
+        self.session.execute(self.user_aggregate_version_bump(user_id))
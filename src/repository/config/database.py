@@ -1,10 +1,65 @@
+import time
+
 from supabase import create_client, Client
 from pydantic import PostgresDsn
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import QueuePool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from src.config.manager import settings
+from src.utilities.metrics import metrics
+
+CHECKOUT_WAIT_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 30000)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waits for a connection
+    (db_pool_checkout_wait_ms) and keeps the checked out and overflow gauges
+    up to date. Connection churn is counted by the listeners in events.py.
+    """
+    metrics_prefix = 'db_pool'
+
+    def _update_gauges(self):
+        metrics.set_gauge(f'{self.metrics_prefix}_checked_out', self.checkedout())
+        # QueuePool.overflow() is negative while the pool is not full
+        metrics.set_gauge(f'{self.metrics_prefix}_overflow_in_use', max(0, self.overflow()))
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._update_gauges()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+            self._update_gauges()
+            return connection
+        except PoolTimeoutError:
+            metrics.increment(f'{self.metrics_prefix}_checkout_timeouts_total')
+            raise
+        finally:
+            metrics.observe(
+                f'{self.metrics_prefix}_checkout_wait_ms',
+                (time.perf_counter() - started) * 1000,
+                CHECKOUT_WAIT_BUCKETS,
+            )
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    metrics_prefix = 'db_async_pool'
+
+
+def _pool_options() -> dict:
+    return {
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_POOL_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT_SECONDS,
+        'pool_recycle': settings.DB_POOL_RECYCLE_SECONDS,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+    }
 
 
 class Database:
@@ -13,7 +68,8 @@ class Database:
 
         self.engine = create_engine(
             url=self.postgres_uri,
-            poolclass=QueuePool,
+            poolclass=InstrumentedQueuePool,
+            **_pool_options(),
         )
 
         self.sessionmaker = sessionmaker(
@@ -22,4 +78,20 @@ class Database:
             autoflush=False
         )
 
-db = Database()
\ No newline at end of file
+        # Async engine used by routes when DB_ASYNC_ENABLED; scripts, jobs and
+        # background threads keep using the sync one
+        self.async_engine = None
+        self.async_sessionmaker = None
+        if settings.DB_ASYNC_ENABLED:
+            self.async_engine = create_async_engine(
+                url=settings.DB_POSTGRES_ASYNC_URI,
+                poolclass=InstrumentedAsyncQueuePool,
+                **_pool_options(),
+            )
+            self.async_sessionmaker = async_sessionmaker(
+                bind=self.async_engine,
+                autoflush=False,
+                expire_on_commit=False
+            )
+
+db = Database()
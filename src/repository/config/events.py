@@ -4,8 +4,10 @@ from sqlalchemy import event, Connection
 from sqlalchemy.pool.base import _ConnectionRecord
 from sqlalchemy.engine import Engine
 
+from src.config.manager import settings
 from src.repository.config.database import db
 from src.repository.config.table import Base
+from src.utilities.metrics import metrics
 
 
 @event.listens_for(target=db.engine, identifier="connect")
@@ -24,6 +26,30 @@ def inspect_db_server_on_close(
     logging.info(f"Closed Connection Record ---\n {connection_record}")
 
 
+def register_pool_metrics(engine: Engine, prefix: str) -> None:
+    """Count connection churn of `engine`: connections opened, closed and invalidated."""
+
+    @event.listens_for(target=engine, identifier="connect")
+    def on_connect(db_api_connection, connection_record) -> None:
+        metrics.increment(f"{prefix}_connections_opened_total")
+
+    @event.listens_for(target=engine, identifier="close")
+    def on_close(db_api_connection, connection_record) -> None:
+        metrics.increment(f"{prefix}_connections_closed_total")
+
+    # Connections discarded because they failed pre-ping or raised a disconnect error
+    @event.listens_for(target=engine, identifier="invalidate")
+    def on_invalidate(db_api_connection, connection_record, exception) -> None:
+        metrics.increment(f"{prefix}_connections_invalidated_total")
+
+    metrics.set_gauge(f"{prefix}_size", engine.pool.size())
+
+
+register_pool_metrics(db.engine, "db_pool")
+if db.async_engine is not None:
+    register_pool_metrics(db.async_engine.sync_engine, "db_async_pool")
+
+
 def initialize_db_tables(connection: Connection) -> None:
     logging.info("Database Table Creation --- Initializing . . .")
 
@@ -38,6 +64,12 @@ def initialize_db_connection(backend_app: fastapi.FastAPI) -> None:
 
     backend_app.state.db = db
 
+    max_connections = settings.SERVER_WORKERS * (settings.DB_POOL_SIZE + settings.DB_POOL_MAX_OVERFLOW)
+    logging.info(
+        f"Database Connection --- Pool de {settings.DB_POOL_SIZE} (+{settings.DB_POOL_MAX_OVERFLOW} overflow) por worker, "
+        f"hasta {max_connections} conexiones con {settings.SERVER_WORKERS} workers por engine"
+    )
+
     with db.engine.begin() as connection:
         initialize_db_tables(connection=connection)
 
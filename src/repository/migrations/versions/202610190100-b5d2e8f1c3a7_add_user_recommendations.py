@@ -0,0 +1,36 @@
+"""add_user_recommendations
+
+Revision ID: b5d2e8f1c3a7
+Revises: 76e360dc1524
+Create Date: 2026-10-19 01:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d2e8f1c3a7'
+down_revision: Union[str, Sequence[str], None] = '76e360dc1524'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_recommendations',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('wine_ids', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.Column('scores', postgresql.ARRAY(sa.Float()), nullable=False),
+    sa.Column('features_fingerprint', sa.String(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_recommendations')
@@ -0,0 +1,28 @@
+"""add_users_aggregate_version
+
+Revision ID: c7e4a9d2f6b1
+Revises: b5d2e8f1c3a7
+Create Date: 2026-10-19 02:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e4a9d2f6b1'
+down_revision: Union[str, Sequence[str], None] = 'b5d2e8f1c3a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('aggregate_version', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'aggregate_version')
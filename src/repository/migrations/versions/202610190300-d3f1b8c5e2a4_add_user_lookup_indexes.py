@@ -0,0 +1,68 @@
+"""add_user_lookup_indexes
+
+Revision ID: d3f1b8c5e2a4
+Revises: c7e4a9d2f6b1
+Create Date: 2026-10-19 03:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3f1b8c5e2a4'
+down_revision: Union[str, Sequence[str], None] = 'c7e4a9d2f6b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keep the latest rating of each (user, wine) before making the pair unique
+    op.execute("""
+        DELETE FROM wine_ratings
+        WHERE ctid IN (
+            SELECT ctid FROM (
+                SELECT ctid, row_number() OVER (PARTITION BY user_id, wine_id ORDER BY date DESC) AS position
+                FROM wine_ratings
+            ) ranked
+            WHERE position > 1
+        )
+    """)
+    # Keep the first time each wine was added to a user's favorites
+    op.execute("""
+        DELETE FROM favorite_wines
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (PARTITION BY user_id, wine_id ORDER BY added_date, id) AS position
+                FROM favorite_wines
+            ) ranked
+            WHERE position > 1
+        )
+    """)
+
+    # get_by_user_id_and_wine_id and the ON CONFLICT target of rating writes
+    op.create_index('uq_wine_ratings_user_id_wine_id', 'wine_ratings', ['user_id', 'wine_id'], unique=True)
+    # get_by_user_id: ratings of a user, newest first
+    op.create_index('ix_wine_ratings_user_id_date', 'wine_ratings', ['user_id', sa.text('date DESC')])
+    # get_by_wine_id: ratings of a wine (review summaries), newest first
+    op.create_index('ix_wine_ratings_wine_id_date', 'wine_ratings', ['wine_id', sa.text('date DESC')])
+
+    op.create_index('uq_favorite_wines_user_id_wine_id', 'favorite_wines', ['user_id', 'wine_id'], unique=True)
+    # get_favorite_wines: favorites of a user, most recently added first
+    op.create_index('ix_favorite_wines_user_id_added_date', 'favorite_wines', ['user_id', sa.text('added_date DESC')])
+
+    # get_preferences and the per-category deletes, all filtered by user
+    op.create_index('ix_user_preferences_user_id_option_id', 'user_preferences', ['user_id', 'option_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_preferences_user_id_option_id', table_name='user_preferences')
+    op.drop_index('ix_favorite_wines_user_id_added_date', table_name='favorite_wines')
+    op.drop_index('uq_favorite_wines_user_id_wine_id', table_name='favorite_wines')
+    op.drop_index('ix_wine_ratings_wine_id_date', table_name='wine_ratings')
+    op.drop_index('ix_wine_ratings_user_id_date', table_name='wine_ratings')
+    op.drop_index('uq_wine_ratings_user_id_wine_id', table_name='wine_ratings')
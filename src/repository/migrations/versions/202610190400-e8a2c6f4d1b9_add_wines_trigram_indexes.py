@@ -0,0 +1,37 @@
+"""add_wines_trigram_indexes
+
+Revision ID: e8a2c6f4d1b9
+Revises: d3f1b8c5e2a4
+Create Date: 2026-10-19 04:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a2c6f4d1b9'
+down_revision: Union[str, Sequence[str], None] = 'd3f1b8c5e2a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Columns searched with ILIKE '%value%' (and similarity() for wine_name) by SqlWinesRepository
+SEARCHABLE_COLUMNS = ('wine_name', 'type', 'winery', 'country', 'region')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in SEARCHABLE_COLUMNS:
+        op.create_index(
+            f'ix_wines_{column}_trgm', 'wines', [column],
+            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in SEARCHABLE_COLUMNS:
+        op.drop_index(f'ix_wines_{column}_trgm', table_name='wines')
@@ -0,0 +1,41 @@
+"""add_wines_search_vector
+
+Revision ID: f4b7d2a9c8e3
+Revises: e8a2c6f4d1b9
+Create Date: 2026-10-19 05:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b7d2a9c8e3'
+down_revision: Union[str, Sequence[str], None] = 'e8a2c6f4d1b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('spanish'::regconfig, coalesce(wine_name, '')), 'A') || "
+    "setweight(to_tsvector('spanish'::regconfig, coalesce(winery, '')), 'B') || "
+    "setweight(to_tsvector('spanish'::regconfig, coalesce(grapes, '')), 'B') || "
+    "setweight(to_tsvector('spanish'::regconfig, coalesce(region, '')), 'C') || "
+    "setweight(to_tsvector('spanish'::regconfig, coalesce(harmonize_es, '')), 'D')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('wines', sa.Column(
+        'search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR_EXPRESSION, persisted=True), nullable=True
+    ))
+    op.create_index('ix_wines_search_vector', 'wines', ['search_vector'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_wines_search_vector', table_name='wines')
+    op.drop_column('wines', 'search_vector')
@@ -0,0 +1,29 @@
+"""add_wines_name_keyset_index
+
+Revision ID: a9c3e7b1d5f2
+Revises: f4b7d2a9c8e3
+Create Date: 2026-10-19 06:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c3e7b1d5f2'
+down_revision: Union[str, Sequence[str], None] = 'f4b7d2a9c8e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Name ordering and keyset pagination of wine searches: (wine_name, wine_id) > (:name, :id)
+    op.create_index('ix_wines_wine_name_wine_id', 'wines', ['wine_name', 'wine_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_wines_wine_name_wine_id', table_name='wines')
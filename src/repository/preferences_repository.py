@@ -3,6 +3,7 @@ import logging
 from sqlalchemy import select, delete
 
 from src.repository.base import BaseRepository, Session
+from src.repository.async_base import AsyncBaseRepository
 from src.models.preference import Preference
 from src.models.preference_category import PreferenceCategory
 from src.repository.table_models.preference_options import PreferenceOption as PreferenceOptionModel
@@ -68,7 +69,22 @@ class PreferencesRepository(BaseRepository):
             print(f"Error al obtener preferencias: {str(e)}")
             # Devolver lista vacía en caso de error
             return []
-        
+
+    def get_by_user_ids(self, user_ids: list[str]) -> dict[str, list[Preference]]:
+        """Preferences of several users in one query, grouped by user ID (as string)."""
+        results = self.session.execute(
+            select(UserPreferenceModel.user_id, PreferenceOptionModel, PreferenceCategoryModel)
+            .join(PreferenceOptionModel, UserPreferenceModel.option_id == PreferenceOptionModel.id)
+            .join(PreferenceCategoryModel, PreferenceCategoryModel.id == PreferenceOptionModel.category_id)
+            .where(UserPreferenceModel.user_id.in_(user_ids))
+        ).all()
+        preferences = {str(user_id): [] for user_id in user_ids}
+        for user_id, option, category in results:
+            preference = Preference(option.id, option.option, option.description, option.value)
+            preference.set_category(PreferenceCategory(category.id, category.name, category.description))
+            preferences.setdefault(str(user_id), []).append(preference)
+        return preferences
+
     def save_onboarding_preferences(self, user_id: str, preference_options: list[int], weights: dict = None):
         """
         Guarda todas las preferencias de un usuario durante el onboarding
@@ -101,6 +117,7 @@ class PreferencesRepository(BaseRepository):
                 )
                 self.session.add(user_pref)
             
+            self.bump_user_aggregate_version(user_id)
             self.session.commit()
             return True
             
@@ -142,6 +159,7 @@ class PreferencesRepository(BaseRepository):
                 )
                 self.session.add(user_pref)
         
+        self.bump_user_aggregate_version(user_id)
         self.session.commit()
         return True
     
@@ -187,4 +205,23 @@ class PreferencesRepository(BaseRepository):
         except Exception as e:
             print(f"Error al obtener preferencias de usuario: {str(e)}")
             # En lugar de propagar el error, devolvemos el diccionario vacío
-            return result
\ No newline at end of file
+            return result
+
+
+class AsyncPreferencesRepository(AsyncBaseRepository):
+    repository_type = PreferencesRepository
+
+    async def get_options(self):
+        return await self._run(PreferencesRepository.get_options)
+
+    async def get_preferences(self, user_id):
+        return await self._run(PreferencesRepository.get_preferences, user_id)
+
+    async def save_onboarding_preferences(self, user_id: str, preference_options: list[int], weights: dict = None):
+        return await self._run(PreferencesRepository.save_onboarding_preferences, user_id, preference_options, weights)
+
+    async def update_category_preferences(self, user_id: str, category_id: int, preference_options: list[int], weights: dict = None):
+        return await self._run(PreferencesRepository.update_category_preferences, user_id, category_id, preference_options, weights)
+
+    async def get_user_preference_attributes(self, user_id: str) -> dict:
+        return await self._run(PreferencesRepository.get_user_preference_attributes, user_id)
@@ -1,13 +1,16 @@
 import logging
 import uuid
 
-from sqlalchemy import select
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
 
 from src.repository.base import BaseRepository, Session
-from src.models.rating import Rating
+from src.repository.async_base import AsyncBaseRepository
+from src.models.rating import Rating, RatingWrite
 from src.models.wine import Wine
 from src.repository.table_models.wine_ratings import WineRating as WineRatingModel
 from src.repository.table_models.wines import Wine as WineModel
+from src.repository.table_models.user import User as UserModel
 
 class WineRatingsRepository(BaseRepository):
     def __init__(self, session: Session):
@@ -36,6 +39,20 @@ class WineRatingsRepository(BaseRepository):
             ratings.append(Rating(user_id, rated_wine, rating.rating, rating.review))
         return ratings
 
+    def get_by_user_ids(self, user_ids: list[str]) -> dict[str, list[Rating]]:
+        """Ratings of several users in one query, grouped by user ID (as string)."""
+        results = self.session.execute(
+            select(WineModel, WineRatingModel)
+            .join(WineRatingModel, WineModel.wine_id == WineRatingModel.wine_id)
+            .where(WineRatingModel.user_id.in_(user_ids))
+            .order_by(WineRatingModel.user_id, WineRatingModel.date.desc())
+        ).all()
+        ratings = {str(user_id): [] for user_id in user_ids}
+        for wine, rating in results:
+            rated_wine = Wine(wine.wine_id, wine.wine_name, wine.type, wine.elaborate, wine.abv, wine.body, wine.country, wine.region, wine.winery, wine.summary)
+            ratings.setdefault(str(rating.user_id), []).append(Rating(rating.user_id, rated_wine, rating.rating, rating.review))
+        return ratings
+
     def get_by_wine_id(self, wine_id: str):
         results = self.session.execute(
             select(WineModel, WineRatingModel)
@@ -49,24 +66,50 @@ class WineRatingsRepository(BaseRepository):
             ratings.append(Rating(rating.user_id, rated_wine, rating.rating, rating.review))
         return ratings
 
-    def save(self, rating: Rating):
-        try:
-            result = self.get_by_user_id_and_wine_id(str(rating.user_id), rating.wine.wine_id)
-            if result:
-                wine, original_rating = result
-                original_rating.rating = rating.rating
-                original_rating.review = rating.review
-            else:
-                self.session.add(WineRatingModel(
-                    user_id=str(rating.user_id),
-                    wine_id=rating.wine.wine_id,
-                    rating=rating.rating,
-                    review=rating.review
-                ))
+    def save(self, rating: Rating) -> RatingWrite | None:
+        """
+        Insert the rating, or update the user's existing rating of the wine, in
+        a single INSERT ... ON CONFLICT statement that also bumps the user's
+        aggregate version.
+
+        Returns:
+            Whether the rating was created or updated, or None if it could not be saved
+        """
+        user_id = str(rating.user_id)
+        upsert = insert(WineRatingModel).values(
+            user_id=user_id,
+            wine_id=rating.wine.wine_id,
+            rating=rating.rating,
+            review=rating.review,
+            date=func.timezone('UTC-3', func.now()),
+        )
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[WineRatingModel.user_id, WineRatingModel.wine_id],
+            set_={'rating': upsert.excluded.rating, 'review': upsert.excluded.review},
+        ).returning(
+            # xmax is only 0 for a freshly inserted row version
+            literal_column('xmax = 0').label('created')
+        ).cte('rating_upsert')
+        version_bump = self.user_aggregate_version_bump(user_id).returning(UserModel.uid).cte('version_bump')
 
+        try:
+            created = self.session.execute(select(upsert.c.created).add_cte(version_bump)).scalar_one()
             self.session.commit()
-            return True
+            return RatingWrite.CREATED if created else RatingWrite.UPDATED
         except Exception as e:
             self.session.rollback()
             logging.error(f'Error saving rating: {e}')
-            return False
\ No newline at end of file
+            return None
+
+
+class AsyncWineRatingsRepository(AsyncBaseRepository):
+    repository_type = WineRatingsRepository
+
+    async def get_by_user_id_and_wine_id(self, user_id: str, wine_id: int):
+        return await self._run(WineRatingsRepository.get_by_user_id_and_wine_id, user_id, wine_id)
+
+    async def get_by_wine_id(self, wine_id: str):
+        return await self._run(WineRatingsRepository.get_by_wine_id, wine_id)
+
+    async def save(self, rating: Rating) -> RatingWrite | None:
+        return await self._run(WineRatingsRepository.save, rating)
@@ -4,4 +4,5 @@ from .preference_options import PreferenceOption
 from .user_preferences import UserPreference
 from .wines import Wine
 from .wine_ratings import WineRating
-from .favorite_wines import FavoriteWines
\ No newline at end of file
+from .favorite_wines import FavoriteWines
+from .user_recommendations import UserRecommendation
\ No newline at end of file
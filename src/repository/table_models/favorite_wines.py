@@ -1,4 +1,4 @@
-from sqlalchemy import select, Column, String, Float, Integer, DateTime
+from sqlalchemy import select, Column, String, Float, Integer, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from src.repository.config.table import Base
 from sqlalchemy.sql import functions
@@ -19,6 +19,11 @@ class FavoriteWines(Base):
     wine_id = Column(Integer, nullable=False)
     added_date = Column(DateTime(timezone=True), nullable=False, server_default=functions.now())
 
+    __table_args__ = (
+        Index('uq_favorite_wines_user_id_wine_id', user_id, wine_id, unique=True),
+        Index('ix_favorite_wines_user_id_added_date', user_id, added_date.desc()),
+    )
+
     def __init__(self, user_id: str, wine_id: int):
         self.wine_id = wine_id
         self.user_id = user_id
\ No newline at end of file
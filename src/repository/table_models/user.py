@@ -1,7 +1,7 @@
 import logging
 from email.policy import default
 
-from sqlalchemy import select, Column, String, Boolean
+from sqlalchemy import select, Column, String, Boolean, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -20,6 +20,8 @@ class User(Base):
     name = Column(String, nullable=False)
     email = Column(String, nullable=False)
     onboarding_completed = Column(Boolean, nullable=False, default=False)
+    # Bumped in the same transaction as every change to the user's preferences, favorites or ratings
+    aggregate_version = Column(Integer, nullable=False, default=0, server_default='0')
     preferences = relationship("UserPreference", back_populates="user")
 
     def uid_to_str(self):
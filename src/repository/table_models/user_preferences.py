@@ -1,4 +1,4 @@
-from sqlalchemy import select, Column, String, Integer, ForeignKey
+from sqlalchemy import select, Column, String, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from src.repository.config.table import Base
 
@@ -14,4 +14,8 @@ class UserPreference(Base):
     user_id = Column(ForeignKey("users.uid"))
     option_id = Column(ForeignKey("preference_options.id"))
     weight = Column(Integer, nullable=False, default=1)
-    user = relationship("User", back_populates="preferences")
\ No newline at end of file
+    user = relationship("User", back_populates="preferences")
+
+    __table_args__ = (
+        Index('ix_user_preferences_user_id_option_id', user_id, option_id),
+    )
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, Float, DateTime
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy.sql import functions
+from src.repository.config.table import Base
+
+
+class UserRecommendation(Base):
+    __tablename__ = 'user_recommendations'
+
+    user_id = Column(
+        UUID(as_uuid=True),
+        primary_key=True,
+        nullable=False
+    )
+    wine_ids = Column(ARRAY(Integer), nullable=False)
+    scores = Column(ARRAY(Float), nullable=False)
+    features_fingerprint = Column(String, nullable=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False, server_default=functions.now())
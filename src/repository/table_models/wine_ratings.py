@@ -1,4 +1,4 @@
-from sqlalchemy import select, Column, String, Float, Integer, TIMESTAMP
+from sqlalchemy import select, Column, String, Float, Integer, TIMESTAMP, Index
 from sqlalchemy.dialects.postgresql import UUID
 from src.repository.config.table import Base
 from sqlalchemy.sql import func
@@ -26,6 +26,12 @@ class WineRating(Base):
     )
     review = Column(String, nullable=True)
 
+    __table_args__ = (
+        Index('uq_wine_ratings_user_id_wine_id', user_id, wine_id, unique=True),
+        Index('ix_wine_ratings_user_id_date', user_id, date.desc()),
+        Index('ix_wine_ratings_wine_id_date', wine_id, date.desc()),
+    )
+
     def __init__(self, wine_id: int, rating: float, user_id: str, review: str):
         self.wine_id = wine_id
         self.rating = rating
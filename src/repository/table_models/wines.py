@@ -1,6 +1,20 @@
-from sqlalchemy import select, Column, String, Integer, Float
+from sqlalchemy import select, Column, String, Integer, Float, Computed, Index, DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import mapped_column
 from src.repository.config.table import Base
 
+# Weighted Spanish full-text document of a wine: name, then winery and grapes, then region, then pairings
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('spanish'::regconfig, coalesce(wine_name, '')), 'A') || "
+    "setweight(to_tsvector('spanish'::regconfig, coalesce(winery, '')), 'B') || "
+    "setweight(to_tsvector('spanish'::regconfig, coalesce(grapes, '')), 'B') || "
+    "setweight(to_tsvector('spanish'::regconfig, coalesce(region, '')), 'C') || "
+    "setweight(to_tsvector('spanish'::regconfig, coalesce(harmonize_es, '')), 'D')"
+)
+
+# Columns searched with ILIKE '%value%' (and similarity() for wine_name), served by pg_trgm GIN indexes
+TRIGRAM_SEARCH_COLUMNS = ('wine_name', 'type', 'winery', 'country', 'region')
+
 class Wine(Base):
     __tablename__ = "wines"
 
@@ -19,3 +33,17 @@ class Wine(Base):
     vintages = Column(String, nullable=True)
     summary = Column(String, nullable=True)
     harmonize_es = Column(String, nullable=True)
+    # Generated by Postgres; deferred so loading wines does not fetch it
+    search_vector = mapped_column(TSVECTOR, Computed(SEARCH_VECTOR_EXPRESSION, persisted=True), nullable=True, deferred=True)
+
+    __table_args__ = (
+        Index('ix_wines_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_wines_wine_name_wine_id', 'wine_name', 'wine_id'),
+        *(
+            Index(f'ix_wines_{column}_trgm', column, postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+            for column in TRIGRAM_SEARCH_COLUMNS
+        ),
+    )
+
+# The trigram operator classes must exist before create_all builds the indexes
+event.listen(Wine.__table__, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
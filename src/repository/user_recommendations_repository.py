@@ -0,0 +1,57 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from src.repository.base import BaseRepository, Session
+from src.repository.async_base import AsyncBaseRepository
+from src.repository.table_models.user_recommendations import UserRecommendation as UserRecommendationModel
+
+
+class UserRecommendationsRepository(BaseRepository):
+    """Ranked recommendation lists precomputed by the nightly job, one row per user."""
+
+    def __init__(self, session: Session):
+        super().__init__(session)
+
+    def get_by_user_id(self, user_id: str, max_age_hours: float) -> UserRecommendationModel | None:
+        """Precomputed list of a user, or None if there is none younger than `max_age_hours`."""
+        row = self.session.get(UserRecommendationModel, user_id)
+        if not row:
+            return None
+        if datetime.now(timezone.utc) - row.computed_at >= timedelta(hours=max_age_hours):
+            logging.info(f'Recomendaciones precalculadas del usuario {user_id} vencidas ({row.computed_at})')
+            return None
+        return row
+
+    def save_many(self, rows: list[dict]):
+        """
+        Insert or replace precomputed lists.
+
+        Args:
+            rows: Dicts with user_id, wine_ids, scores and features_fingerprint
+        """
+        if not rows:
+            return
+        statement = insert(UserRecommendationModel).values([
+            {**row, 'computed_at': datetime.now(timezone.utc)} for row in rows
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=[UserRecommendationModel.user_id],
+            set_={
+                'wine_ids': statement.excluded.wine_ids,
+                'scores': statement.excluded.scores,
+                'features_fingerprint': statement.excluded.features_fingerprint,
+                'computed_at': statement.excluded.computed_at,
+            }
+        )
+        self.session.execute(statement)
+        self.session.commit()
+
+
+class AsyncUserRecommendationsRepository(AsyncBaseRepository):
+    repository_type = UserRecommendationsRepository
+
+    async def get_by_user_id(self, user_id: str, max_age_hours: float) -> UserRecommendationModel | None:
+        return await self._run(UserRecommendationsRepository.get_by_user_id, user_id, max_age_hours)
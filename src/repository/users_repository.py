@@ -1,47 +1,220 @@
 from fastapi import HTTPException
+from sqlalchemy import exists, func, literal_column, select, true
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
 
 import uuid
 import logging
 
 from src.repository.base import BaseRepository, Session
+from src.repository.async_base import AsyncBaseRepository
 
 from src.models.wine import Wine
 from src.models.user import User
+from src.config.manager import settings
 from src.models.preference import Preference
+from src.models.preference_category import PreferenceCategory
 from src.models.rating import Rating
 from src.repository.table_models import User as UserModel, FavoriteWines, Wine as WineModel, WineRating as WineRatingModel, PreferenceOption as PreferenceModel, UserPreference as UserPreferenceModel
+from src.repository.table_models.preference_categories import PreferenceCategory as PreferenceCategoryModel
 from src.repository.preferences_repository import PreferencesRepository
 from src.repository.ratings_repository import WineRatingsRepository
+from src.services.user_aggregate_cache_service import user_aggregate_cache
+
+# Parts of the user aggregate that are loaded with their own query
+USER_PARTS = ('preferences', 'favorites', 'ratings')
+# Parts read to compute the user features sent to the model
+USER_FEATURE_PARTS = ('preferences', 'ratings')
+
 
 class UsersRepository(BaseRepository):
     def __init__(self, session: Session):
         super().__init__(session)
 
-    def get_user_by_id(self, user_uid: str) -> User:
+    @staticmethod
+    def _validate_uid(user_uid: str):
         try:
             uuid.UUID(user_uid)
         except ValueError:
             logging.error(f'El id {user_uid} no es un UUID valido')
             raise KeyError('Formato de ID de usuario invalido')
 
-        user_row = self.session.query(UserModel).filter(UserModel.uid == user_uid).first()
+    def exists(self, user_uid: str) -> bool:
+        """Whether the user exists, without loading it."""
+        try:
+            self._validate_uid(user_uid)
+        except KeyError:
+            return False
+        return self.session.query(exists().where(UserModel.uid == user_uid)).scalar()
+
+    def get_user_header(self, user_uid: str) -> User:
+        """
+        User with only the users table row loaded. Preferences, favorites and
+        ratings are loaded from this repository's session the first time they are read.
+        """
+        return self._get_header(user_uid)[0]
+
+    def _get_header(self, user_uid: str) -> tuple[User, int]:
+        """Header-only user and its aggregate version."""
+        self._validate_uid(user_uid)
+        user_row = self.get_user_row(user_uid)
         if not user_row:
             raise KeyError('El usuario no existe')
+        return self._new_user(user_row), user_row.aggregate_version
+
+    def _new_user(self, user_row) -> User:
         user = User(uid=user_row.uid, username=user_row.name, email=user_row.email)
         user.onboarding_completed = user_row.onboarding_completed
-        try:
-            user.add_preferences(PreferencesRepository(self.session).get_preferences(user.uid))
-        except Exception as e:
-            if "no tiene preferencias registradas" in str(e):
-                # Inicializar con lista vacía
-                user.preferences = []
-            else:
-                # Para otros errores, reenviar la excepción
-                raise e
-        user.set_favorites(self.get_favorite_wines(user))
-        user.set_ratings(WineRatingsRepository(self.session).get_by_user_id(user_id=user.uid_to_str()))
+        user.set_loader('preferences', lambda: PreferencesRepository(self.session).get_preferences(user.uid))
+        user.set_loader('favorites', lambda: self.get_favorite_wines(user))
+        user.set_loader('ratings', lambda: WineRatingsRepository(self.session).get_by_user_id(user_id=user.uid_to_str()))
+        return user
+
+    def get_user_by_id(self, user_uid: str, load: tuple = USER_PARTS) -> User:
+        """
+        User with the parts in `load` already loaded; the rest load on first access.
+
+        Parts cached at the user's current aggregate version are taken from
+        `user_aggregate_cache`. The missing ones are queried and cached: in one
+        statement (`get_user_aggregate`) with DB_USER_AGGREGATE_SINGLE_QUERY,
+        otherwise with one query each.
+        """
+        user, version = self._get_header(user_uid)
+        cached = user_aggregate_cache.get(user.uid_to_str(), version)
+        for part, value in cached.items():
+            setattr(user, part, value)
+
+        missing = tuple(part for part in load if part not in cached)
+        if missing and settings.DB_USER_AGGREGATE_SINGLE_QUERY:
+            loaded = self.get_user_aggregate(user_uid, missing)
+            for part in missing:
+                setattr(user, part, getattr(loaded, part))
+        else:
+            for part in missing:
+                getattr(user, part)
+        user_aggregate_cache.put(user.uid_to_str(), version, {part: getattr(user, part) for part in missing})
+        return user
+
+    @staticmethod
+    def _wine_json_fields() -> list:
+        return [
+            'wine_id', WineModel.wine_id, 'wine_name', WineModel.wine_name, 'type', WineModel.type,
+            'elaborate', WineModel.elaborate, 'abv', WineModel.abv, 'body', WineModel.body,
+            'country', WineModel.country, 'region', WineModel.region, 'winery', WineModel.winery,
+            'summary', WineModel.summary,
+        ]
+
+    @staticmethod
+    def _json_list(item, order_by=None):
+        """json_agg of `item` as a JSON array, empty instead of NULL when there are no rows."""
+        aggregated = func.json_agg(aggregate_order_by(item, order_by) if order_by is not None else item)
+        return func.coalesce(aggregated, literal_column("'[]'::json"), type_=JSON)
+
+    def _aggregate_part_queries(self) -> dict:
+        """Lateral subquery per user part, each returning a single JSON array column named after the part."""
+        preference_item = func.json_build_object(
+            'id', PreferenceModel.id, 'option', PreferenceModel.option,
+            'description', PreferenceModel.description, 'value', PreferenceModel.value,
+            'category_id', PreferenceCategoryModel.id, 'category_name', PreferenceCategoryModel.name,
+            'category_description', PreferenceCategoryModel.description,
+        )
+        preferences = (
+            select(self._json_list(preference_item).label('preferences'))
+            .select_from(UserPreferenceModel)
+            .join(PreferenceModel, UserPreferenceModel.option_id == PreferenceModel.id)
+            .join(PreferenceCategoryModel, PreferenceCategoryModel.id == PreferenceModel.category_id)
+            .where(UserPreferenceModel.user_id == UserModel.uid)
+            .lateral('user_preferences_agg')
+        )
+        favorites = (
+            select(self._json_list(func.json_build_object(*self._wine_json_fields()), FavoriteWines.added_date.desc()).label('favorites'))
+            .select_from(FavoriteWines)
+            .join(WineModel, WineModel.wine_id == FavoriteWines.wine_id)
+            .where(FavoriteWines.user_id == UserModel.uid)
+            .lateral('favorites_agg')
+        )
+        rating_item = func.json_build_object(
+            *self._wine_json_fields(), 'rating', WineRatingModel.rating, 'review', WineRatingModel.review
+        )
+        ratings = (
+            select(self._json_list(rating_item, WineRatingModel.date.desc()).label('ratings'))
+            .select_from(WineRatingModel)
+            .join(WineModel, WineModel.wine_id == WineRatingModel.wine_id)
+            .where(WineRatingModel.user_id == UserModel.uid)
+            .lateral('ratings_agg')
+        )
+        return {'preferences': preferences, 'favorites': favorites, 'ratings': ratings}
+
+    @staticmethod
+    def _wine_from_json(item: dict) -> Wine:
+        return Wine(item['wine_id'], item['wine_name'], item['type'], item['elaborate'], item['abv'], item['body'], item['country'], item['region'], item['winery'], item['summary'])
+
+    def get_user_aggregate(self, user_uid: str, load: tuple = USER_PARTS) -> User:
+        """
+        User with the parts in `load` fetched in a single statement: the users
+        row plus one lateral subquery per part, each aggregating its rows with
+        json_agg. Same result as `get_user_by_id`, in one round trip.
+        """
+        self._validate_uid(user_uid)
+        part_queries = self._aggregate_part_queries()
+        from_clause = UserModel.__table__
+        for part in load:
+            from_clause = from_clause.join(part_queries[part], true())
+        query = (
+            select(UserModel.uid, UserModel.name, UserModel.email, UserModel.onboarding_completed, *[part_queries[part].c[part] for part in load])
+            .select_from(from_clause)
+            .where(UserModel.uid == user_uid)
+        )
+        row = self.session.execute(query).first()
+        if not row:
+            raise KeyError('El usuario no existe')
+
+        user = self._new_user(row)
+        if 'preferences' in load:
+            preferences = []
+            for item in row.preferences:
+                preference = Preference(item['id'], item['option'], item['description'], item['value'])
+                preference.set_category(PreferenceCategory(item['category_id'], item['category_name'], item['category_description']))
+                preferences.append(preference)
+            user.preferences = preferences
+        if 'favorites' in load:
+            user.set_favorites([self._wine_from_json(item) for item in row.favorites])
+        if 'ratings' in load:
+            user.set_ratings([
+                Rating(user.uid_to_str(), self._wine_from_json(item), item['rating'], item['review'])
+                for item in row.ratings
+            ])
         return user
 
+    def get_user_row(self, user_uid: str) -> UserModel | None:
+        """Users table row only, without preferences, favorites or ratings."""
+        return self.session.query(UserModel).filter(UserModel.uid == user_uid).first()
+
+    def create_if_missing(self, user_uid: str, email: str, name: str) -> bool:
+        """Insert a user that has just signed up. Returns False if it already existed."""
+        try:
+            if self.get_user_row(user_uid):
+                return False
+            self.session.add(UserModel(uid=user_uid, email=email, name=name, onboarding_completed=False))
+            self.session.commit()
+            return True
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def mark_onboarding_completed(self, user_uid: str) -> bool:
+        """Returns False if the user does not exist."""
+        user_row = self.get_user_row(user_uid)
+        if not user_row:
+            return False
+        user_row.onboarding_completed = True
+        self.session.commit()
+        return True
+
+    def get_active_user_ids(self) -> list[str]:
+        """IDs of the users that completed onboarding, i.e. the ones that can get recommendations."""
+        rows = self.session.query(UserModel.uid).filter(UserModel.onboarding_completed.is_(True)).order_by(UserModel.uid).all()
+        return [str(row.uid) for row in rows]
+
     def get_favorite_wines(self, user: User):
         favorites = self.session.query(WineModel).join(FavoriteWines, WineModel.wine_id == FavoriteWines.wine_id).filter(FavoriteWines.user_id == user.uid_to_str()).order_by(FavoriteWines.added_date.desc()).all()
         wines = []
@@ -84,6 +257,8 @@ class UsersRepository(BaseRepository):
                 logging.info(f'New favorite detected: {favorite.wine_id} saving...')
                 self.session.add(FavoriteWines(user_id=user.uid_to_str(), wine_id=favorite.wine_id))
 
+        if existing_user:
+            self.bump_user_aggregate_version(user.uid_to_str())
         self.session.commit()
         return user
 
@@ -93,4 +268,41 @@ class UsersRepository(BaseRepository):
             raise ValueError('Wine not in favorites')
 
         self.session.query(FavoriteWines).filter(FavoriteWines.user_id == user.uid_to_str(), FavoriteWines.wine_id == wine_id).delete()
-        self.session.commit()
\ No newline at end of file
+        self.bump_user_aggregate_version(user.uid_to_str())
+        self.session.commit()
+
+
+class AsyncUsersRepository(AsyncBaseRepository):
+    """
+    With the asyncpg session, parts of a user left unloaded can only be loaded
+    from inside another repository call (e.g. `save`), not by reading them in
+    a route, so routes pass in `load` every part they read themselves.
+    """
+    repository_type = UsersRepository
+
+    async def exists(self, user_uid: str) -> bool:
+        return await self._run(UsersRepository.exists, user_uid)
+
+    async def get_user_header(self, user_uid: str) -> User:
+        return await self._run(UsersRepository.get_user_header, user_uid)
+
+    async def get_user_by_id(self, user_uid: str, load: tuple = USER_PARTS) -> User:
+        return await self._run(UsersRepository.get_user_by_id, user_uid, load)
+
+    async def get_user_aggregate(self, user_uid: str, load: tuple = USER_PARTS) -> User:
+        return await self._run(UsersRepository.get_user_aggregate, user_uid, load)
+
+    async def get_user_row(self, user_uid: str) -> UserModel | None:
+        return await self._run(UsersRepository.get_user_row, user_uid)
+
+    async def create_if_missing(self, user_uid: str, email: str, name: str) -> bool:
+        return await self._run(UsersRepository.create_if_missing, user_uid, email, name)
+
+    async def mark_onboarding_completed(self, user_uid: str) -> bool:
+        return await self._run(UsersRepository.mark_onboarding_completed, user_uid)
+
+    async def save(self, user: User):
+        return await self._run(UsersRepository.save, user)
+
+    async def delete_favorite_wine(self, user: User, wine_id):
+        return await self._run(UsersRepository.delete_favorite_wine, user, wine_id)
@@ -2,31 +2,30 @@ import os
 import logging
 from fastapi.exceptions import HTTPException
 import json
-import math
+import numpy as np
 from src.repository.wines_repository import WinesRepository
 from src.services.user_features_service import UserFeaturesService
+from src.services.score_cache_service import score_cache
+from src.services.model_batch_dispatcher import get_dispatcher
+from src.services.candidate_pipeline import CandidatePipeline
+from src.services.wine_catalog import wine_catalog
+from src.services.recommendation_cache_service import RankedRecommendations
+from src.services.model_wire_format import (
+    build_ranking_payload,
+    build_scoring_payload,
+    parse_dot_products,
+    parse_ranked_wine_ids,
+    dot_products_to_scores,
+)
+from src.config.manager import settings
+from src.utilities.metrics import metrics
 
 import requests
 
 from src.models.user import User
+from src.repository.table_models.user_recommendations import UserRecommendation
 
 class WineRecommendationsRepository:
-    @staticmethod
-    def _transform_dot_product_to_score(dot_product: float) -> float:
-        """
-        Transform raw dot product from Cloud Run to compatibility score [0, 100].
-
-        Formula: sigmoid(dot_product) * 100
-
-        Args:
-            dot_product: Raw dot product value from the model
-
-        Returns:
-            Compatibility score in range [0, 100]
-        """
-        sigmoid_value = 1 / (1 + math.exp(-dot_product))
-        compatibility_score = sigmoid_value * 100
-        return round(compatibility_score, 2)
     def __init__(self):
         self.OK_STATUS_CODE = 200
         self.model_api_url = os.getenv('RECOMMENDATIONS_API_URL')
@@ -36,30 +35,70 @@ class WineRecommendationsRepository:
         
         self.features_service = UserFeaturesService()
 
-    def get_recommendations(
-        self,
-        user: 'User',
-        limit: int,
-        wine_type: str = None,
-        body: str = None,
-        dryness: str = None,
-        country: str = None,
-        abv: float = None
-    ) -> list:
-        if not user.onboarding_completed:
-            raise KeyError('User has not completed onboarding')
+    def _post_model(self, path: str, payload: dict, params: dict | None = None):
+        """
+        POST a request to the Two Tower model service.
+
+        With MODEL_BATCHING_ENABLED the request is queued in the micro-batching
+        dispatcher of that endpoint and sent together with concurrent requests.
+        """
+        if settings.MODEL_BATCHING_ENABLED:
+            return get_dispatcher(f'{self.model_api_url}{path}').submit(payload, params)
+        return requests.post(
+            f'{self.model_api_url}{path}',
+            json.dumps(payload),
+            params=params,
+            headers={'Content-Type': 'application/json'}
+        )
+
+    @staticmethod
+    def _to_compatibility_scores(wine_ids: list[str], dot_products: np.ndarray) -> dict[str, float]:
+        """Transform the dot products of the model into compatibility scores [0, 100], keyed by wine ID."""
+        if not wine_ids:
+            return {}
+
+        logging.info(f'Dot products received - min: {dot_products.min():.6f}, max: {dot_products.max():.6f}, mean: {dot_products.mean():.6f}')
+        scores = dot_products_to_scores(dot_products)
+        for wine_id, dot_product, score in list(zip(wine_ids, dot_products, scores))[:5]:  # Log first 5 transformations
+            logging.info(f'Wine {wine_id}: dot_product={dot_product:.6f} -> score={score:.2f}')
+        return dict(zip(wine_ids, scores.tolist()))
+
+    def _fetch_ranking(self, user_id: str, user_features: dict, limit: int) -> tuple[list[str], dict[str, float]]:
+        """
+        Ask the Two Tower Model for the `limit` best wines for a user.
+
+        Returns:
+            Tuple with the ranked wine IDs (as strings) and their compatibility scores
+        """
+        logging.info(f'Calling Two Tower Model with {len(user_features)} features')
+        payload = build_ranking_payload(settings.MODEL_WIRE_FORMAT, user_id, user_features)
+        logging.info(f'Llamando a la API de recomendaciones en {self.model_api_url}/wines con limit={limit} (formato {settings.MODEL_WIRE_FORMAT})')
 
-        # Step 1: Gather user's rating history data
+        response = self._post_model('/wines', payload, params={'limit': limit})
+        logging.info(f'Llamada al modelo devuelve status: {response.status_code}')
+
+        if response.status_code != self.OK_STATUS_CODE:
+            logging.error(
+                f'Error al obtener recomendaciones de vinos. Status: {response.status_code}, Response: {response.text}')
+            raise HTTPException(status_code=400, detail='Error al obtener recomendaciones de vinos')
+
+        try:
+            parsed_response_json = response.json()
+            wine_ids = parse_ranked_wine_ids(parsed_response_json)
+            compatibility_scores = self._to_compatibility_scores(*parse_dot_products(parsed_response_json))
+        except (json.JSONDecodeError, ValueError, TypeError) as e:
+            logging.error(f'Error al decodificar la respuesta JSON del modelo: {e}')
+            raise HTTPException(status_code=400, detail='Formato de respuesta de recomendación no válido')
+
+        return wine_ids, compatibility_scores
+
+    def _build_ratings_data(self, user: 'User') -> list[dict]:
+        """Build the rating history of a user with the wine attributes the features service expects."""
         logging.info(f'Gathering rating data for user {user.uid_to_str()}')
-        
-        wines_repo = WinesRepository()  # Needed later for fetching recommended wines
-        
+
         # Get user's ratings - they already have wine details attached
-        user_ratings = user.get_ratings()
-        
-        # Build rating data with wine attributes
         ratings_data = []
-        for rating in user_ratings:
+        for rating in user.get_ratings():
             try:
                 ratings_data.append({
                     'wine_id': rating.wine_id,
@@ -78,103 +117,119 @@ class WineRecommendationsRepository:
             except Exception as e:
                 logging.warning(f'Could not process rating: {e}')
                 continue
-        
-        # Step 2: Calculate user features
+        return ratings_data
+
+    def _calculate_user_features(self, user: 'User') -> dict:
+        ratings_data = self._build_ratings_data(user)
         logging.info(f'Calculating features for user {user.uid_to_str()} with {len(ratings_data)} ratings')
-        user_features = self.features_service.calculate_features(
+        return self.features_service.calculate_features(
             user_id=user.uid_to_str(),
             ratings_data=ratings_data,
             preferences_data=user.preferences if hasattr(user, 'preferences') else None
         )
-        
-        # Step 3: Call the Two Tower Model with 55 features + user_id
-        logging.info(f'Calling Two Tower Model with {len(user_features)} features')
-        payload = {
-            'user_id': user.uid_to_str(),  # Include user_id for future requirements
-            **user_features  # All 55 features
-        }
-        body_json = json.dumps(payload)
-        
-        logging.info(f'Payload enviado al modelo (primeros 5 features): {dict(list(payload.items())[:5])}...')
-        logging.info(f'Llamando a la API de recomendaciones en {self.model_api_url}/wines con limit={limit}')
 
-        response = requests.post(
-            f'{self.model_api_url}/wines?limit={limit}', 
-            body_json, 
-            headers={'Content-Type': 'application/json'}
-        )
-        logging.info(f'Llamada al modelo devuelve status: {response.status_code}')
+    @staticmethod
+    def _usable_precomputed_ranking(precomputed: 'UserRecommendation', user_features: dict) -> tuple[list[str], dict[str, float]] | None:
+        """Ranked wine IDs and scores of a precomputed list, or None if the user's features changed since."""
+        if precomputed is None:
+            return None
+        if precomputed.features_fingerprint != score_cache.fingerprint(user_features):
+            logging.info(f'Recomendaciones precalculadas del usuario {precomputed.user_id} desactualizadas, se recalculan')
+            metrics.increment('recommendations_precomputed_stale_total')
+            return None
+        wine_ids = [str(wine_id) for wine_id in precomputed.wine_ids]
+        return wine_ids, dict(zip(wine_ids, precomputed.scores))
 
-        if response.status_code != self.OK_STATUS_CODE:
-            logging.error(
-                f'Error al obtener recomendaciones de vinos. Status: {response.status_code}, Response: {response.text}')
-            raise HTTPException(status_code=400, detail='Error al obtener recomendaciones de vinos')
+    @staticmethod
+    def recommendation_filters(wine_type: str = None, body: str = None, dryness: str = None, country: str = None, abv: float = None) -> dict:
+        """Catalog column -> wanted value. Wines have no dryness column, so a dryness filter matches nothing."""
+        return {'type': wine_type, 'body': body, 'dryness': dryness, 'country': country, 'abv': abv}
 
-        # Step 4: Process response
-        try:
-            parsed_response_json = response.json()
-            dot_products_data = parsed_response_json.get('dot_products', {})
-            wine_ids = parsed_response_json.get('wines', [])
-        except json.JSONDecodeError as e:
-            logging.error(f'Error al decodificar la respuesta JSON del modelo: {e}')
-            raise HTTPException(status_code=400, detail='Formato de respuesta de recomendación no válido')
+    def rank_recommendations(
+        self,
+        user: 'User',
+        limit: int,
+        filters: dict,
+        precomputed: 'UserRecommendation' = None
+    ) -> RankedRecommendations:
+        """
+        Rank the wines recommended to a user that pass the filters, without loading them.
 
-        if not wine_ids:
-            logging.info('El modelo no devolvió IDs de vino.')
-            return []
-
-        # Log dot product statistics
-        if dot_products_data:
-            dot_values = list(dot_products_data.values())
-            logging.info(f'Dot products received - min: {min(dot_values):.6f}, max: {max(dot_values):.6f}, mean: {sum(dot_values)/len(dot_values):.6f}')
-            logging.info(f'Sample dot products: {dict(list(dot_products_data.items())[:5])}')
-
-        # Transform dot products to compatibility scores [0, 100]
-        compatibility_scores = {}
-        for wine_id, dot_product in dot_products_data.items():
-            score = self._transform_dot_product_to_score(dot_product)
-            compatibility_scores[wine_id] = score
-            if len(compatibility_scores) <= 5:  # Log first 5 transformations
-                logging.info(f'Wine {wine_id}: dot_product={dot_product:.6f} -> score={score:.2f}')
-
-        # Step 5: Apply filters and build response
-        filtered_wines = []
-        tried_ids = set()
-
-        for wine_id_str in wine_ids:
-            if wine_id_str in tried_ids or len(filtered_wines) >= limit:
-                continue
+        Args:
+            filters: As built by `recommendation_filters`
+            precomputed: Ranked list stored by the nightly job. It replaces the model
+                call as long as it was computed from the same user features and
+                is deep enough for the candidates requested.
+        """
+        if not user.onboarding_completed:
+            raise KeyError('User has not completed onboarding')
 
-            tried_ids.add(wine_id_str)
+        # Steps 1 and 2: Gather user's rating history data and calculate user features
+        user_features = self._calculate_user_features(user)
+        
+        user_id = user.uid_to_str()
+        precomputed_ranking = self._usable_precomputed_ranking(precomputed, user_features)
+
+        def fetch_ranking(candidates: int) -> tuple[list[str], dict[str, float]]:
+            if precomputed_ranking and candidates <= len(precomputed_ranking[0]):
+                logging.info(f'Usando {candidates} recomendaciones precalculadas para el usuario {user_id}')
+                metrics.increment('recommendations_precomputed_hits_total')
+                wine_ids, scores = precomputed_ranking
+                return wine_ids[:candidates], scores
+            return self._fetch_ranking(user_id, user_features, candidates)
+
+        # Steps 3 and 4: Call the Two Tower Model with 55 features + user_id, over-fetching
+        # according to the filters' selectivity, and filter each ranked batch with one
+        # mask over the columnar catalog
+        pipeline = CandidatePipeline(
+            fetch_ranking=fetch_ranking,
+            select=lambda wine_ids: wine_catalog.filter_ids(wine_ids, filters),
+            filters=filters,
+        )
+        return RankedRecommendations(*pipeline.run(limit))
 
-            try:
-                wine = wines_repo.get_by_id(int(wine_id_str))
-                if wine:
-                    wine.add_score(compatibility_scores.get(wine_id_str, 0))
-                    
-                    matches = True
-                    if wine_type and (not hasattr(wine, "type") or wine.type.lower() != wine_type.lower()):
-                        matches = False
-                    if body and (not hasattr(wine, "body") or wine.body.lower() != body.lower()):
-                        matches = False
-                    if dryness and (not hasattr(wine, "dryness") or wine.dryness.lower() != dryness.lower()):
-                        matches = False
-                    if abv and (not hasattr(wine, "abv") or float(wine.abv) != float(abv)):
-                        matches = False
-                    if country and (not hasattr(wine, "country") or wine.country.lower() != country.lower()):
-                        matches = False
-
-                    if matches:
-                        filtered_wines.append(wine)
-                else:
-                    logging.warning(f'No se encontró el vino con ID: {wine_id_str}')
-            except ValueError:
-                logging.error(f'ID de vino no válido: {wine_id_str}')
-            except Exception as e:
-                logging.error(f'Error processing wine {wine_id_str}: {e}')
+    @staticmethod
+    def hydrate_recommendations(ranked: RankedRecommendations, limit: int, offset: int = 0) -> tuple[list, int]:
+        """
+        Load `limit` wines of a ranked list starting at `offset`, with their scores.
+
+        Wines that no longer exist are skipped and replaced by the next ones in the list.
 
+        Returns:
+            Tuple with the wines and the position in the list where the next page starts
+        """
+        wines_repo = WinesRepository()
+        wines = []
+        position = offset
+        while len(wines) < limit and position < len(ranked.wine_ids):
+            chunk = ranked.wine_ids[position:position + limit - len(wines)]
+            position += len(chunk)
+            found = wines_repo.get_by_ids(chunk)
+            if len(found) < len(chunk):
+                logging.warning(f'No se encontraron {len(chunk) - len(found)} de {len(chunk)} vinos recomendados')
+            for wine in found:
+                wine.add_score(ranked.scores.get(str(wine.wine_id), 0))
+            wines.extend(found)
+        return wines, position
+
+    def get_recommendations(
+        self,
+        user: 'User',
+        limit: int,
+        wine_type: str = None,
+        body: str = None,
+        dryness: str = None,
+        country: str = None,
+        abv: float = None,
+        precomputed: 'UserRecommendation' = None
+    ) -> list:
+        filters = self.recommendation_filters(wine_type, body, dryness, country, abv)
+        ranked = self.rank_recommendations(user, limit, filters, precomputed)
+
+        # Step 5: Load only the wines of the page and build response
+        filtered_wines, _ = self.hydrate_recommendations(ranked, limit)
         logging.info(f'Retorna {len(filtered_wines)} vinos tras aplicar filtros y límite')
-        return filtered_wines[:limit]
+        return filtered_wines
 
     def get_wine_scores(
         self,
@@ -184,110 +239,81 @@ class WineRecommendationsRepository:
         """
         Get compatibility scores for specific wines for a user.
 
+        Scores already computed for the same feature vector are served from
+        the score cache and only the remaining wines are sent to the model.
+
         Args:
             user: User object with preferences and ratings
             wine_ids: List of wine IDs to score
 
         Returns:
-            Dict mapping wine_id (as string) to dot product score
+            Dict mapping wine_id (as string) to compatibility score
+        """
+        return self.score_wines(user, wine_ids)[0]
+
+    def score_wines(
+        self,
+        user: 'User',
+        wine_ids: list[int]
+    ) -> tuple[dict[str, float], bool]:
+        """
+        Same as `get_wine_scores`, also telling whether the model call failed.
+
+        Wines can be left unscored without a failure (the model does not know
+        them); on a failure only the cached scores are returned.
+
+        Returns:
+            Tuple with the scores keyed by wine ID (as string) and whether the model call failed
         """
         if not user.onboarding_completed:
             logging.warning(f'User {user.uid_to_str()} has not completed onboarding')
-            return {}
+            return {}, False
 
         if not wine_ids:
             logging.warning('No wine IDs provided for scoring')
-            return {}
-
-        # Step 1: Gather user's rating history data
-        logging.info(f'Gathering rating data for user {user.uid_to_str()} to score {len(wine_ids)} wines')
+            return {}, False
 
-        user_ratings = user.get_ratings()
-
-        # Build rating data with wine attributes
-        ratings_data = []
-        for rating in user_ratings:
-            try:
-                ratings_data.append({
-                    'wine_id': rating.wine_id,
-                    'rating': rating.rating,
-                    'wine_type': rating.wine.type if hasattr(rating.wine, 'type') else None,
-                    'body': rating.wine.body if hasattr(rating.wine, 'body') else None,
-                    'abv': rating.wine.abv if hasattr(rating.wine, 'abv') else None,
-                    'country': rating.wine.country if hasattr(rating.wine, 'country') else None,
-                    'grape': rating.wine.elaborate if hasattr(rating.wine, 'elaborate') else None,
-                    'acidity': rating.wine.acidity if hasattr(rating.wine, 'acidity') else None,
-                    'complexity': 0,
-                    'is_reserve': False,
-                    'is_grand': False,
-                    'created_at': None,
-                })
-            except Exception as e:
-                logging.warning(f'Could not process rating: {e}')
-                continue
+        # Steps 1 and 2: Gather user's rating history data and calculate user features
+        user_features = self._calculate_user_features(user)
 
-        # Step 2: Calculate user features
-        logging.info(f'Calculating features for user {user.uid_to_str()} with {len(ratings_data)} ratings')
-        user_features = self.features_service.calculate_features(
-            user_id=user.uid_to_str(),
-            ratings_data=ratings_data,
-            preferences_data=user.preferences if hasattr(user, 'preferences') else None
-        )
+        # Only wines without a cached score for this feature vector go to the model
+        user_id = user.uid_to_str()
+        features_fingerprint = score_cache.fingerprint(user_features)
+        cached_scores, missing_wine_ids = score_cache.get_many(user_id, features_fingerprint, wine_ids)
+        if not missing_wine_ids:
+            logging.info(f'All {len(cached_scores)} scores for user {user_id} served from cache')
+            return cached_scores, False
+        logging.info(f'{len(cached_scores)} scores cached, {len(missing_wine_ids)} wines left to score for user {user_id}')
+        wine_ids = missing_wine_ids
 
         # Step 3: Call the /wines/score endpoint
         logging.info(f'Calling /wines/score endpoint with {len(wine_ids)} wine IDs')
 
-        # Convert wine_ids to strings as expected by the API
-        wine_ids_str = [str(wine_id) for wine_id in wine_ids]
-
-        payload = {
-            'user_data': user_features,
-            'wine_ids': wine_ids_str,
-            'user_id': user.uid_to_str()
-        }
-        body_json = json.dumps(payload)
+        payload = build_scoring_payload(settings.MODEL_WIRE_FORMAT, user_id, user_features, wine_ids)
 
         logging.info(f'Llamando a {self.model_api_url}/wines/score')
 
         try:
-            response = requests.post(
-                f'{self.model_api_url}/wines/score',
-                body_json,
-                headers={'Content-Type': 'application/json'}
-            )
+            response = self._post_model('/wines/score', payload)
 
             if response.status_code != self.OK_STATUS_CODE:
                 logging.error(
                     f'Error al obtener scores de vinos. Status: {response.status_code}, Response: {response.text}')
-                return {}
+                return cached_scores, True
 
-            # Parse response
-            parsed_response_json = response.json()
-            dot_products = parsed_response_json.get('dot_products', {})
-
-            # Log dot product statistics
-            if dot_products:
-                dot_values = list(dot_products.values())
-                logging.info(f'Dot products received for scoring - min: {min(dot_values):.6f}, max: {max(dot_values):.6f}, mean: {sum(dot_values)/len(dot_values):.6f}')
-                logging.info(f'Sample dot products: {dict(list(dot_products.items())[:5])}')
-
-            # Transform dot products to compatibility scores [0, 100]
-            compatibility_scores = {}
-            for wine_id, dot_product in dot_products.items():
-                score = self._transform_dot_product_to_score(dot_product)
-                compatibility_scores[wine_id] = score
-                if len(compatibility_scores) <= 5:  # Log first 5 transformations
-                    logging.info(f'Wine {wine_id}: dot_product={dot_product:.6f} -> score={score:.2f}')
+            # Parse response and transform dot products to compatibility scores [0, 100]
+            compatibility_scores = self._to_compatibility_scores(*parse_dot_products(response.json()))
 
             logging.info(f'Recibidos y transformados {len(compatibility_scores)} scores del modelo')
-            return compatibility_scores
+            score_cache.put_many(user_id, features_fingerprint, compatibility_scores)
+            return {**cached_scores, **compatibility_scores}, False
 
         except requests.exceptions.RequestException as e:
             logging.error(f'Error de red al llamar a /wines/score: {e}')
-            return {}
+            return cached_scores, True
         except json.JSONDecodeError as e:
             logging.error(f'Error al decodificar la respuesta JSON: {e}')
-            return {}
+            return cached_scores, True
         except Exception as e:
             logging.error(f'Error inesperado al obtener scores: {e}')
-            return {}
\ No newline at end of file
+            return cached_scores, True
\ No newline at end of file
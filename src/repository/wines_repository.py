@@ -1,25 +1,38 @@
 from typing import Any
 
+from sqlalchemy import select, update, delete, func, or_, tuple_
+
+from src.config.manager import settings
 from src.utilities.supabase_client import supabase
 from src.models.schemas.wine import WineSchema, WineFilters
+from src.repository.config.database import db
+from src.repository.table_models.wines import Wine as WineModel
+import json
 import uuid
 import logging
 
-class WinesRepository:
+class SupabaseWinesRepository:
+    """Wines through the Supabase REST API (PostgREST)."""
     table_name = "wines"
 
     @staticmethod
     def get_by_id(wine_id: int):
-        response = supabase.table(WinesRepository.table_name).select("*").eq("wine_id", wine_id).maybe_single().execute()
+        response = supabase.table(SupabaseWinesRepository.table_name).select("*").eq("wine_id", wine_id).maybe_single().execute()
         if not getattr(response, "data", None):
             raise KeyError('Wine not found')
         return WineSchema(**response.data)
 
     @staticmethod
-    def get_by_filters(filters: WineFilters, limit: int = None, offset: int = None) -> tuple[list[WineSchema], int] | list[WineSchema]:
-        # Build base query for filtering (removed count='exact' for performance)
-        query = supabase.table(WinesRepository.table_name).select("*")
+    def get_by_ids(wine_ids: list[int]) -> list[WineSchema]:
+        """Load several wines in one query, in the order of `wine_ids`. Missing wines are skipped."""
+        if not wine_ids:
+            return []
+        response = supabase.table(SupabaseWinesRepository.table_name).select("*").in_("wine_id", list(wine_ids)).execute()
+        wines_by_id = {item["wine_id"]: WineSchema(**item) for item in getattr(response, "data", None) or []}
+        return [wines_by_id[wine_id] for wine_id in wine_ids if wine_id in wines_by_id]
 
+    @staticmethod
+    def _apply_filters(query, filters: WineFilters):
         text_filters = {
             'wine_name': filters.wine_name,
             'type': filters.wine_type,
@@ -37,12 +50,31 @@ class WinesRepository:
         if filters.max_abv is not None:
             query = query.lte("abv", filters.max_abv)
 
+        if filters.q:
+            # Matches like the SQL backend; PostgREST can't order by ts_rank, so results stay ordered by name
+            query = query.filter("search_vector", "wfts(spanish)", filters.q)
+        return query
+
+    @staticmethod
+    def get_by_filters(filters: WineFilters, limit: int = None, offset: int = None, match: str = "contains", after: tuple[str, int] | None = None) -> tuple[list[WineSchema], int] | list[WineSchema]:
+        # PostgREST can't rank by trigram similarity, so "similar" searches run as "contains" here
+        # Build base query for filtering (removed count='exact' for performance)
+        query = SupabaseWinesRepository._apply_filters(supabase.table(SupabaseWinesRepository.table_name).select("*"), filters)
+
+        # Keyset pagination: wines after (wine_name, wine_id) of the last one of the previous page
+        if after is not None:
+            name = '"' + after[0].replace('\\', '\\\\').replace('"', '\\"') + '"'
+            query = query.or_(f"wine_name.gt.{name},and(wine_name.eq.{name},wine_id.gt.{int(after[1])})")
+
         # Add ordering - prioritize exact matches first, then alphabetical
-        query = query.order("wine_name", desc=False)
+        query = query.order("wine_name", desc=False).order("wine_id", desc=False)
 
         # Apply pagination if limit and offset are provided
         # Query one extra row to determine if there are more results
-        if limit is not None and offset is not None:
+        if limit is not None and after is not None:
+            offset = 0
+            query = query.limit(limit + 1)
+        elif limit is not None and offset is not None:
             query = query.range(offset, offset + limit)  # Request limit + 1 rows
 
         response = query.execute()
@@ -78,12 +110,19 @@ class WinesRepository:
 
         return wines
 
+    @staticmethod
+    def count_by_filters(filters: WineFilters, match: str = "contains", exact: bool = True) -> int:
+        """Number of wines matching the filters: exact, or the planner's estimate (cheap, approximate)."""
+        query = supabase.table(SupabaseWinesRepository.table_name).select("wine_id", count="exact" if exact else "planned", head=True)
+        response = SupabaseWinesRepository._apply_filters(query, filters).execute()
+        return response.count or 0
+
     @staticmethod
     def create(wine: WineSchema):
         wine_dict = wine.dict()
         # Genera el UUID si no está presente o es None
         wine_dict["id"] = str(uuid.uuid4())
-        response = supabase.table(WinesRepository.table_name).insert(wine_dict).execute()
+        response = supabase.table(SupabaseWinesRepository.table_name).insert(wine_dict).execute()
         if not getattr(response, "data", None):
             return None
         return WineSchema(**response.data[0])
@@ -93,20 +132,20 @@ class WinesRepository:
         # Si el campo 'id' es UUID, conviértelo a string
         if "id" in wine_data and isinstance(wine_data["id"], uuid.UUID):
             wine_data["id"] = str(wine_data["id"])
-        response = supabase.table(WinesRepository.table_name).update(wine_data).eq("wine_id", wine_id).execute()
+        response = supabase.table(SupabaseWinesRepository.table_name).update(wine_data).eq("wine_id", wine_id).execute()
         if not getattr(response, "data", None):
             return None
         return WineSchema(**response.data[0])
 
     @staticmethod
     def delete_by_id(wine_id: int):
-        response = supabase.table(WinesRepository.table_name).delete().eq("wine_id", wine_id).execute()
+        response = supabase.table(SupabaseWinesRepository.table_name).delete().eq("wine_id", wine_id).execute()
         return bool(getattr(response, "data", None))
 
     @staticmethod
     def put_summary(wine_id: int, summary: str):
         try:
-            response = supabase.table(WinesRepository.table_name).update({"summary": summary}).eq("wine_id", wine_id).execute()
+            response = supabase.table(SupabaseWinesRepository.table_name).update({"summary": summary}).eq("wine_id", wine_id).execute()
             if response.data:
                 logging.info(f"Resumen del vino {wine_id} actualizado exitosamente.")
                 return True
@@ -115,4 +154,193 @@ class WinesRepository:
                 return False
         except Exception as e:
             logging.error(f"Error inesperado al llamar a Supabase: {e}", exc_info=True)
-            return False
\ No newline at end of file
+            return False
+
+
+class SqlWinesRepository:
+    """Wines through the pooled SQLAlchemy connection, with the same semantics as `SupabaseWinesRepository`."""
+    text_filter_columns = {
+        'wine_name': WineModel.wine_name,
+        'wine_type': WineModel.type,
+        'winery': WineModel.winery,
+        'country': WineModel.country,
+        'region': WineModel.region,
+    }
+
+    @staticmethod
+    def _to_schema(wine: WineModel) -> WineSchema:
+        return WineSchema.model_validate(wine)
+
+    @staticmethod
+    def _column_values(wine_data: dict) -> dict:
+        """Keep only the keys that are writable columns of the wines table."""
+        columns = {column.key for column in WineModel.__table__.columns if column.computed is None}
+        return {key: value for key, value in wine_data.items() if key in columns}
+
+    @staticmethod
+    def get_by_id(wine_id: int):
+        with db.sessionmaker() as session:
+            wine = session.get(WineModel, wine_id)
+            if not wine:
+                raise KeyError('Wine not found')
+            return SqlWinesRepository._to_schema(wine)
+
+    @staticmethod
+    def get_by_ids(wine_ids: list[int]) -> list[WineSchema]:
+        """Load several wines in one query, in the order of `wine_ids`. Missing wines are skipped."""
+        if not wine_ids:
+            return []
+        with db.sessionmaker() as session:
+            wines = session.scalars(select(WineModel).where(WineModel.wine_id.in_(list(wine_ids)))).all()
+            wines_by_id = {wine.wine_id: SqlWinesRepository._to_schema(wine) for wine in wines}
+        return [wines_by_id[wine_id] for wine_id in wine_ids if wine_id in wines_by_id]
+
+    @staticmethod
+    def _apply_filters(query, filters: WineFilters, match: str = "contains"):
+        for field, column in SqlWinesRepository.text_filter_columns.items():
+            value = getattr(filters, field)
+            if not value:
+                continue
+            if field == 'wine_name' and match == "similar":
+                query = query.where(or_(column.ilike(f"%{value}%"), column.op('%')(value)))
+            else:
+                query = query.where(column.ilike(f"%{value}%"))
+
+        if filters.min_abv is not None:
+            query = query.where(WineModel.abv >= filters.min_abv)
+        if filters.max_abv is not None:
+            query = query.where(WineModel.abv <= filters.max_abv)
+
+        if filters.q:
+            query = query.where(WineModel.search_vector.op('@@')(func.websearch_to_tsquery('spanish', filters.q)))
+        return query
+
+    @staticmethod
+    def get_by_filters(filters: WineFilters, limit: int = None, offset: int = None, match: str = "contains", after: tuple[str, int] | None = None) -> tuple[list[WineSchema], int] | list[WineSchema]:
+        """
+        Wines matching the filters, ordered by name. Text filters match
+        substrings (ILIKE, served by the trigram indexes).
+
+        With `match="similar"` the name also matches misspellings (pg_trgm
+        `%` operator) and results are ranked in SQL: names starting with the
+        search first, then by trigram similarity, then by name.
+
+        `filters.q` is a web-search style full-text query over the weighted
+        `search_vector` column (GIN indexed); results matching it are ranked
+        by ts_rank, combined with the other filters in the same query.
+
+        `after` pages by keyset instead of offset: only wines whose
+        (wine_name, wine_id) come after it, served from the
+        (wine_name, wine_id) index at the same cost on any page. Only valid
+        with the plain name ordering.
+        """
+        query = SqlWinesRepository._apply_filters(select(WineModel), filters, match)
+        ts_query = func.websearch_to_tsquery('spanish', filters.q) if filters.q else None
+
+        if after is not None:
+            query = query.where(tuple_(WineModel.wine_name, WineModel.wine_id) > tuple_(*after))
+
+        if ts_query is not None:
+            query = query.order_by(func.ts_rank(WineModel.search_vector, ts_query).desc(), WineModel.wine_name.asc())
+        elif filters.wine_name and match == "similar":
+            query = query.order_by(
+                WineModel.wine_name.ilike(f"{filters.wine_name}%").desc(),
+                func.similarity(WineModel.wine_name, filters.wine_name).desc(),
+                WineModel.wine_name.asc(),
+            )
+        elif filters.wine_name and limit is None:
+            # Unpaginated name searches list the names starting with the search first
+            query = query.order_by(WineModel.wine_name.ilike(f"{filters.wine_name}%").desc(), WineModel.wine_name.asc())
+        else:
+            query = query.order_by(WineModel.wine_name.asc(), WineModel.wine_id.asc())
+
+        # Query one extra row to determine if there are more results
+        if limit is not None and after is not None:
+            offset = 0
+            query = query.limit(limit + 1)
+        elif limit is not None and offset is not None:
+            query = query.offset(offset).limit(limit + 1)
+
+        with db.sessionmaker() as session:
+            wines = [SqlWinesRepository._to_schema(wine) for wine in session.scalars(query).all()]
+
+        if limit is not None:
+            if not wines:
+                return [], 0
+            has_more = len(wines) > limit
+            if has_more:
+                wines = wines[:limit]
+            estimated_total = (offset or 0) + len(wines) + (limit if has_more else 0)
+            return wines, estimated_total
+
+        return wines
+
+    @staticmethod
+    def count_by_filters(filters: WineFilters, match: str = "contains", exact: bool = True) -> int:
+        """
+        Number of wines matching the filters. With `exact=False` it is the
+        planner's row estimate (EXPLAIN), which costs no scan at all but may
+        be off, mostly for selective filters.
+        """
+        query = SqlWinesRepository._apply_filters(select(WineModel.wine_id), filters, match)
+        with db.sessionmaker() as session:
+            if exact:
+                return session.scalar(select(func.count()).select_from(query.subquery())) or 0
+            connection = session.connection()
+            compiled = query.compile(dialect=connection.dialect)
+            plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params).scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    @staticmethod
+    def create(wine: WineSchema):
+        with db.sessionmaker() as session:
+            new_wine = WineModel(**SqlWinesRepository._column_values(wine.dict()))
+            session.add(new_wine)
+            try:
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logging.error(f"Error al crear el vino {wine.wine_id}: {e}")
+                return None
+            return SqlWinesRepository._to_schema(new_wine)
+
+    @staticmethod
+    def update_by_id(wine_id: int, wine_data: dict):
+        values = SqlWinesRepository._column_values(wine_data)
+        with db.sessionmaker() as session:
+            wine = session.get(WineModel, wine_id)
+            if not wine:
+                return None
+            if values:
+                session.execute(update(WineModel).where(WineModel.wine_id == wine_id).values(**values))
+                session.commit()
+                session.refresh(wine)
+            return SqlWinesRepository._to_schema(wine)
+
+    @staticmethod
+    def delete_by_id(wine_id: int):
+        with db.sessionmaker() as session:
+            result = session.execute(delete(WineModel).where(WineModel.wine_id == wine_id))
+            session.commit()
+            return result.rowcount > 0
+
+    @staticmethod
+    def put_summary(wine_id: int, summary: str):
+        try:
+            with db.sessionmaker() as session:
+                result = session.execute(update(WineModel).where(WineModel.wine_id == wine_id).values(summary=summary))
+                session.commit()
+            if result.rowcount:
+                logging.info(f"Resumen del vino {wine_id} actualizado exitosamente.")
+                return True
+            else:
+                logging.warning(f"No se encontró el vino {wine_id} para actualizar (0 filas afectadas).")
+                return False
+        except Exception as e:
+            logging.error(f"Error inesperado al actualizar el resumen en la base de datos: {e}", exc_info=True)
+            return False
+
+
+# Backend selected with WINES_REPOSITORY_BACKEND: "supabase" (default) or "sql"
+WinesRepository = SqlWinesRepository if settings.WINES_REPOSITORY_BACKEND == "sql" else SupabaseWinesRepository
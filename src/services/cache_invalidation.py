@@ -0,0 +1,35 @@
+from src.models.schemas.wine import WineSchema
+from src.services.score_cache_service import score_cache
+from src.services.ranked_search_service import ranked_search
+from src.services.recommendation_cache_service import recommendation_cache
+from src.services.search_count_service import search_counts
+from src.services.user_aggregate_cache_service import user_aggregate_cache
+from src.services.wine_catalog import wine_catalog
+from src.services.wine_facets_service import wine_facets
+from src.services.wine_search_index import wine_search_index
+
+
+def invalidate_user_caches(user_id: str):
+    """Drop everything cached from a user's ratings and preferences after they change."""
+    score_cache.invalidate_user(user_id)
+    ranked_search.invalidate_user(user_id)
+    recommendation_cache.invalidate_user(user_id)
+    user_aggregate_cache.invalidate_user(user_id)
+
+
+def invalidate_wine_caches(wine_id: int | None = None, wine: WineSchema | None = None):
+    """
+    Drop everything derived from the wine catalog after a wine is created, updated or deleted.
+
+    With `wine_id` (and `wine`, its new version, unless it was deleted) the
+    search index only updates that wine instead of being rebuilt.
+    """
+    wine_catalog.invalidate()
+    search_counts.invalidate()
+    wine_facets.invalidate()
+    if wine_id is None:
+        wine_search_index.invalidate()
+    elif wine is None:
+        wine_search_index.remove(wine_id)
+    else:
+        wine_search_index.upsert(wine)
@@ -0,0 +1,128 @@
+import logging
+import math
+import threading
+from typing import Callable
+
+from src.utilities.metrics import metrics
+
+
+class FilterSelectivityTracker:
+    """
+    Learns which fraction of the model's candidates survive each filter set.
+
+    Selectivity is tracked as an exponential moving average per normalized
+    filter set. Single-filter observations are also kept per filter, so a
+    combination never seen before is estimated as the product of its parts.
+    """
+    DEFAULT_SELECTIVITY = 0.5
+    MIN_SELECTIVITY = 0.01
+    SMOOTHING = 0.5
+
+    def __init__(self):
+        self._selectivity = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def signature(filters: dict) -> tuple:
+        return tuple(sorted(
+            (name, str(value).strip().lower()) for name, value in filters.items() if value not in (None, '')
+        ))
+
+    def estimate(self, signature: tuple) -> float:
+        if not signature:
+            return 1.0
+        with self._lock:
+            if signature in self._selectivity:
+                return self._selectivity[signature]
+            selectivity = 1.0
+            for single_filter in signature:
+                selectivity *= self._selectivity.get((single_filter,), self.DEFAULT_SELECTIVITY)
+            return max(selectivity, self.MIN_SELECTIVITY)
+
+    def record(self, signature: tuple, checked: int, passed: int):
+        if not signature or checked <= 0:
+            return
+        observed = max(passed / checked, self.MIN_SELECTIVITY)
+        with self._lock:
+            previous = self._selectivity.get(signature)
+            self._selectivity[signature] = observed if previous is None else (
+                self.SMOOTHING * observed + (1 - self.SMOOTHING) * previous
+            )
+
+
+filter_selectivity = FilterSelectivityTracker()
+
+
+class CandidatePipeline:
+    """
+    Selects the candidates of a filtered recommendation page with as few model
+    round trips as possible.
+
+    The first request over-fetches `limit / selectivity` candidates. Each
+    ranked batch is filtered at once by `select`, and only when too few
+    candidates pass is the model asked again, for a deeper ranking sized with
+    the pass rate just observed. It stops as soon as `limit` candidates pass
+    or the model has no more of them.
+    """
+    SAFETY_MARGIN = 1.25
+    MAX_CANDIDATES = 1000
+    MAX_ROUNDS = 3
+
+    def __init__(
+        self,
+        fetch_ranking: Callable[[int], tuple[list[str], dict[str, float]]],
+        select: Callable[[list[str]], list],
+        filters: dict,
+        tracker: FilterSelectivityTracker = filter_selectivity,
+    ):
+        """
+        Args:
+            fetch_ranking: Returns the top N ranked wine IDs and their scores
+            select: Returns the candidate IDs that pass the filters, in ranked order
+            filters: Active filters, used to learn their selectivity
+        """
+        self.fetch_ranking = fetch_ranking
+        self.select = select
+        self.signature = tracker.signature(filters)
+        self.tracker = tracker
+
+    def _candidates_for(self, needed: int, selectivity: float, already_ranked: int = 0) -> int:
+        wanted = already_ranked + math.ceil(needed / selectivity * self.SAFETY_MARGIN)
+        return max(1, min(self.MAX_CANDIDATES, wanted))
+
+    def run(self, limit: int) -> tuple[list, dict[str, float], bool]:
+        """
+        Returns:
+            Tuple with the IDs that passed the filters (best first, possibly more
+            than `limit`), the scores of every ranked candidate and whether the
+            model ran out of candidates
+        """
+        selectivity = self.tracker.estimate(self.signature)
+        requested = self._candidates_for(limit, selectivity) if self.signature else limit
+        selected = []
+        scores = {}
+        seen = set()
+        rounds = checked = 0
+        exhausted = False
+
+        while rounds < self.MAX_ROUNDS:
+            rounds += 1
+            wine_ids, round_scores = self.fetch_ranking(requested)
+            scores.update(round_scores)
+            new_ids = [wine_id for wine_id in wine_ids if wine_id not in seen]
+            seen.update(new_ids)
+            checked += len(new_ids)
+            selected.extend(self.select(new_ids))
+
+            logging.info(f'Candidate round {rounds}: {len(wine_ids)} ranked, {checked} checked, {len(selected)}/{limit} selected')
+
+            exhausted = len(wine_ids) < requested or requested >= self.MAX_CANDIDATES
+            if len(selected) >= limit or exhausted:
+                break
+
+            observed = max(len(selected) / checked, FilterSelectivityTracker.MIN_SELECTIVITY) if checked else selectivity
+            requested = self._candidates_for(limit - len(selected), observed, already_ranked=len(wine_ids))
+
+        self.tracker.record(self.signature, checked, len(selected))
+        metrics.observe('recommendations_model_rounds', rounds, buckets=(1, 2, 3, 4, 5))
+        return selected, scores, exhausted
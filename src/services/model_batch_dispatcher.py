@@ -0,0 +1,147 @@
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+
+from src.config.manager import settings
+from src.utilities.metrics import metrics
+
+
+class ModelResponse:
+    """Per-request slice of a batched model response, with the parts of `requests.Response` callers use."""
+
+    def __init__(self, status_code: int, body):
+        self.status_code = status_code
+        self._body = body
+
+    @property
+    def text(self) -> str:
+        return self._body if isinstance(self._body, str) else json.dumps(self._body)
+
+    def json(self):
+        if isinstance(self._body, str):
+            return json.loads(self._body)
+        return self._body
+
+
+class ModelBatchDispatcher:
+    """
+    Gathers concurrent requests to one Two Tower model endpoint and sends them
+    as a single batched payload to `<endpoint>/batch`.
+
+    A batch is flushed when it reaches `max_batch_size` requests or when
+    `window_ms` milliseconds have passed since its first request. Results are
+    handed back to each waiting caller in order.
+
+    Batch request: {"requests": [{"params": {...}, "body": {...}}, ...]}
+    Batch response: {"responses": [{"status_code": 200, "body": {...}}, ...]}
+    """
+    RESULT_TIMEOUT_SECONDS = 30
+
+    def __init__(self, endpoint_url: str, max_batch_size: int, window_ms: float):
+        self.endpoint_url = endpoint_url
+        self.max_batch_size = max(1, max_batch_size)
+        self.window_ms = max(0.0, window_ms)
+        self.metric_prefix = f"model_batch_{endpoint_url.rstrip('/').rsplit('/', 1)[-1]}"
+        self._queue = queue.Queue()
+        self._http = requests.Session()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+        metrics.set_gauge(f'{self.metric_prefix}_max_size', self.max_batch_size)
+        metrics.set_gauge(f'{self.metric_prefix}_window_ms', self.window_ms)
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f'{self.metric_prefix}_dispatcher', daemon=True)
+                self._worker.start()
+
+    def submit(self, body: dict, params: dict | None = None) -> ModelResponse:
+        """Queue one request and block until its slice of the batched response arrives."""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put(({'params': params or {}, 'body': body}, future, time.perf_counter()))
+        return future.result(timeout=self.RESULT_TIMEOUT_SECONDS)
+
+    def _collect_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                logging.error(f'Unexpected error dispatching model batch: {e}')
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _dispatch(self, batch: list):
+        sent_at = time.perf_counter()
+        metrics.increment(f'{self.metric_prefix}_batches_total')
+        metrics.increment(f'{self.metric_prefix}_requests_total', len(batch))
+        metrics.observe(f'{self.metric_prefix}_size', len(batch), buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+        for _, _, queued_at in batch:
+            metrics.observe(f'{self.metric_prefix}_queue_wait_ms', (sent_at - queued_at) * 1000)
+
+        logging.info(f'Sending batch of {len(batch)} requests to {self.endpoint_url}/batch')
+        try:
+            response = self._http.post(
+                f'{self.endpoint_url}/batch',
+                json.dumps({'requests': [request for request, _, _ in batch]}),
+                headers={'Content-Type': 'application/json'},
+                timeout=self.RESULT_TIMEOUT_SECONDS,
+            )
+        except requests.exceptions.RequestException as e:
+            metrics.increment(f'{self.metric_prefix}_errors_total')
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        metrics.observe(f'{self.metric_prefix}_latency_ms', (time.perf_counter() - sent_at) * 1000)
+
+        if response.status_code != 200:
+            # The whole batch failed: every caller sees the same error response
+            metrics.increment(f'{self.metric_prefix}_errors_total')
+            for _, future, _ in batch:
+                future.set_result(ModelResponse(response.status_code, response.text))
+            return
+
+        results = response.json().get('responses', [])
+        for index, (_, future, _) in enumerate(batch):
+            if index < len(results):
+                result = results[index]
+                future.set_result(ModelResponse(result.get('status_code', 200), result.get('body', {})))
+            else:
+                future.set_result(ModelResponse(502, 'Missing response in model batch'))
+
+
+_dispatchers = {}
+_dispatchers_lock = threading.Lock()
+
+
+def get_dispatcher(endpoint_url: str) -> ModelBatchDispatcher:
+    with _dispatchers_lock:
+        dispatcher = _dispatchers.get(endpoint_url)
+        if dispatcher is None:
+            dispatcher = _dispatchers[endpoint_url] = ModelBatchDispatcher(
+                endpoint_url,
+                max_batch_size=settings.MODEL_BATCH_MAX_SIZE,
+                window_ms=settings.MODEL_BATCH_WINDOW_MS,
+            )
+        return dispatcher
@@ -0,0 +1,113 @@
+"""
+Wire formats used to talk to the Two Tower model service.
+
+`json` is the original format: the 55 features are sent as a JSON object keyed
+by feature name and responses carry `dot_products` as a dict keyed by the
+stringified wine ID.
+
+`f32v1` is the compact format: the features are sent as a base64 encoded
+little-endian float32 vector in the fixed order of `FEATURE_ORDER`, and the
+responses carry parallel `wine_ids` / `dot_products` arrays.
+
+    request:  {"format": "f32v1", "user_id": "...", "features": "<base64>", "wine_ids": [1, 2]}
+    response: {"format": "f32v1", "wine_ids": [1, 2], "dot_products": [0.12, -0.4]}
+"""
+import base64
+
+import numpy as np
+
+JSON_FORMAT = 'json'
+COMPACT_FORMAT = 'f32v1'
+
+# Position of each feature in the compact vector. Append only: reordering breaks the wire contract.
+FEATURE_ORDER = (
+    # Basic Statistics
+    'rating_mean', 'rating_std', 'rating_count', 'rating_min', 'rating_max',
+    'wines_tried', 'avg_ratings_per_wine', 'coefficient_of_variation',
+    # Wine Type Preferences
+    'red_wine_preference', 'white_wine_preference', 'sparkling_wine_preference',
+    'rose_wine_preference', 'dessert_wine_preference', 'dessert_port_wine_preference',
+    # ABV Preferences
+    'weighted_abv_preference', 'avg_abv_tried', 'high_vs_low_abv_preference',
+    # Body Preferences
+    'very_light_bodied_preference', 'light_bodied_preference', 'medium_bodied_preference',
+    'full_bodied_preference', 'very_full_bodied_preference',
+    # Acidity Preferences
+    'low_acidity_preference', 'medium_acidity_preference', 'high_acidity_preference',
+    # Top Countries
+    'country_1_preference', 'country_2_preference', 'country_3_preference',
+    'country_4_preference', 'country_5_preference',
+    # Top Grapes
+    'grape_1_preference', 'grape_2_preference', 'grape_3_preference',
+    'grape_4_preference', 'grape_5_preference',
+    # Complexity & Quality
+    'complexity_preference', 'avg_complexity_tried', 'reserve_preference', 'grand_preference',
+    # Rating Patterns
+    'high_rating_proportion', 'low_rating_proportion', 'rating_entropy',
+    'rating_1_proportion', 'rating_2_proportion', 'rating_3_proportion',
+    'rating_4_proportion', 'rating_5_proportion',
+    # Diversity Metrics
+    'rating_range', 'rating_variance', 'unique_ratings_count', 'rating_skewness',
+    # Temporal Patterns
+    'date_range_days', 'avg_days_between_ratings', 'rating_trend', 'rating_frequency',
+)
+
+
+def features_to_vector(features: dict) -> np.ndarray:
+    return np.fromiter((features.get(name, 0.0) for name in FEATURE_ORDER), dtype='<f4', count=len(FEATURE_ORDER))
+
+
+def encode_features(features: dict) -> str:
+    return base64.b64encode(features_to_vector(features).tobytes()).decode('ascii')
+
+
+def decode_features(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype='<f4')
+
+
+def build_ranking_payload(wire_format: str, user_id: str, features: dict) -> dict:
+    """Request body for /wines."""
+    if wire_format == COMPACT_FORMAT:
+        return {'format': COMPACT_FORMAT, 'user_id': user_id, 'features': encode_features(features)}
+    return {
+        'user_id': user_id,  # Include user_id for future requirements
+        **features  # All 55 features
+    }
+
+
+def build_scoring_payload(wire_format: str, user_id: str, features: dict, wine_ids: list) -> dict:
+    """Request body for /wines/score."""
+    if wire_format == COMPACT_FORMAT:
+        return {
+            'format': COMPACT_FORMAT,
+            'user_id': user_id,
+            'features': encode_features(features),
+            'wine_ids': [int(wine_id) for wine_id in wine_ids],
+        }
+    return {
+        'user_data': features,
+        'wine_ids': [str(wine_id) for wine_id in wine_ids],
+        'user_id': user_id
+    }
+
+
+def parse_dot_products(parsed_response: dict) -> tuple[list[str], np.ndarray]:
+    """Return the scored wine IDs (as strings) and their dot products as parallel sequences."""
+    if parsed_response.get('format') == COMPACT_FORMAT:
+        wine_ids = [str(wine_id) for wine_id in parsed_response.get('wine_ids', [])]
+        return wine_ids, np.asarray(parsed_response.get('dot_products') or [], dtype=np.float64)
+    dot_products = parsed_response.get('dot_products') or {}
+    return list(dot_products.keys()), np.fromiter(dot_products.values(), dtype=np.float64, count=len(dot_products))
+
+
+def parse_ranked_wine_ids(parsed_response: dict) -> list[str]:
+    """Wine IDs (as strings) in the order ranked by the model."""
+    if parsed_response.get('format') == COMPACT_FORMAT:
+        return [str(wine_id) for wine_id in parsed_response.get('wine_ids', [])]
+    return [str(wine_id) for wine_id in parsed_response.get('wines', [])]
+
+
+def dot_products_to_scores(dot_products: np.ndarray) -> np.ndarray:
+    """Vectorized sigmoid(dot_product) * 100, rounded to 2 decimals."""
+    with np.errstate(over='ignore'):
+        return np.round(100.0 / (1.0 + np.exp(-dot_products)), 2)
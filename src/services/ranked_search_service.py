@@ -0,0 +1,101 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable
+
+from src.models.schemas.wine import WineSchema, WineFilters
+from src.models.user import User
+from src.repository.wines_repository import WinesRepository
+from src.repository.wine_recommendations_repository import WineRecommendationsRepository
+
+
+class RankedSearchService:
+    """
+    Keeps, per user and filter set, a bounded window of search candidates
+    ranked by compatibility score.
+
+    The window is scored in bulk once and later pages are slices of it, so
+    paging through a score-sorted search does not call the model again.
+    """
+    CANDIDATE_WINDOW = 200
+    CACHE_EXPIRY_MINUTES = 10
+
+    def __init__(self):
+        # {(user_id, filters_key): (ranked wines, timestamp)}
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def filters_key(filters: WineFilters) -> tuple:
+        return tuple(
+            (field, value.strip().lower() if isinstance(value, str) else value)
+            for field, value in sorted(filters.model_dump().items())
+            if value not in (None, '')
+        )
+
+    def _get_cached(self, key: tuple) -> list[WineSchema] | None:
+        with self._lock:
+            cached = self._windows.get(key)
+            if not cached:
+                return None
+            ranked_wines, timestamp = cached
+            if datetime.now() - timestamp >= timedelta(minutes=self.CACHE_EXPIRY_MINUTES):
+                del self._windows[key]
+                return None
+            return ranked_wines
+
+    def get_cached_window(self, user_id: str, filters: WineFilters) -> list[WineSchema] | None:
+        """Ranked window for a user and filter set if it is cached, without computing it."""
+        return self._get_cached((user_id, self.filters_key(filters)))
+
+    def get_ranked_window(
+        self,
+        user_id: str,
+        filters: WineFilters,
+        load_user: Callable[[], User],
+    ) -> list[WineSchema]:
+        """
+        Return the ranked candidate window for a user and filter set, computing it if needed.
+
+        Args:
+            user_id: ID of the user the window is ranked for
+            filters: Search filters selecting the candidates
+            load_user: Loads the user aggregate, only called when the window has to be computed
+        """
+        key = (user_id, self.filters_key(filters))
+        ranked_wines = self._get_cached(key)
+        if ranked_wines is not None:
+            logging.info(f'Serving score-ranked search window for user {user_id} from cache')
+            return ranked_wines
+
+        user = load_user()
+        candidates, _ = WinesRepository.get_by_filters(filters, limit=self.CANDIDATE_WINDOW, offset=0)
+        logging.info(f'Scoring {len(candidates)} search candidates for user {user_id}')
+
+        scores, failed = WineRecommendationsRepository().score_wines(user, [wine.wine_id for wine in candidates]) if candidates else ({}, False)
+        for wine in candidates:
+            score = scores.get(str(wine.wine_id))
+            if score is not None:
+                wine.add_score(score)
+
+        # Wines the model did not score go last
+        ranked_wines = sorted(
+            candidates,
+            key=lambda wine: (wine.score is None, -(wine.score or 0.0), (wine.wine_name or '').lower())
+        )
+        # When the model call fails only cached scores are known and the order is wrong,
+        # so the window is served once but not kept for later pages
+        if failed:
+            logging.warning(f'Scoring failed for the search candidates of user {user_id}, window not cached')
+            return ranked_wines
+        with self._lock:
+            self._windows[key] = (ranked_wines, datetime.now())
+        return ranked_wines
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            for key in [key for key in self._windows if key[0] == str(user_id)]:
+                del self._windows[key]
+
+
+ranked_search = RankedSearchService()
@@ -0,0 +1,140 @@
+import logging
+import secrets
+import threading
+from datetime import datetime, timedelta
+
+from src.services.candidate_pipeline import FilterSelectivityTracker
+from src.services.wine_catalog import wine_catalog
+from src.utilities.cursor import decode_cursor, encode_cursor
+
+
+class RankedRecommendations:
+    """Ranked wine IDs of a user for one filter set, already filtered but not hydrated."""
+
+    def __init__(self, wine_ids: list[int], scores: dict[str, float], exhausted: bool):
+        """
+        Args:
+            wine_ids: Wine IDs that passed the filters, best first
+            scores: Compatibility score per wine ID (as string)
+            exhausted: The model has no more candidates, so a deeper ranking would not add wines
+        """
+        self.wine_ids = wine_ids
+        self.scores = scores
+        self.exhausted = exhausted
+        self.list_id = secrets.token_urlsafe(8)
+
+    def covers(self, limit: int) -> bool:
+        return self.exhausted or len(self.wine_ids) >= limit
+
+
+class RecommendationCacheService:
+    """
+    Cache of ranked recommendation lists per user and filter set.
+
+    A list is enough for any `limit` it covers, so requests only differing in
+    their limit share it. A filtered request can also be answered from the
+    unfiltered list of the user (filtered through the wine catalog) when
+    enough of its wines pass.
+
+    Invalidating a user bumps their generation: lists computed before the
+    invalidation but stored after it are discarded.
+
+    Cached lists are also paged with opaque cursors. A cursor points at a
+    position of one specific list, so it stops working when that list expires
+    or is replaced, and following it never calls the model.
+    """
+    CACHE_EXPIRY_MINUTES = 30
+    # Ranking depth held for paging; cursors never go past it
+    PAGING_DEPTH = 100
+
+    def __init__(self):
+        # {(user_id, filters signature): (RankedRecommendations, timestamp)}
+        self._entries = {}
+        # {user_id: generation}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_id: str, filters: dict) -> tuple:
+        return user_id, FilterSelectivityTracker.signature(filters)
+
+    def generation(self, user_id: str) -> int:
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def _get_entry(self, key: tuple) -> RankedRecommendations | None:
+        with self._lock:
+            cached = self._entries.get(key)
+            if not cached:
+                return None
+            ranked, timestamp = cached
+            if datetime.now() - timestamp >= timedelta(minutes=self.CACHE_EXPIRY_MINUTES):
+                del self._entries[key]
+                return None
+            return ranked
+
+    def get(self, user_id: str, filters: dict, limit: int) -> RankedRecommendations | None:
+        """Cached ranked list covering `limit` wines for the user and filters, if any."""
+        key = self._key(user_id, filters)
+        ranked = self._get_entry(key)
+        if ranked and ranked.covers(limit):
+            return ranked
+        if not key[1]:
+            return None
+
+        unfiltered = self._get_entry((user_id, ()))
+        if not unfiltered:
+            return None
+        wine_ids = wine_catalog.filter_ids(unfiltered.wine_ids, filters)
+        derived = RankedRecommendations(wine_ids, unfiltered.scores, unfiltered.exhausted)
+        if not derived.covers(limit):
+            return None
+        logging.info(f'Recomendaciones filtradas del usuario {user_id} obtenidas de su lista sin filtros')
+        with self._lock:
+            self._entries[key] = (derived, datetime.now())
+        return derived
+
+    def get_by_cursor(self, user_id: str, filters: dict, cursor: str) -> tuple[RankedRecommendations, int] | None:
+        """
+        Ranked list and position a cursor points at, or None if that list is no longer cached.
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        list_id, offset = self.decode_cursor(cursor)
+        ranked = self._get_entry(self._key(user_id, filters))
+        if not ranked or ranked.list_id != list_id:
+            return None
+        return ranked, offset
+
+    @staticmethod
+    def encode_cursor(ranked: RankedRecommendations, offset: int) -> str:
+        return encode_cursor({'l': ranked.list_id, 'o': offset})
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[str, int]:
+        payload = decode_cursor(cursor)
+        try:
+            list_id, offset = str(payload['l']), int(payload['o'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f'Cursor inválido: {e}')
+        if offset < 0:
+            raise ValueError('Cursor inválido: posición negativa')
+        return list_id, offset
+
+    def put(self, user_id: str, filters: dict, ranked: RankedRecommendations, generation: int):
+        """Store a ranked list computed when the user was at `generation`."""
+        with self._lock:
+            if self._generations.get(user_id, 0) != generation:
+                logging.info(f'Descartando recomendaciones obsoletas del usuario {user_id}')
+                return
+            self._entries[self._key(user_id, filters)] = (ranked, datetime.now())
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+
+recommendation_cache = RecommendationCacheService()
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+
+
+class ScoreCacheService:
+    """
+    Cache of compatibility scores per (user, wine).
+
+    Scores are grouped by user and tagged with a fingerprint of the feature
+    vector they were computed with. When the user's features change the
+    fingerprint changes too, and every score cached for that user is dropped.
+    """
+    CACHE_EXPIRY_MINUTES = 30
+    MAX_WINES_PER_USER = 5000
+
+    def __init__(self):
+        # {user_id: (fingerprint, {wine_id: score}, timestamp)}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(features: dict) -> str:
+        """Stable hash of a user feature vector, used as its version."""
+        encoded = json.dumps(features, sort_keys=True, default=float).encode('utf-8')
+        return hashlib.sha1(encoded).hexdigest()
+
+    def get_many(self, user_id: str, fingerprint: str, wine_ids: list) -> tuple[dict[str, float], list]:
+        """
+        Look up cached scores for a user.
+
+        Returns:
+            Tuple with the cached scores (wine_id as string -> score) and the
+            list of wine IDs that still need to be scored by the model
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry:
+                cached_fingerprint, scores, timestamp = entry
+                if cached_fingerprint != fingerprint or datetime.now() - timestamp >= timedelta(minutes=self.CACHE_EXPIRY_MINUTES):
+                    logging.info(f'Score cache for user {user_id} is stale, discarding it')
+                    del self._entries[user_id]
+                    entry = None
+
+            if not entry:
+                return {}, list(wine_ids)
+
+            _, scores, _ = entry
+            cached = {}
+            missing = []
+            for wine_id in wine_ids:
+                wine_id_str = str(wine_id)
+                if wine_id_str in scores:
+                    cached[wine_id_str] = scores[wine_id_str]
+                else:
+                    missing.append(wine_id)
+            return cached, missing
+
+    def put_many(self, user_id: str, fingerprint: str, scores: dict[str, float]):
+        if not scores:
+            return
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] == fingerprint:
+                _, cached_scores, timestamp = entry
+            else:
+                cached_scores, timestamp = {}, datetime.now()
+
+            if len(cached_scores) + len(scores) > self.MAX_WINES_PER_USER:
+                cached_scores = {}
+                timestamp = datetime.now()
+
+            cached_scores.update({str(wine_id): score for wine_id, score in scores.items()})
+            self._entries[user_id] = (fingerprint, cached_scores, timestamp)
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            if self._entries.pop(str(user_id), None) is not None:
+                logging.info(f'Score cache invalidated for user {user_id}')
+
+
+score_cache = ScoreCacheService()
@@ -0,0 +1,76 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from src.models.schemas.wine import WineFilters
+from src.repository.wines_repository import WinesRepository
+from src.services.ranked_search_service import RankedSearchService
+from src.utilities.metrics import metrics
+
+
+class SearchCountService:
+    """
+    Result counts of wine searches, cached per normalized filter set.
+
+    Each count starts from the planner's estimate, which costs no scan. Broad
+    filters keep it (marked as an estimate, where being off by a few percent
+    does not matter); selective ones, estimated at EXACT_COUNT_THRESHOLD
+    wines or fewer, are counted exactly, which is cheap because few rows
+    match. Counts are kept until the catalog changes or they expire, and at
+    most MAX_ENTRIES of them, dropping the oldest first.
+    """
+    EXACT_COUNT_THRESHOLD = 5000
+    CACHE_EXPIRY_MINUTES = 60
+    MAX_ENTRIES = 1000
+
+    def __init__(self):
+        # {(filters_key, match): (total, is_estimate, timestamp)}
+        self._counts = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def count(self, filters: WineFilters, match: str = "contains") -> tuple[int, bool]:
+        """Number of wines matching the filters and whether it is an estimate."""
+        key = (RankedSearchService.filters_key(filters), match)
+        with self._lock:
+            cached = self._counts.get(key)
+            generation = self._generation
+            if cached and datetime.now() - cached[2] >= timedelta(minutes=self.CACHE_EXPIRY_MINUTES):
+                del self._counts[key]
+                cached = None
+        if cached:
+            metrics.increment('search_count_cache_hits_total')
+            return cached[0], cached[1]
+
+        metrics.increment('search_count_cache_misses_total')
+        total = WinesRepository.count_by_filters(filters, match=match, exact=False)
+        is_estimate = total > self.EXACT_COUNT_THRESHOLD
+        if not is_estimate:
+            total = WinesRepository.count_by_filters(filters, match=match, exact=True)
+        logging.info(f"Search count for {key}: {total} ({'estimate' if is_estimate else 'exact'})")
+
+        with self._lock:
+            if generation == self._generation:
+                # Re-inserted at the end, so counts stay ordered from oldest to newest
+                self._counts.pop(key, None)
+                self._evict()
+                self._counts[key] = (total, is_estimate, datetime.now())
+        return total, is_estimate
+
+    def _evict(self):
+        # Called with the lock held, before adding a count: drops the expired counts and then the oldest over MAX_ENTRIES
+        expired_before = datetime.now() - timedelta(minutes=self.CACHE_EXPIRY_MINUTES)
+        while self._counts:
+            oldest = next(iter(self._counts))
+            if len(self._counts) < self.MAX_ENTRIES and self._counts[oldest][2] > expired_before:
+                break
+            del self._counts[oldest]
+
+    def invalidate(self):
+        """Drop every count, e.g. after a wine is created, updated or deleted."""
+        with self._lock:
+            self._generation += 1
+            self._counts.clear()
+
+
+search_counts = SearchCountService()
@@ -0,0 +1,62 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+
+class UserAggregateCacheService:
+    """
+    Cache of the preferences, favorites and ratings of each user.
+
+    Entries are tagged with the `users.aggregate_version` they were loaded
+    at. Every write to those parts bumps the version in the same transaction,
+    and readers always compare against the version in the users row they
+    have just read, so an entry older than the last committed write is never
+    served, whichever worker made the write.
+    """
+    CACHE_EXPIRY_MINUTES = 30
+    MAX_USERS = 2000
+
+    def __init__(self):
+        # {user_id: (version, {part: list}, timestamp)}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, version: int) -> dict[str, list]:
+        """Cached parts of the user at `version` (possibly none)."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if not entry:
+                return {}
+            cached_version, parts, timestamp = entry
+            if cached_version != version or datetime.now() - timestamp >= timedelta(minutes=self.CACHE_EXPIRY_MINUTES):
+                del self._entries[user_id]
+                return {}
+            # Copies, so callers adding favorites or preferences to their user do not change the cache
+            return {part: list(value) for part, value in parts.items()}
+
+    def put(self, user_id: str, version: int, parts: dict[str, list]):
+        """Add parts of the user loaded at `version`, keeping the ones already cached for it."""
+        if not parts:
+            return
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] == version:
+                cached_parts, timestamp = entry[1], entry[2]
+            elif entry and entry[0] > version:
+                # Loaded before a write another request already cached
+                return
+            else:
+                cached_parts, timestamp = {}, datetime.now()
+                if len(self._entries) >= self.MAX_USERS:
+                    oldest = min(self._entries, key=lambda key: self._entries[key][2])
+                    del self._entries[oldest]
+            cached_parts.update({part: list(value) for part, value in parts.items()})
+            self._entries[user_id] = (version, cached_parts, timestamp)
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            if self._entries.pop(str(user_id), None) is not None:
+                logging.info(f'User aggregate cache invalidated for user {user_id}')
+
+
+user_aggregate_cache = UserAggregateCacheService()
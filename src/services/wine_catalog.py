@@ -0,0 +1,205 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+from src.models.schemas.wine import WineFilters
+from src.repository.config.database import db
+from src.repository.table_models.wines import Wine
+
+
+class WineCatalog:
+    """
+    Columnar, in-memory copy of the wine attributes used to filter recommendations.
+
+    Each categorical attribute is dictionary encoded: the distinct values
+    (lowercased) get an integer code and the column is an int32 array indexed
+    by `wine_id`, with -1 for missing values or IDs not in the catalog. ABV is
+    kept as a float64 array with NaN for missing values. Filtering a ranked
+    candidate list is then a single boolean mask over those arrays.
+
+    The same columns give the facet counts of a `/wines/search` filter set:
+    each active filter is a boolean mask, and a facet counts its codes
+    (`np.bincount`) under the intersection of the other filters' masks.
+
+    The catalog is loaded lazily, reloaded after CACHE_EXPIRY_MINUTES and
+    invalidated whenever a wine is created, updated or deleted.
+    """
+    CATEGORICAL_COLUMNS = ('type', 'body', 'country', 'acidity', 'region', 'winery')
+    # WineFilters field -> categorical column it filters, by substring like the repository
+    SEARCH_FILTER_COLUMNS = {'wine_type': 'type', 'winery': 'winery', 'country': 'country', 'region': 'region'}
+    CACHE_EXPIRY_MINUTES = 60
+    MISSING = -1
+
+    def __init__(self):
+        self._codes = {}  # {column: np.ndarray of codes indexed by wine_id}
+        self._vocabularies = {}  # {column: {lowercased value: code}}
+        self._labels = {}  # {column: [value as first seen, per code]}
+        self._names = []  # lowercased wine_name indexed by wine_id, '' if missing
+        self._abv = np.empty(0, dtype=np.float64)
+        self._present = np.empty(0, dtype=bool)
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(value) -> str | None:
+        if value is None:
+            return None
+        value = str(value).strip().lower()
+        return value or None
+
+    def _load(self):
+        with db.sessionmaker() as session:
+            rows = session.execute(
+                select(Wine.wine_id, Wine.wine_name, Wine.abv, *(getattr(Wine, column) for column in self.CATEGORICAL_COLUMNS))
+            ).all()
+
+        size = max((row.wine_id for row in rows), default=-1) + 1
+        present = np.zeros(size, dtype=bool)
+        abv = np.full(size, np.nan, dtype=np.float64)
+        codes = {column: np.full(size, self.MISSING, dtype=np.int32) for column in self.CATEGORICAL_COLUMNS}
+        vocabularies = {column: {} for column in self.CATEGORICAL_COLUMNS}
+        labels = {column: [] for column in self.CATEGORICAL_COLUMNS}
+        names = [''] * size
+
+        for row in rows:
+            present[row.wine_id] = True
+            names[row.wine_id] = (row.wine_name or '').lower()
+            if row.abv is not None:
+                abv[row.wine_id] = row.abv
+            for column in self.CATEGORICAL_COLUMNS:
+                value = self._normalize(getattr(row, column))
+                if value is not None:
+                    vocabulary = vocabularies[column]
+                    if value not in vocabulary:
+                        vocabulary[value] = len(vocabulary)
+                        labels[column].append(str(getattr(row, column)).strip())
+                    codes[column][row.wine_id] = vocabulary[value]
+
+        self._present, self._abv, self._codes, self._vocabularies, self._labels, self._names = present, abv, codes, vocabularies, labels, names
+        self._loaded_at = datetime.now()
+        logging.info(f'Catálogo de vinos cargado: {len(rows)} vinos')
+
+    def _ensure_loaded(self):
+        if self._loaded_at and datetime.now() - self._loaded_at < timedelta(minutes=self.CACHE_EXPIRY_MINUTES):
+            return
+        with self._lock:
+            if self._loaded_at and datetime.now() - self._loaded_at < timedelta(minutes=self.CACHE_EXPIRY_MINUTES):
+                return
+            self._load()
+
+    def invalidate(self):
+        """Drop the catalog; it is reloaded on the next filter."""
+        with self._lock:
+            self._loaded_at = None
+
+    def mask(self, wine_ids: np.ndarray, filters: dict) -> np.ndarray:
+        """
+        Boolean mask of the wine IDs that pass every active filter.
+
+        Args:
+            wine_ids: int64 array of candidate wine IDs
+            filters: Column name -> wanted value. Falsy values are ignored.
+                `abv` is compared for equality, any other name is a categorical
+                column; a name the catalog does not hold matches no wine.
+        """
+        self._ensure_loaded()
+        present, abv, codes, vocabularies = self._present, self._abv, self._codes, self._vocabularies
+        if len(present) == 0:
+            # Empty catalog: no wine passes, and there is no row 0 to index
+            return np.zeros(len(wine_ids), dtype=bool)
+
+        in_catalog = (wine_ids >= 0) & (wine_ids < len(present))
+        rows = np.where(in_catalog, wine_ids, 0)
+        keep = in_catalog & present[rows]
+
+        for column, value in filters.items():
+            if not value:
+                continue
+            if column == 'abv':
+                keep &= abv[rows] == float(value)
+                continue
+            code = vocabularies.get(column, {}).get(self._normalize(value))
+            if code is None:
+                return np.zeros(len(wine_ids), dtype=bool)
+            keep &= codes[column][rows] == code
+        return keep
+
+    def facet_counts(self, filters: WineFilters, facets: tuple, abv_edges: tuple) -> tuple[int, dict]:
+        """
+        Number of wines `/wines/search` returns for the filters and, per
+        facet, how many of them have each value.
+
+        Filters match like `WinesRepository.get_by_filters`: text filters
+        are case-insensitive substrings (ILIKE '%value%'). A facet ignores
+        its own filter, so it lists the alternatives to the selected value
+        with the counts choosing them would give.
+
+        Args:
+            filters: Search filters; a full-text `q` can't be evaluated here and raises ValueError
+            facets: Categorical columns to count; `abv` counts ABV buckets
+            abv_edges: Ascending ABV bucket boundaries; wines below the first
+                or from the last one fall in open-ended buckets
+
+        Returns:
+            (total, {facet: {label: count}}), labels of the most frequent values first
+        """
+        if filters.q:
+            raise ValueError("Los facets no admiten búsqueda de texto completo (q)")
+        self._ensure_loaded()
+        present, abv, codes, vocabularies, labels = self._present, self._abv, self._codes, self._vocabularies, self._labels
+
+        masks = {}
+        for field, column in self.SEARCH_FILTER_COLUMNS.items():
+            value = getattr(filters, field)
+            if value:
+                needle = value.lower()
+                masks[column] = np.isin(codes[column], [code for text, code in vocabularies[column].items() if needle in text])
+        if filters.min_abv is not None:
+            masks['abv'] = present & (abv >= filters.min_abv)
+        if filters.max_abv is not None:
+            masks['abv'] = masks.get('abv', present) & (abv <= filters.max_abv)
+        if filters.wine_name:
+            # Not a facet, so its mask applies to every facet
+            needle = filters.wine_name.lower()
+            masks['wine_name'] = np.fromiter((needle in name for name in self._names), dtype=bool, count=len(self._names))
+
+        def passing(excluded: str | None) -> np.ndarray:
+            keep = present.copy()
+            for column, mask in masks.items():
+                if column != excluded:
+                    keep &= mask
+            return keep
+
+        counts = {}
+        for facet in facets:
+            keep = passing(facet)
+            if facet == 'abv':
+                values = abv[keep & ~np.isnan(abv)]
+                buckets = np.bincount(np.searchsorted(abv_edges, values, side='right'), minlength=len(abv_edges) + 1)
+                bucket_labels = [f'<{abv_edges[0]:g}'] + [f'{low:g}-{high:g}' for low, high in zip(abv_edges, abv_edges[1:])] + [f'{abv_edges[-1]:g}+']
+                counts[facet] = {label: int(count) for label, count in zip(bucket_labels, buckets) if count}
+                continue
+            column_codes = codes[facet][keep]
+            frequencies = np.bincount(column_codes[column_codes != self.MISSING], minlength=len(vocabularies[facet]))
+            counts[facet] = {
+                labels[facet][code]: int(frequencies[code])
+                for code in np.argsort(-frequencies, kind='stable') if frequencies[code]
+            }
+        return int(passing(None).sum()), counts
+
+    def filter_ids(self, wine_ids: list, filters: dict) -> list[int]:
+        """Wine IDs that pass the filters, in their original order."""
+        parsed = []
+        for wine_id in wine_ids:
+            try:
+                parsed.append(int(wine_id))
+            except (TypeError, ValueError):
+                logging.error(f'ID de vino no válido: {wine_id}')
+        candidates = np.asarray(parsed, dtype=np.int64)
+        return candidates[self.mask(candidates, filters)].tolist()
+
+
+wine_catalog = WineCatalog()
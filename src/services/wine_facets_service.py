@@ -0,0 +1,65 @@
+import threading
+from datetime import datetime, timedelta
+
+from src.models.schemas.wine import WineFilters
+from src.services.wine_catalog import wine_catalog
+from src.utilities.metrics import metrics
+
+
+class WineFacetsService:
+    """
+    Facet counts (type, country, region, body, ABV bucket) of the wines a
+    `/wines/search` filter set returns, computed from the columnar wine
+    catalog and cached per normalized filter set until the catalog changes.
+    """
+    FACETS = ('type', 'country', 'region', 'body', 'abv')
+    ABV_BUCKET_EDGES = (11.0, 12.0, 13.0, 14.0, 15.0)
+    CACHE_EXPIRY_MINUTES = 60
+    MAX_ENTRIES = 1000
+
+    def __init__(self):
+        # {filters key: (total, counts, timestamp)}
+        self._entries = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(filters: WineFilters) -> tuple:
+        return tuple(
+            (field, value.strip().lower() if isinstance(value, str) else value)
+            for field, value in sorted(filters.model_dump().items())
+            if value not in (None, '')
+        )
+
+    def get(self, filters: WineFilters) -> tuple[int, dict]:
+        """
+        Wines passing the search filters and their facet counts.
+
+        Raises:
+            ValueError: for filters the catalog can't evaluate (full-text `q`)
+        """
+        key = self._key(filters)
+        with self._lock:
+            cached = self._entries.get(key)
+            generation = self._generation
+        if cached and datetime.now() - cached[2] < timedelta(minutes=self.CACHE_EXPIRY_MINUTES):
+            metrics.increment('wine_facets_cache_hits_total')
+            return cached[0], cached[1]
+
+        metrics.increment('wine_facets_cache_misses_total')
+        total, counts = wine_catalog.facet_counts(filters, self.FACETS, self.ABV_BUCKET_EDGES)
+        with self._lock:
+            if generation == self._generation:
+                if len(self._entries) >= self.MAX_ENTRIES:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = (total, counts, datetime.now())
+        return total, counts
+
+    def invalidate(self):
+        """Drop every cached count, e.g. after a wine is created, updated or deleted."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+wine_facets = WineFacetsService()
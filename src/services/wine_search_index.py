@@ -0,0 +1,483 @@
+import logging
+import re
+import threading
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from itertools import combinations
+
+import numpy as np
+from sqlalchemy import select, tuple_
+
+from src.models.schemas.wine import WineSchema, WineFilters
+from src.repository.config.database import db
+from src.repository.table_models.wines import Wine
+from src.utilities.metrics import metrics
+
+QUERY_MS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50)
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def fold(text) -> str:
+    """Lowercase `text` and strip its accents ("Añejo Ribera" -> "anejo ribera")."""
+    if text is None:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def tokenize(text) -> list[str]:
+    return _TOKEN_PATTERN.findall(fold(text))
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance (a transposition counts as one edit), or max_distance + 1 if larger."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+    return current[-1]
+
+
+class WineSearchIndex:
+    """
+    In-process search engine over the wine catalog, answering `/wines/search`
+    without a round trip to the database, with the same results as
+    `WinesRepository.get_by_filters`.
+
+    Wines are rows numbered in the database's (wine_name, wine_id) order,
+    which follows the column collation; the index never compares names
+    itself, so its pages and keyset cursors are interchangeable with the
+    repository's. Names are accent folded and split into tokens:
+
+    - an inverted index maps each name token to the sorted rows holding it;
+    - a trigram index over the token vocabulary finds the tokens containing
+      a query word, so substring (and so prefix, as-you-type) searches only
+      look at the postings of those tokens. Candidates are then checked
+      against the lowercased name, so results are exactly those of the
+      repository's ILIKE '%value%';
+    - a deletion neighbourhood index (SymSpell) maps every variant of a
+      token prefix with up to MAX_TYPOS characters deleted to the tokens it
+      comes from, so with `match="similar"` a misspelled word finds its
+      candidates with a few dict lookups and only those are checked with an
+      edit distance.
+
+    Structured filters (type, winery, country, region, ABV) are boolean
+    bitmaps over the rows, cached per filter value, intersected with the
+    name matches.
+
+    Full-text `q` searches are not answered here: they rely on Postgres'
+    Spanish stemming and ranking, so `search` returns None for them and
+    callers use the repository.
+
+    The index is built in the background at startup and again every
+    CACHE_EXPIRY_MINUTES; until the first build finishes `search` returns
+    None as well. Single wine writes are applied incrementally: the new
+    version is appended as a new row, placed in name order after the wine
+    the database sorts before it, and the old row is tombstoned; the index
+    is rebuilt once tombstones pass MAX_TOMBSTONE_RATIO.
+    """
+    CACHE_EXPIRY_MINUTES = 360
+    MAX_TOMBSTONE_RATIO = 0.2
+    # Typos tolerated per word: 1 from MIN_TYPO_LENGTH characters, 2 from MIN_TWO_TYPOS_LENGTH
+    MAX_TYPOS = 2
+    MIN_TYPO_LENGTH = 4
+    MIN_TWO_TYPOS_LENGTH = 8
+    # Only this many leading characters of a token go into the deletion index
+    DELETES_PREFIX_LENGTH = 7
+    MAX_CACHED_MASKS = 256
+    FILTER_COLUMNS = {'wine_type': 'type', 'winery': 'winery', 'country': 'country', 'region': 'region'}
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._building = False
+        self._writes_during_build = False
+        self._reset()
+
+    def _reset(self):
+        self._wine_ids = []  # wine_id per row
+        self._keys = []  # (wine_name, wine_id) per row
+        self._names = []  # lowercased wine_name per row
+        self._row_of = {}  # {wine_id: live row}
+        self._live = np.zeros(0, dtype=bool)
+        # Rows whose lowercased name has no accents, so a token match is already a substring match
+        self._plain = np.zeros(0, dtype=bool)
+        self._abv = np.zeros(0, dtype=np.float64)
+        self._codes = {column: np.zeros(0, dtype=np.int32) for column in self.FILTER_COLUMNS.values()}
+        self._vocabularies = {column: {} for column in self.FILTER_COLUMNS.values()}  # {column: {lowercased value: code}}
+        self._postings = {}  # {name token: sorted int32 rows}
+        self._trigrams = {}  # {trigram: set of tokens containing it}
+        self._deletes = {}  # {deletion variant: set of tokens}
+        self._masks = {}  # {(column, value): bool bitmap}
+        self._word_rows = {}  # {(query word, typos): rows}
+        self._name_rows = {}  # {(lowercased wine_name filter, similar): (rows, closeness)}
+        self._order = []  # rows in name order, tombstoned ones included
+        self._ranks = np.zeros(0, dtype=np.int32)  # position of each row in name order
+        self._ordered = True
+
+    # Building
+
+    @staticmethod
+    def _deletion_variants(token: str, max_deletes: int) -> set[str]:
+        variants = {token}
+        for deletes in range(1, min(max_deletes, len(token) - 1) + 1):
+            for positions in combinations(range(len(token)), deletes):
+                variants.add(''.join(char for i, char in enumerate(token) if i not in positions))
+        return variants
+
+    @staticmethod
+    def _token_trigrams(word: str) -> set[str]:
+        return {word[i:i + 3] for i in range(len(word) - 2)}
+
+    def _add_token(self, token: str):
+        for trigram in self._token_trigrams(token):
+            self._trigrams.setdefault(trigram, set()).add(token)
+        for variant in self._deletion_variants(token[:self.DELETES_PREFIX_LENGTH], self.MAX_TYPOS):
+            self._deletes.setdefault(variant, set()).add(token)
+
+    def _code(self, column: str, value) -> int:
+        if value is None:
+            return -1
+        vocabulary = self._vocabularies[column]
+        return vocabulary.setdefault(str(value).lower(), len(vocabulary))
+
+    def _build(self, wines: list):
+        """Index `wines`, given in the database's (wine_name, wine_id) order."""
+        self._reset()
+        postings = {}
+        for row, wine in enumerate(wines):
+            for token in set(tokenize(wine.wine_name)):
+                postings.setdefault(token, []).append(row)
+
+        self._wine_ids = [wine.wine_id for wine in wines]
+        self._keys = [(wine.wine_name or '', wine.wine_id) for wine in wines]
+        self._names = [(wine.wine_name or '').lower() for wine in wines]
+        self._row_of = {wine_id: row for row, wine_id in enumerate(self._wine_ids)}
+        self._live = np.ones(len(wines), dtype=bool)
+        self._plain = np.array([fold(name) == name for name in self._names], dtype=bool)
+        self._abv = np.array([np.nan if wine.abv is None else wine.abv for wine in wines], dtype=np.float64)
+        for column in self.FILTER_COLUMNS.values():
+            self._codes[column] = np.array([self._code(column, getattr(wine, column)) for wine in wines], dtype=np.int32)
+        self._postings = {token: np.array(rows, dtype=np.int32) for token, rows in postings.items()}
+        for token in postings:
+            self._add_token(token)
+        self._order = list(range(len(wines)))
+        self._ranks = np.arange(len(wines), dtype=np.int32)
+
+    def _load(self):
+        columns = [getattr(Wine, column) for column in ('wine_id', 'wine_name', 'abv', *self.FILTER_COLUMNS.values())]
+        started = time.perf_counter()
+        with self._lock:
+            self._writes_during_build = False
+        with db.sessionmaker() as session:
+            wines = session.execute(select(*columns).order_by(Wine.wine_name, Wine.wine_id)).all()
+        self._swap_in(wines)
+        logging.info(f'Índice de búsqueda de vinos construido: {len(wines)} vinos, {len(self._postings)} términos en {time.perf_counter() - started:.1f} s')
+
+    def _swap_in(self, wines: list):
+        # Build into a fresh instance so searches keep using the current index meanwhile
+        fresh = WineSearchIndex.__new__(WineSearchIndex)
+        fresh._build(wines)
+        with self._lock:
+            for name, value in vars(fresh).items():
+                setattr(self, name, value)
+            # Writes applied while loading may be missing from the rows just read
+            self._built_at = None if self._writes_during_build else datetime.now()
+
+    def build(self):
+        """Load every wine and build the index, replacing the current one."""
+        try:
+            self._load()
+            metrics.increment('wine_search_index_builds_total')
+        except Exception as e:
+            metrics.increment('wine_search_index_build_errors_total')
+            logging.error(f'Error construyendo el índice de búsqueda de vinos: {e}')
+        finally:
+            with self._lock:
+                self._building = False
+
+    def build_in_background(self):
+        """Start a build unless one is running; searches keep the current index meanwhile."""
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self.build, name='wine-search-index', daemon=True).start()
+
+    def is_ready(self) -> bool:
+        return len(self._keys) > 0 or self._built_at is not None
+
+    def invalidate(self):
+        """Rebuild the whole index in the background, e.g. after a bulk catalog change."""
+        with self._lock:
+            self._built_at = None
+            self._writes_during_build = self._building
+        self.build_in_background()
+
+    # Incremental writes
+
+    def _tombstone(self, wine_id: int):
+        row = self._row_of.pop(wine_id, None)
+        if row is not None:
+            self._live[row] = False
+
+    def _maybe_compact(self):
+        tombstones = len(self._keys) - len(self._row_of)
+        if tombstones > self.MAX_TOMBSTONE_RATIO * max(len(self._keys), 1):
+            self.invalidate()
+
+    @staticmethod
+    def _preceding_wine_id(wine: WineSchema) -> int | None:
+        """ID of the wine sorted right before `wine` by the database, or None if it sorts first."""
+        key = tuple_(Wine.wine_name, Wine.wine_id)
+        with db.sessionmaker() as session:
+            return session.execute(
+                select(Wine.wine_id)
+                .where(key < tuple_(wine.wine_name, wine.wine_id))
+                .order_by(Wine.wine_name.desc(), Wine.wine_id.desc())
+                .limit(1)
+            ).scalar()
+
+    def upsert(self, wine: WineSchema):
+        """Add a created wine, or replace an updated one, without rebuilding."""
+        with self._lock:
+            self._writes_during_build = self._building
+            if not self.is_ready():
+                return
+        # Where the new version goes in name order is asked to the database, outside the lock
+        preceding_wine_id = self._preceding_wine_id(wine)
+        with self._lock:
+            preceding_row = None if preceding_wine_id is None else self._row_of.get(preceding_wine_id)
+            if preceding_wine_id is not None and preceding_row is None:
+                # The wine sorted before it is not indexed yet, so its place is unknown
+                logging.warning(f'Vino {wine.wine_id} sin posición en el índice de búsqueda, se reconstruye')
+                self._tombstone(wine.wine_id)
+                self.invalidate()
+                return
+            self._tombstone(wine.wine_id)
+            row = len(self._keys)
+            name = (wine.wine_name or '').lower()
+            self._wine_ids.append(wine.wine_id)
+            self._keys.append((wine.wine_name or '', wine.wine_id))
+            self._names.append(name)
+            self._row_of[wine.wine_id] = row
+            self._live = np.append(self._live, True)
+            self._plain = np.append(self._plain, fold(name) == name)
+            self._abv = np.append(self._abv, np.nan if wine.abv is None else wine.abv)
+            for column in self.FILTER_COLUMNS.values():
+                self._codes[column] = np.append(self._codes[column], np.int32(self._code(column, getattr(wine, column))))
+
+            for token in set(tokenize(wine.wine_name)):
+                if token not in self._postings:
+                    self._add_token(token)
+                self._postings[token] = np.append(self._postings.get(token, np.zeros(0, dtype=np.int32)), np.int32(row))
+
+            self._masks.clear()
+            self._word_rows.clear()
+            self._name_rows.clear()
+            self._order.insert(0 if preceding_row is None else self._order.index(preceding_row) + 1, row)
+            self._ordered = False
+            self._maybe_compact()
+
+    def remove(self, wine_id: int):
+        """Drop a deleted wine without rebuilding."""
+        with self._lock:
+            self._writes_during_build = self._building
+            self._tombstone(wine_id)
+            self._maybe_compact()
+
+    # Querying
+
+    def _ensure_order(self):
+        # Rows inserted by writes have no rank until the ranks are recomputed
+        if self._ordered:
+            return
+        self._ranks = np.empty(len(self._order), dtype=np.int32)
+        self._ranks[self._order] = np.arange(len(self._order), dtype=np.int32)
+        self._ordered = True
+
+    def _typo_tokens(self, word: str) -> list[str]:
+        if len(word) < self.MIN_TYPO_LENGTH:
+            return []
+        max_typos = 2 if len(word) >= self.MIN_TWO_TYPOS_LENGTH else 1
+        candidates = set()
+        for variant in self._deletion_variants(word[:self.DELETES_PREFIX_LENGTH], max_typos):
+            candidates.update(self._deletes.get(variant, ()))
+        return [token for token in candidates if edit_distance(word, token, max_typos) <= max_typos]
+
+    def _tokens_containing(self, word: str) -> list[str]:
+        trigrams = self._token_trigrams(word)
+        if not trigrams:
+            # Too short for the trigram index: scan the vocabulary
+            return [token for token in self._postings if word in token]
+        candidate_sets = sorted((self._trigrams.get(trigram, set()) for trigram in trigrams), key=len)
+        return [token for token in set.intersection(*candidate_sets) if word in token]
+
+    def _rows_of_word(self, word: str, typos: bool) -> np.ndarray:
+        """Rows with a name token containing `word` (or, with `typos`, within the tolerated typos of it)."""
+        key = (word, typos)
+        rows = self._word_rows.get(key)
+        if rows is None:
+            tokens = self._tokens_containing(word)
+            if typos:
+                tokens = set(tokens) | set(self._typo_tokens(word))
+            arrays = [self._postings[token] for token in tokens]
+            if not arrays:
+                rows = np.zeros(0, dtype=np.int32)
+            else:
+                rows = arrays[0] if len(arrays) == 1 else np.unique(np.concatenate(arrays))
+            if len(self._word_rows) >= self.MAX_CACHED_MASKS:
+                self._word_rows.pop(next(iter(self._word_rows)))
+            self._word_rows[key] = rows
+        return rows
+
+    def _name_candidates(self, needle: str, typos: bool) -> np.ndarray:
+        """Rows matching every word of `needle`; a superset of the names containing it."""
+        rows = None
+        for word in tokenize(needle):
+            word_rows = self._rows_of_word(word, typos)
+            rows = word_rows if rows is None else np.intersect1d(rows, word_rows, assume_unique=True)
+            if not len(rows):
+                break
+        # Without letters or digits any name may contain it
+        return np.flatnonzero(self._live) if rows is None else rows
+
+    def _names_containing(self, rows: np.ndarray, needle: str) -> np.ndarray:
+        """The rows whose lowercased name contains `needle` (what ILIKE '%needle%' matches)."""
+        check = np.ones(len(rows), dtype=bool)
+        if fold(needle) == needle and _TOKEN_PATTERN.fullmatch(needle):
+            # One unaccented word inside a token of an unaccented name is a substring of it
+            check = ~self._plain[rows]
+        keep = np.ones(len(rows), dtype=bool)
+        names = self._names
+        keep[check] = [needle in names[row] for row in rows[check].tolist()]
+        return rows[keep]
+
+    def _rows_of_name(self, wine_name: str, similar: bool) -> tuple[np.ndarray, np.ndarray | None]:
+        """
+        Rows matching a wine_name filter and, for similar matches, how close
+        each name is (0 starts with the search, 1 contains it, 2 typos only).
+        Cached per search, so later pages and repeated searches skip the name checks.
+        """
+        needle = wine_name.lower()
+        key = (needle, similar)
+        cached = self._name_rows.get(key)
+        if cached is None:
+            rows = self._name_candidates(needle, typos=similar)
+            closeness = None
+            if similar:
+                names = self._names
+                closeness = np.array([
+                    0 if names[row].startswith(needle) else 1 if needle in names[row] else 2
+                    for row in rows.tolist()
+                ], dtype=np.int8)
+            else:
+                rows = self._names_containing(rows, needle)
+            if len(self._name_rows) >= self.MAX_CACHED_MASKS:
+                self._name_rows.pop(next(iter(self._name_rows)))
+            cached = self._name_rows[key] = (rows, closeness)
+        return cached
+
+    def _filter_mask(self, column: str, value: str) -> np.ndarray:
+        """Bitmap of the rows whose `column` contains `value`, like the repository's ILIKE filters."""
+        needle = value.lower()
+        key = (column, needle)
+        mask = self._masks.get(key)
+        if mask is None:
+            codes = [code for text, code in self._vocabularies[column].items() if needle in text]
+            mask = np.isin(self._codes[column], codes)
+            if len(self._masks) >= self.MAX_CACHED_MASKS:
+                self._masks.pop(next(iter(self._masks)))
+            self._masks[key] = mask
+        return mask
+
+    def search(
+        self,
+        filters: WineFilters,
+        limit: int,
+        offset: int = 0,
+        match: str = "contains",
+        after: tuple[str, int] | None = None,
+    ) -> tuple[list[int], int, bool] | None:
+        """
+        IDs of one page of wines matching the filters, the total number of
+        matches (of the whole filter set, also when paging with `after`) and
+        whether more pages follow; or None if the index can't answer (not
+        built yet, a full-text `q` search, or an `after` wine it no longer
+        holds under that name).
+
+        Same contract as `WinesRepository.get_by_filters`: text filters match
+        case-insensitive substrings and wines are ordered by name, with
+        `after` paging by keyset. With `match="similar"` names within the
+        tolerated typos of every word match too, ranked after the names
+        starting with and then containing the search.
+        """
+        if filters.q:
+            return None
+        if self._built_at is None or datetime.now() - self._built_at >= timedelta(minutes=self.CACHE_EXPIRY_MINUTES):
+            self.build_in_background()
+        if not self.is_ready():
+            return None
+
+        started = time.perf_counter()
+        with self._lock:
+            self._ensure_order()
+            after_rank = None
+            if after is not None:
+                # Names are not compared here: the cursor is placed by the rank of its own wine
+                after_row = self._row_of.get(int(after[1]))
+                if after_row is None or self._keys[after_row] != (after[0], int(after[1])):
+                    return None
+                after_rank = self._ranks[after_row]
+            mask = self._live.copy()
+            for field, column in self.FILTER_COLUMNS.items():
+                value = getattr(filters, field)
+                if value:
+                    mask &= self._filter_mask(column, value)
+            if filters.min_abv is not None:
+                mask &= self._abv >= filters.min_abv
+            if filters.max_abv is not None:
+                mask &= self._abv <= filters.max_abv
+
+            similar = bool(filters.wine_name) and match == "similar"
+            closeness = None
+            if filters.wine_name:
+                rows, closeness = self._rows_of_name(filters.wine_name, similar)
+                passing = mask[rows]
+                rows = rows[passing]
+                if closeness is not None:
+                    closeness = closeness[passing]
+            else:
+                rows = np.flatnonzero(mask)
+            total = len(rows)
+
+            if after_rank is not None:
+                # Only plain name-ordered searches page by keyset
+                rows = rows[self._ranks[rows] > after_rank]
+            ranks = self._ranks[rows]
+            if closeness is not None and after is None:
+                order = np.lexsort((ranks, closeness))[offset:offset + limit]
+            elif offset + limit < len(rows):
+                # Only the wines up to the end of the page need sorting
+                head = np.argpartition(ranks, offset + limit - 1)[:offset + limit]
+                order = head[np.argsort(ranks[head])][offset:]
+            else:
+                order = np.argsort(ranks)[offset:offset + limit]
+            wine_ids = [self._wine_ids[row] for row in rows[order]]
+            has_more = len(rows) > offset + limit
+
+        metrics.observe('wine_search_index_query_ms', (time.perf_counter() - started) * 1000, buckets=QUERY_MS_BUCKETS)
+        return wine_ids, total, has_more
+
+
+wine_search_index = WineSearchIndex()
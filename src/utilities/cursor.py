@@ -0,0 +1,22 @@
+import base64
+import json
+
+
+def encode_cursor(payload: dict) -> str:
+    """Opaque, URL-safe cursor carrying a small JSON payload."""
+    encoded = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(encoded).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    Raises:
+        ValueError: If the cursor was not produced by `encode_cursor`
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Cursor inválido: {e}')
+    if not isinstance(payload, dict):
+        raise ValueError('Cursor inválido')
+    return payload
@@ -0,0 +1,74 @@
+import threading
+
+DEFAULT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def snapshot(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[f'le_{bound}'] = cumulative
+        buckets['le_inf'] = self.count
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'mean': round(self.sum / self.count, 3) if self.count else 0.0,
+            'buckets': buckets,
+        }
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and histograms, exposed through GET /metrics."""
+
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = value
+
+    def adjust_gauge(self, name: str, delta: float):
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0) + delta
+
+    def observe(self, name: str, value: float, buckets: tuple = DEFAULT_BUCKETS):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'histograms': {name: histogram.snapshot() for name, histogram in self._histograms.items()},
+            }
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,19 @@
+import os
+
+# Settings are read from the environment on import; give the tests a complete, offline configuration
+for name, value in {
+    'SERVER_HOST': '127.0.0.1',
+    'SERVER_PORT': '8000',
+    'SERVER_WORKERS': '1',
+    'IS_ALLOWED_CREDENTIALS': 'True',
+    'POSTGRES_SCHEMA': 'postgresql+psycopg2',
+    'POSTGRES_USERNAME': 'tuvino_user',
+    'POSTGRES_PASSWORD': 'tuvino',
+    'POSTGRES_HOST': 'localhost',
+    'POSTGRES_PORT': '5432',
+    'POSTGRES_DB': 'db',
+    'EXPO_PUBLIC_SUPABASE_URL': 'https://example.supabase.co',
+    'EXPO_PUBLIC_SUPABASE_ANON_KEY': 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.test',
+    'RECOMMENDATIONS_API_URL': 'http://model.test',
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,25 @@
+import pytest
+
+from src.services.recommendation_cache_service import RankedRecommendations, RecommendationCacheService
+from src.utilities.cursor import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor({'n': 'Viña Ardanza', 'i': 7})) == {'n': 'Viña Ardanza', 'i': 7}
+
+
+@pytest.mark.parametrize('cursor', ['!!', 'WzFd', ''])
+def test_malformed_cursors_raise_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_recommendation_cursors_use_the_shared_codec():
+    ranked = RankedRecommendations([1, 2, 3], {}, exhausted=True)
+    cursor = RecommendationCacheService.encode_cursor(ranked, 2)
+
+    assert decode_cursor(cursor) == {'l': ranked.list_id, 'o': 2}
+    assert RecommendationCacheService.decode_cursor(cursor) == (ranked.list_id, 2)
+    for malformed in ('!!', encode_cursor({'o': 1}), encode_cursor({'l': ranked.list_id, 'o': -1})):
+        with pytest.raises(ValueError):
+            RecommendationCacheService.decode_cursor(malformed)
@@ -0,0 +1,51 @@
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+from starlette.concurrency import run_in_threadpool
+
+from src.services.model_batch_dispatcher import ModelBatchDispatcher
+
+
+def _echo_batch(url, data, **kwargs):
+    requests = json.loads(data)['requests']
+    response = MagicMock(status_code=200)
+    response.json.return_value = {'responses': [{'status_code': 200, 'body': request['body']} for request in requests]}
+    return response
+
+
+def _dispatcher(window_ms: float = 200) -> ModelBatchDispatcher:
+    dispatcher = ModelBatchDispatcher('http://model.test/scores', max_batch_size=16, window_ms=window_ms)
+    dispatcher._http = MagicMock()
+    dispatcher._http.post.side_effect = _echo_batch
+    return dispatcher
+
+
+def test_concurrent_requests_from_routes_share_one_batched_post():
+    dispatcher = _dispatcher()
+
+    async def two_requests():
+        # Routes submit through the threadpool, so the event loop keeps accepting requests meanwhile
+        return await asyncio.gather(
+            run_in_threadpool(dispatcher.submit, {'user': 'a'}),
+            run_in_threadpool(dispatcher.submit, {'user': 'b'}),
+        )
+
+    first, second = asyncio.run(two_requests())
+
+    assert dispatcher._http.post.call_count == 1
+    url, data = dispatcher._http.post.call_args.args
+    assert url == 'http://model.test/scores/batch'
+    assert sorted(request['body']['user'] for request in json.loads(data)['requests']) == ['a', 'b']
+    assert (first.json(), second.json()) == ({'user': 'a'}, {'user': 'b'})
+
+
+def test_failed_batch_returns_the_error_to_every_caller():
+    dispatcher = _dispatcher(window_ms=0)
+    dispatcher._http.post.side_effect = None
+    dispatcher._http.post.return_value = MagicMock(status_code=503, text='unavailable')
+
+    response = dispatcher.submit({'user': 'a'})
+
+    assert response.status_code == 503
+    assert response.text == 'unavailable'
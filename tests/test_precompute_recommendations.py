@@ -0,0 +1,73 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.jobs import precompute_recommendations as job
+from src.models.preference import Preference
+from src.models.preference_category import PreferenceCategory
+from src.models.rating import Rating
+from src.models.user import User
+from src.models.wine import Wine
+from src.repository.wine_recommendations_repository import WineRecommendationsRepository
+from src.services.score_cache_service import score_cache
+from src.services.user_features_service import UserFeaturesService
+
+USER_ID = '00000000-0000-0000-0000-000000000001'
+
+
+def _preference() -> Preference:
+    preference = Preference(1, 'Tinto', None, 1.0)
+    preference.set_category(PreferenceCategory(1, 'types', 'Tipo de vino'))
+    return preference
+
+
+def _rating() -> Rating:
+    wine = Wine(7, 'Viña Ardanza', 'Red', 'Tempranillo', 13.5, 'Full-bodied', 'España', 'Rioja', 'La Rioja Alta', '')
+    return Rating(USER_ID, wine, 4.5, '')
+
+
+@pytest.fixture
+def saved_rows(monkeypatch):
+    """Patch the database and the model; returns the rows the job saves."""
+    rows = []
+    monkeypatch.setattr(job.db, 'sessionmaker', lambda: nullcontext(MagicMock()))
+    monkeypatch.setattr(job, 'WineRatingsRepository', lambda session: MagicMock(get_by_user_ids=lambda ids: {USER_ID: [_rating()]}))
+    monkeypatch.setattr(job, 'PreferencesRepository', lambda session: MagicMock(get_by_user_ids=lambda ids: {USER_ID: [_preference()]}))
+    monkeypatch.setattr(job, 'UserRecommendationsRepository', lambda session: MagicMock(save_many=rows.extend))
+    monkeypatch.setattr(WineRecommendationsRepository, '_fetch_ranking', lambda self, user_id, features, limit: (['7'], {'7': 80.0}))
+    monkeypatch.setattr(job, '_worker_recommendations_repo', None)
+    return rows
+
+
+def test_features_are_computed_with_the_users_preferences(saved_rows, monkeypatch):
+    calls = []
+    calculate_features = UserFeaturesService.calculate_features
+    monkeypatch.setattr(UserFeaturesService, 'calculate_features',
+                        lambda self, **kwargs: calls.append(kwargs) or calculate_features(self, **kwargs))
+
+    with ThreadPoolExecutor() as pool:
+        saved, failed = job._process_chunk([USER_ID], WineRecommendationsRepository(), pool, pool, limit=10)
+
+    assert (saved, failed) == (1, 0)
+    [call] = calls
+    assert [preference.id for preference in call['preferences_data']] == [1]
+
+    live_user = User(uid=USER_ID, username='', email='')
+    live_user.set_ratings([_rating()])
+    live_user.preferences = [_preference()]
+    live_features = WineRecommendationsRepository()._calculate_user_features(live_user)
+    assert saved_rows[0]['features_fingerprint'] == score_cache.fingerprint(live_features)
+
+
+def test_users_sent_to_the_process_pool_are_picklable():
+    user = User(uid=USER_ID, username='', email='')
+    user.set_ratings([_rating()])
+    user.preferences = [_preference()]
+
+    restored = pickle.loads(pickle.dumps(user))
+
+    assert restored.preferences[0].category.name == 'types'
+    assert len(restored.get_ratings()) == 1
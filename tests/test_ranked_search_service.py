@@ -0,0 +1,56 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.models.schemas.wine import WineFilters, WineSchema
+from src.services import ranked_search_service as service_module
+from src.services.ranked_search_service import RankedSearchService
+
+
+def _wine(wine_id: int, wine_name: str) -> WineSchema:
+    return WineSchema(wine_id=wine_id, wine_name=wine_name, type='Red', elaborate='', grapes='', harmonize='', abv=13.0,
+                      body='', acidity='', country='España', region='Rioja', winery='Muga', vintages='')
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    """Patch the repository and the model; returns the mock whose return value are the model scores and whether it failed."""
+    monkeypatch.setattr(service_module.WinesRepository, 'get_by_filters',
+                        lambda *args, **kwargs: ([_wine(1, 'A'), _wine(2, 'B'), _wine(3, 'C')], 3))
+    score_wines = MagicMock()
+    with patch.object(service_module, 'WineRecommendationsRepository', return_value=MagicMock(score_wines=score_wines)):
+        yield score_wines
+
+
+def test_fully_scored_window_is_ranked_and_cached(scored):
+    scored.return_value = ({'1': 10.0, '2': 90.0, '3': 50.0}, False)
+    service = RankedSearchService()
+
+    window = service.get_ranked_window('user', WineFilters(), load_user=MagicMock)
+
+    assert [wine.wine_id for wine in window] == [2, 3, 1]
+    assert service.get_cached_window('user', WineFilters()) is window
+
+
+def test_wines_left_unscored_by_the_model_go_last_and_the_window_is_cached(scored):
+    scored.return_value = ({'1': 10.0, '3': 50.0}, False)
+    service = RankedSearchService()
+
+    window = service.get_ranked_window('user', WineFilters(), load_user=MagicMock)
+
+    assert [wine.wine_id for wine in window] == [3, 1, 2]
+    assert service.get_cached_window('user', WineFilters()) is window
+
+
+def test_window_is_not_cached_when_scoring_fails(scored):
+    scored.return_value = ({'1': 10.0}, True)
+    service = RankedSearchService()
+
+    window = service.get_ranked_window('user', WineFilters(), load_user=MagicMock)
+
+    assert [wine.wine_id for wine in window] == [1, 2, 3]
+    assert service.get_cached_window('user', WineFilters()) is None
+
+    scored.return_value = ({'1': 10.0, '2': 90.0, '3': 50.0}, False)
+    assert [wine.wine_id for wine in service.get_ranked_window('user', WineFilters(), load_user=MagicMock)] == [2, 3, 1]
+    assert scored.call_count == 2
@@ -0,0 +1,43 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from src.api.routes import users as users_routes
+
+
+class _Wine:
+    def __init__(self, wine_id: int):
+        self.wine_id = wine_id
+
+    def model_dump_json(self, by_alias: bool = False) -> str:
+        return json.dumps({'wine_id': self.wine_id})
+
+
+def _lines(ranked, limit: int) -> list[dict]:
+    async def collect():
+        return [json.loads(line) async for line in users_routes._stream_recommendations(ranked, limit)]
+    return asyncio.run(collect())
+
+
+def test_stream_ends_with_an_error_line_when_hydration_fails(monkeypatch):
+    def hydrate(ranked, limit, offset=0):
+        if offset:
+            raise RuntimeError('database went away')
+        return [_Wine(wine_id) for wine_id in ranked.wine_ids[:limit]], limit
+
+    monkeypatch.setattr(users_routes, 'STREAM_CHUNK_SIZE', 2)
+    monkeypatch.setattr(users_routes.WineRecommendationsRepository, 'hydrate_recommendations', staticmethod(hydrate))
+
+    lines = _lines(SimpleNamespace(wine_ids=['1', '2', '3', '4']), limit=4)
+
+    assert lines[:2] == [{'wine_id': '1'}, {'wine_id': '2'}]
+    assert list(lines[2]) == ['error'] and len(lines) == 3
+
+
+def test_complete_stream_has_no_error_line(monkeypatch):
+    monkeypatch.setattr(users_routes.WineRecommendationsRepository, 'hydrate_recommendations',
+                        staticmethod(lambda ranked, limit, offset=0: ([_Wine(wine_id) for wine_id in ranked.wine_ids[offset:offset + limit]], offset + limit)))
+
+    lines = _lines(SimpleNamespace(wine_ids=['1', '2', '3']), limit=3)
+
+    assert lines == [{'wine_id': '1'}, {'wine_id': '2'}, {'wine_id': '3'}]
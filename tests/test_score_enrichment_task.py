@@ -0,0 +1,51 @@
+import base64
+import json
+from unittest.mock import patch
+
+import pytest
+
+from src.api.tasks.score_enrichment_task import ScoreEnrichmentTask
+
+
+def _forge(token: str, **changes) -> str:
+    job_id, encoded, signature = token.split('.')
+    payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+    payload.update(changes)
+    encoded = base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+    return f'{job_id}.{encoded}.{signature}'
+
+
+def test_token_round_trip():
+    token = ScoreEnrichmentTask._encode_token('job', 'user-1', [1, 2, 3])
+
+    assert ScoreEnrichmentTask._decode_token(token) == ('job', 'user-1', [1, 2, 3])
+
+
+@pytest.mark.parametrize('changes', [{'u': 'someone-else'}, {'w': list(range(5000))}])
+def test_forged_token_is_rejected(changes):
+    token = ScoreEnrichmentTask._encode_token('job', 'user-1', [1, 2, 3])
+
+    with pytest.raises(ValueError):
+        ScoreEnrichmentTask._decode_token(_forge(token, **changes))
+
+
+def test_unsigned_token_is_rejected():
+    token = ScoreEnrichmentTask._encode_token('job', 'user-1', [1, 2, 3])
+
+    with pytest.raises(ValueError):
+        ScoreEnrichmentTask._decode_token(token.rsplit('.', 1)[0])
+
+
+def test_expired_token_is_rejected():
+    with patch('src.api.tasks.score_enrichment_task.time.time', return_value=0):
+        token = ScoreEnrichmentTask._encode_token('job', 'user-1', [1])
+
+    with pytest.raises(ValueError, match='expirado'):
+        ScoreEnrichmentTask._decode_token(token)
+
+
+def test_signed_token_with_too_many_wines_is_rejected():
+    token = ScoreEnrichmentTask._encode_token('job', 'user-1', list(range(ScoreEnrichmentTask.MAX_WINES + 1)))
+
+    with pytest.raises(ValueError):
+        ScoreEnrichmentTask._decode_token(token)
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.schemas.wine import WineFilters
+from src.services import search_count_service as service_module
+from src.services.search_count_service import SearchCountService
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """Patch the repository; returns the filters it was asked to count."""
+    calls = []
+    monkeypatch.setattr(service_module.WinesRepository, 'count_by_filters',
+                        lambda filters, match='contains', exact=True: calls.append(filters.wine_name) or 10)
+    return calls
+
+
+def test_counts_are_cached_per_filter_set(counted):
+    service = SearchCountService()
+
+    assert service.count(WineFilters(wine_name='merlot')) == (10, False)
+    assert service.count(WineFilters(wine_name=' Merlot ')) == (10, False)
+    assert counted == ['merlot', 'merlot']
+
+
+def test_cache_keeps_at_most_max_entries_dropping_the_oldest(counted, monkeypatch):
+    monkeypatch.setattr(SearchCountService, 'MAX_ENTRIES', 3)
+    service = SearchCountService()
+
+    for prefix in ('m', 'me', 'mer', 'merl'):
+        service.count(WineFilters(wine_name=prefix))
+
+    assert len(service._counts) == 3
+    counted.clear()
+    service.count(WineFilters(wine_name='me'))
+    service.count(WineFilters(wine_name='m'))
+    assert counted == ['m', 'm']
+
+
+def test_expired_counts_are_dropped(counted):
+    service = SearchCountService()
+    service.count(WineFilters(wine_name='malbec'))
+    key = next(iter(service._counts))
+    total, is_estimate, _ = service._counts[key]
+    service._counts[key] = (total, is_estimate, datetime.now() - timedelta(minutes=SearchCountService.CACHE_EXPIRY_MINUTES))
+
+    service.count(WineFilters(wine_name='syrah'))
+
+    assert key not in service._counts
+    assert len(service._counts) == 1
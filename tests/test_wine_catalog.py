@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from src.models.schemas.wine import WineFilters
+from src.services import wine_catalog as catalog_module
+from src.services.wine_catalog import WineCatalog
+
+
+def _wine(wine_id, **values):
+    columns = {column: None for column in WineCatalog.CATEGORICAL_COLUMNS}
+    columns.update(values)
+    return SimpleNamespace(wine_id=wine_id, wine_name=columns.pop('wine_name', None), abv=columns.pop('abv', None), **columns)
+
+
+@pytest.fixture
+def load_catalog():
+    def load(rows: list) -> WineCatalog:
+        session = MagicMock()
+        session.execute.return_value.all.return_value = rows
+        sessionmaker = MagicMock(return_value=MagicMock(__enter__=lambda *args: session, __exit__=lambda *args: None))
+        catalog = WineCatalog()
+        with patch.object(catalog_module.db, 'sessionmaker', sessionmaker):
+            catalog._ensure_loaded()
+        return catalog
+    return load
+
+
+@pytest.mark.parametrize('filters', [{'abv': 12}, {'type': 'Red'}, {}])
+def test_empty_catalog_passes_no_wine(load_catalog, filters):
+    catalog = load_catalog([])
+
+    assert catalog.mask(np.array([1, 2]), filters).tolist() == [False, False]
+    assert catalog.filter_ids([1, 2], filters) == []
+
+
+def test_mask_filters_by_value_case_insensitively(load_catalog):
+    catalog = load_catalog([_wine(1, type='Red', abv=12.0), _wine(2, type='White', abv=12.0), _wine(3, type='red', abv=13.5)])
+
+    assert catalog.filter_ids([3, 2, 1, 99], {'type': 'RED'}) == [3, 1]
+    assert catalog.filter_ids([1, 2, 3], {'type': 'red', 'abv': 12}) == [1]
+    assert catalog.filter_ids([1, 2, 3], {'type': 'rosé'}) == []
+
+
+FACETS = ('type', 'country', 'abv')
+ABV_EDGES = (12.0, 14.0)
+
+
+@pytest.fixture
+def facet_catalog(load_catalog) -> WineCatalog:
+    return load_catalog([
+        _wine(1, wine_name='Catena Malbec', type='Red', country='Argentina', winery='Catena Zapata', abv=13.5),
+        _wine(2, wine_name='Alamos Malbec', type='Red', country='Argentina', winery='Catena Zapata', abv=14.0),
+        _wine(3, wine_name='Susana Balbo Torrontés', type='White', country='Argentina', winery='Dominio del Plata', abv=12.5),
+        _wine(4, wine_name='Viña Ardanza', type='Red', country='España', winery='La Rioja Alta', abv=13.5),
+        _wine(5, wine_name=None, type=None, country='España', abv=None),
+    ])
+
+
+def test_facets_match_filters_by_substring_like_the_search(facet_catalog):
+    total, counts = facet_catalog.facet_counts(WineFilters(country='arg'), FACETS, ABV_EDGES)
+
+    assert total == 3
+    assert counts['type'] == {'Red': 2, 'White': 1}
+    # A facet ignores its own filter
+    assert counts['country'] == {'Argentina': 3, 'España': 2}
+    assert counts['abv'] == {'12-14': 2, '14+': 1}
+
+
+def test_facets_apply_the_name_and_winery_filters(facet_catalog):
+    assert facet_catalog.facet_counts(WineFilters(wine_name='MALBEC'), FACETS, ABV_EDGES)[0] == 2
+    assert facet_catalog.facet_counts(WineFilters(wine_name='malbec', winery='zapata', min_abv=14), FACETS, ABV_EDGES)[0] == 1
+    total, counts = facet_catalog.facet_counts(WineFilters(wine_name='a', wine_type='re'), FACETS, ABV_EDGES)
+    assert total == 3
+    assert counts['type'] == {'Red': 3, 'White': 1}
+
+
+def test_facets_reject_full_text_queries(facet_catalog):
+    with pytest.raises(ValueError):
+        facet_catalog.facet_counts(WineFilters(q='malbec'), FACETS, ABV_EDGES)
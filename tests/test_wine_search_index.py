@@ -0,0 +1,254 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from src.models.schemas.wine import WineFilters, WineSchema
+from src.services.wine_search_index import WineSearchIndex, edit_distance, fold, tokenize
+
+NAMES = [
+    'Merlot Reserva', 'Merlot', 'Château Margaux', 'Chateau Latour', 'Ríoja Alta Gran Reserva', 'Rioja Crianza',
+    'Viña Tondonia', 'Vina Real', 'Tempranillo Joven', 'Señorío de Sarría', 'Pago de Carraovejas', 'Marqués de Riscal',
+    'Albariño Pazo', 'Cabernet-Merlot', 'Syrah', 'Gran Coronas', 'Torres 10', 'Protos Roble', 'Álamos Malbec',
+    'alto Moncayo',
+]
+TYPES = ['Red', 'White', 'Rosé', 'Sparkling']
+COUNTRIES = ['España', 'France', 'Chile']
+REGIONS = ['Rioja', 'Ribera del Duero', 'Bordeaux', 'Rías Baixas', None]
+WINERIES = ['Bodegas Muga', 'Marqués de Riscal', 'Torres', 'Château Margaux']
+
+
+def _catalog(size: int = 300) -> list:
+    generator = random.Random(7)
+    return [
+        SimpleNamespace(
+            wine_id=wine_id,
+            wine_name=generator.choice(NAMES) if wine_id % 5 else f'{generator.choice(NAMES)} {wine_id}',
+            abv=generator.choice([None, 11.5, 12.0, 13.5, 14.0, 15.5]),
+            type=generator.choice(TYPES),
+            winery=generator.choice(WINERIES),
+            country=generator.choice(COUNTRIES),
+            region=generator.choice(REGIONS),
+        )
+        for wine_id in range(1, size + 1)
+    ]
+
+
+def _db_key(wine_name: str, wine_id: int) -> tuple:
+    """(wine_name, wine_id) order of a linguistic collation such as es_ES.UTF-8: accents and case only break ties."""
+    return fold(wine_name), wine_name, wine_id
+
+
+def _contract(wines: list, filters: WineFilters, after: tuple | None = None) -> list[int]:
+    """What SqlWinesRepository.get_by_filters returns: ILIKE '%value%' filters, ordered by (wine_name, wine_id)."""
+    columns = {'wine_name': 'wine_name', 'wine_type': 'type', 'winery': 'winery', 'country': 'country', 'region': 'region'}
+
+    def matches(wine) -> bool:
+        for field, column in columns.items():
+            value = getattr(filters, field)
+            if value and value.lower() not in (getattr(wine, column) or '').lower():
+                return False
+        if filters.min_abv is not None and (wine.abv is None or wine.abv < filters.min_abv):
+            return False
+        if filters.max_abv is not None and (wine.abv is None or wine.abv > filters.max_abv):
+            return False
+        return after is None or _db_key(wine.wine_name, wine.wine_id) > _db_key(*after)
+
+    return [wine.wine_id for wine in sorted(wines, key=lambda wine: _db_key(wine.wine_name, wine.wine_id)) if matches(wine)]
+
+
+@pytest.fixture
+def wines() -> list:
+    return _catalog()
+
+
+@pytest.fixture
+def table(wines) -> dict:
+    """The wines table, by ID; tests write to it before telling the index, like the routes do."""
+    return {wine.wine_id: wine for wine in wines}
+
+
+@pytest.fixture
+def index(table, monkeypatch) -> WineSearchIndex:
+    def preceding_wine_id(wine) -> int | None:
+        before = [other for other in table.values() if _db_key(other.wine_name, other.wine_id) < _db_key(wine.wine_name, wine.wine_id)]
+        return max(before, key=lambda other: _db_key(other.wine_name, other.wine_id)).wine_id if before else None
+
+    index = WineSearchIndex()
+    monkeypatch.setattr(index, '_preceding_wine_id', preceding_wine_id)
+    index._swap_in(sorted(table.values(), key=lambda wine: _db_key(wine.wine_name, wine.wine_id)))
+    return index
+
+
+def _all_pages(index: WineSearchIndex, filters: WineFilters, page_size: int = 7, match: str = 'contains') -> list[int]:
+    wine_ids, offset = [], 0
+    while True:
+        page, _, has_more = index.search(filters, page_size, offset, match)
+        wine_ids += page
+        offset += page_size
+        if not has_more:
+            return wine_ids
+
+
+@pytest.mark.parametrize('filters', [
+    WineFilters(),
+    WineFilters(wine_name='erlot'),
+    WineFilters(wine_name='merl'),
+    WineFilters(wine_name='MERLOT RES'),
+    WineFilters(wine_name='t-Merlot'),
+    WineFilters(wine_name='rioja'),
+    WineFilters(wine_name='Ríoja'),
+    WineFilters(wine_name='viña'),
+    WineFilters(wine_name='de '),
+    WineFilters(wine_name='o'),
+    WineFilters(wine_name='1'),
+    WineFilters(wine_name='-'),
+    WineFilters(wine_name='zzz'),
+    WineFilters(wine_type='red'),
+    WineFilters(wine_type='ros'),
+    WineFilters(country='españa', region='ri'),
+    WineFilters(winery='marqués', min_abv=12.0),
+    WineFilters(region='rias'),
+    WineFilters(wine_name='reserva', min_abv=12, max_abv=14),
+    WineFilters(wine_name='gran', wine_type='Red', country='Spain'),
+])
+def test_results_match_the_repository_contract(index, wines, filters):
+    expected = _contract(wines, filters)
+
+    assert _all_pages(index, filters) == expected
+    page, total, has_more = index.search(filters, 5)
+    assert (page, total, has_more) == (expected[:5], len(expected), len(expected) > 5)
+
+
+def test_full_text_queries_are_left_to_the_repository(index):
+    assert index.search(WineFilters(q='tinto roble'), 10) is None
+
+
+def test_keyset_pages_follow_the_name_order_and_keep_the_total(index, wines):
+    filters = WineFilters(wine_name='r', wine_type='Red')
+    expected = _contract(wines, filters)
+    by_id = {wine.wine_id: wine for wine in wines}
+
+    wine_ids, after = [], None
+    while True:
+        page, total, has_more = index.search(filters, 4, 0, after=after)
+        assert total == len(expected)
+        assert page == _contract(wines, filters, after)[:4]
+        wine_ids += page
+        if not has_more:
+            break
+        last = by_id[page[-1]]
+        after = (last.wine_name, last.wine_id)
+
+    assert wine_ids == expected
+
+
+def test_similar_match_tolerates_typos_and_ranks_closer_names_first(index, wines):
+    assert index.search(WineFilters(wine_name='merlto'), 50)[1] == 0
+
+    wine_ids, total, _ = index.search(WineFilters(wine_name='merlto'), 500, match='similar')
+    names = {wine.wine_id: wine.wine_name for wine in wines}
+    assert total and all('merlot' in names[wine_id].lower() for wine_id in wine_ids)
+
+    wine_ids, _, _ = index.search(WineFilters(wine_name='merlot'), 500, match='similar')
+    starts = [names[wine_id].lower().startswith('merlot') for wine_id in wine_ids]
+    assert starts == sorted(starts, reverse=True)
+    assert set(_contract(wines, WineFilters(wine_name='merlot'))) <= set(wine_ids)
+
+    # Two typos from eight characters on, none below four
+    assert index.search(WineFilters(wine_name='tempraniyo'), 10, match='similar')[1] > 0
+    assert index.search(WineFilters(wine_name='syrh'), 10, match='similar')[1] > 0
+    assert index.search(WineFilters(wine_name='sra'), 10, match='similar')[1] == 0
+
+
+def _schema(wine_id: int, wine_name: str, **values) -> WineSchema:
+    fields = dict(type='Red', elaborate='', grapes='', harmonize='', abv=13.0, body='', acidity='', country='España',
+                  region='Rioja', winery='Nueva', vintages='')
+    fields.update(values)
+    return WineSchema(wine_id=wine_id, wine_name=wine_name, **fields)
+
+
+def test_upserts_and_removals_are_applied_incrementally(index, table):
+    created = _schema(10_001, 'Álamos Zzyzx Especial', abv=14.5)
+    updated = _schema(3, 'Zzyzx Viejo', type='White', country='France', region='Loire', winery='Bodegas Muga', abv=11.0)
+    for wine in (created, updated):
+        table[wine.wine_id] = wine
+        index.upsert(wine)
+    del table[5]
+    index.remove(5)
+    current = list(table.values())
+
+    for filters in (WineFilters(), WineFilters(wine_name='zzyzx'), WineFilters(wine_type='white'), WineFilters(min_abv=14.5),
+                    WineFilters(wine_name='merlot'), WineFilters(winery='muga', wine_name='vie')):
+        assert _all_pages(index, filters) == _contract(current, filters)
+    assert index.search(WineFilters(wine_name='Álamos'), 500)[0][-1] == 10_001
+    assert index.search(WineFilters(wine_name='zzyxz'), 10, match='similar')[0] == [10_001, 3]
+
+
+def test_pages_follow_the_database_order_not_code_points(index, wines):
+    names = {wine.wine_id: wine.wine_name for wine in wines}
+
+    wine_ids, _, _ = index.search(WineFilters(wine_name='l'), 500)
+
+    # Code point order would put every "Á" and lowercase name after "Z"
+    assert wine_ids == _contract(wines, WineFilters(wine_name='l'))
+    assert names[wine_ids[0]].startswith('Álamos')
+
+
+def test_keyset_cursor_of_a_wine_no_longer_indexed_is_left_to_the_repository(index, table, wines):
+    last = wines[10]
+    assert index.search(WineFilters(), 5, after=(last.wine_name, last.wine_id)) is not None
+
+    del table[last.wine_id]
+    index.remove(last.wine_id)
+    assert index.search(WineFilters(), 5, after=(last.wine_name, last.wine_id)) is None
+    assert index.search(WineFilters(), 5, after=(last.wine_name + ' renamed', wines[11].wine_id)) is None
+
+
+def test_upsert_without_a_known_place_triggers_a_rebuild(index, monkeypatch):
+    rebuilds = []
+    monkeypatch.setattr(index, 'build_in_background', lambda: rebuilds.append(True))
+    monkeypatch.setattr(index, '_preceding_wine_id', lambda wine: 99_999)
+
+    index.upsert(_schema(3, 'Zzyzx Viejo'))
+
+    assert rebuilds
+    assert 3 not in index.search(WineFilters(), 500)[0]
+
+
+def test_too_many_tombstones_trigger_a_rebuild(index, wines, monkeypatch):
+    rebuilds = []
+    monkeypatch.setattr(index, 'build_in_background', lambda: rebuilds.append(True))
+
+    for wine in wines[:int(len(wines) * WineSearchIndex.MAX_TOMBSTONE_RATIO)]:
+        index.remove(wine.wine_id)
+    assert not rebuilds
+    index.remove(wines[-1].wine_id)
+    assert rebuilds
+
+
+@pytest.mark.parametrize('a, b, distance', [
+    ('merlot', 'merlot', 0),
+    ('merlto', 'merlot', 1),
+    ('merot', 'merlot', 1),
+    ('merlott', 'merlot', 1),
+    ('mirlot', 'merlot', 1),
+    ('tempraniyo', 'tempranillo', 2),
+    ('abcd', 'badc', 2),
+    ('syrah', 'merlot', 3),
+])
+def test_edit_distance(a, b, distance):
+    assert edit_distance(a, b, 2) == min(distance, 3)
+
+
+def test_deletion_variants_cover_one_and_two_deletions():
+    variants = WineSearchIndex._deletion_variants('abcd', 2)
+
+    assert {'abcd', 'bcd', 'acd', 'abd', 'abc', 'ab', 'cd', 'ad'} <= variants
+    assert 'a' not in variants
+    assert WineSearchIndex._deletion_variants('ab', 2) == {'ab', 'a', 'b'}
+
+
+def test_fold_and_tokenize():
+    assert fold('Añejo RÍOJA Château') == 'anejo rioja chateau'
+    assert tokenize('Cabernet-Merlot, 2015') == ['cabernet', 'merlot', '2015']